@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+""" DETERMINISTIC SYNTHETIC DATA FOR THE BENCHMARKS.
+    Every generator takes a seeded random.Random and the number of items, so the same scale gives the same data.
+"""
+__author__ = 'kokarev.nv'
+
+from random import Random
+from datetime import date, datetime, timedelta
+
+FIRST_DATE = date(2015, 1, 1)
+DAYS_QTY = 365 * 10
+NAMES = ('ivanov', 'petrova', 'sidorov', 'prokudina-gorskaya', 'smirnov')
+WORDS = ('long', 'line', 'longline', 'word', 'composite', 'key', 'period', 'aggregate')
+
+
+def dates(rng: Random, qty: int) -> list:
+    """ Dates of ten years. """
+    return [FIRST_DATE + timedelta(days=rng.randrange(DAYS_QTY)) for _ in range(qty)]
+
+
+def timestamps(rng: Random, qty: int) -> list:
+    """ Datetimes of ten years with seconds. """
+    first = datetime.combine(FIRST_DATE, datetime.min.time())
+    return [first + timedelta(seconds=rng.randrange(DAYS_QTY * 86400)) for _ in range(qty)]
+
+
+def date_pairs(rng: Random, qty: int) -> list:
+    """ (begin, end) periods up to two years long, a quarter of them are whole months. """
+    pairs = []
+    for begin in dates(rng, qty):
+        if rng.random() < 0.25:
+            begin = begin.replace(day=1)
+            end = (begin + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        else:
+            end = begin + timedelta(days=rng.randrange(730))
+        pairs.append((begin, end))
+    return pairs
+
+
+def date_strings(rng: Random, qty: int) -> list:
+    """ ISO date strings. """
+    return [day.isoformat() for day in dates(rng, qty)]
+
+
+def ckeys(rng: Random, qty: int) -> list:
+    """ Composite keys region.shop.sku.day with empty days. """
+    return [
+        f'{rng.randrange(1, 80)}.{rng.randrange(1, 500)}.sku{rng.randrange(1000)}.'
+        f'{rng.randrange(1, 31) if rng.random() < 0.9 else ""}'
+        for _ in range(qty)
+    ]
+
+
+def inns(rng: Random, qty: int) -> list:
+    """ 10 and 12 digit inn strings. """
+    return [''.join(str(rng.randrange(10)) for _ in range(rng.choice((10, 12)))) for _ in range(qty)]
+
+
+def snils(rng: Random, qty: int) -> list:
+    """ 11 digit snils strings. """
+    return [''.join(str(rng.randrange(10)) for _ in range(11)) for _ in range(qty)]
+
+
+def small_values(rng: Random, qty: int) -> list:
+    """ Values with many repeats of different types. """
+    choices = (0, 1, False, 'False', (0, 0), 1.5, None, 'a')
+    return [rng.choice(choices) for _ in range(qty)]
+
+
+def nullable_columns(rng: Random, qty: int, columns_qty: int = 4) -> list:
+    """ Columns of ints with a half of None. """
+    return [[rng.randrange(100) if rng.random() < 0.5 else None for _ in range(qty)] for _ in range(columns_qty)]
+
+
+def hstores(rng: Random, qty: int) -> list:
+    """ hstore texts of 1-8 pairs with escapes and NULLs. """
+    result = []
+    for _ in range(qty):
+        pairs = []
+        for idx in range(rng.randrange(1, 9)):
+            value = rng.choice(('NULL', f'"{rng.randrange(10 ** 6)}"', '"some \\"quoted\\" text"', '"a, b => c"'))
+            pairs.append(f'"key{idx}"=>{value}')
+        result.append(', '.join(pairs))
+    return result
+
+
+def dicts(rng: Random, qty: int) -> list:
+    """ Flat dicts of 1-8 str/int/None values. """
+    values = (None, 'text "with" quotes')
+    return [
+        {
+            f'key{idx}': rng.choice(values) if rng.random() < 0.5 else rng.randrange(10 ** 6)
+            for idx in range(rng.randrange(1, 9))
+        }
+        for _ in range(qty)
+    ]
+
+
+def texts(rng: Random, qty: int) -> list:
+    """ Lines of 2-12 words. """
+    return [' '.join(rng.choice(WORDS) for _ in range(rng.randrange(2, 13))) for _ in range(qty)]
+
+
+def full_names(rng: Random, qty: int) -> list:
+    """ Full names of three words. """
+    return [' '.join(rng.choice(NAMES) for _ in range(3)) for _ in range(qty)]
+
+
+def number_strings(rng: Random, qty: int) -> list:
+    """ Strings with digits and noise. """
+    return [f'-a{rng.randrange(10 ** 6)}h{rng.randrange(1000)}kl;' for _ in range(qty)]
+
+
+def digit_strings(rng: Random, qty: int) -> list:
+    """ Integer and float strings, every tenth one is not a number. """
+    return [
+        'n/a' if rng.random() < 0.1 else f'{rng.randrange(-10 ** 6, 10 ** 6)}' if rng.random() < 0.5 else
+        f'{rng.uniform(-10 ** 6, 10 ** 6):.3f}'
+        for _ in range(qty)
+    ]
+
+
+def numbers(rng: Random, qty: int) -> list:
+    """ Ints and floats up to a billion. """
+    return [rng.randrange(10 ** 9) if rng.random() < 0.5 else rng.uniform(0, 10 ** 9) for _ in range(qty)]
+
+
+def sql_query(rng: Random, qty: int) -> str:
+    """ INSERT statement of qty rows with quoted NULLs, line breaks and cyrillic text. """
+    rows = ',\n    '.join(
+        f"({rng.randrange(10 ** 6)}, '{rng.choice(NAMES)}', 'NULL', '\"текст\"', '{day.isoformat()}')"
+        for day in dates(rng, qty)
+    )
+    return f'INSERT INTO t (id, name, note, comment, day)\nVALUES\n    {rows}'
+
+
+def nested_dicts(rng: Random, qty: int) -> list:
+    """ Flat dicts with a nested dict of 1-4 values in a half of them. """
+    result = dicts(rng, qty)
+    for item in result:
+        if rng.random() < 0.5:
+            item['nested'] = {f'inner{idx}': str(rng.randrange(10 ** 6)) for idx in range(rng.randrange(1, 5))}
+    return result
+
+
+def copy_rows(rng: Random, qty: int) -> list:
+    """ Rows of (int, text, date, float, bool, dict) with None values. """
+    days = dates(rng, qty)
+    return [
+        (
+            rng.randrange(10 ** 9), rng.choice(NAMES + ('tab\tand\nline', None)), day,
+            rng.uniform(-10 ** 6, 10 ** 6), rng.random() < 0.5, {'key': str(rng.randrange(100))}
+        )
+        for day in days
+    ]
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+""" IMPORT TIME BENCHMARK OF PY_DATATOOLS.
+    Each scenario runs in a fresh interpreter with -X importtime, the sum of the cumulative import times of
+    all modules imported by the scenario is divided by the import time of the interpreter startup and the median
+    of the ratios is compared with the baseline. A scenario also fails, if it imports a forbidden module.
+
+    python benchmarks/import_time.py                 # compare with benchmarks/baselines/import_time.json
+    python benchmarks/import_time.py --save          # write the baseline
+    python benchmarks/import_time.py --threshold 0.5 # allowed slowdown, 0.25 by default
+"""
+__author__ = 'kokarev.nv'
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baselines', 'import_time.json')
+# modules of the COPY format, CKeyIndex and the logging of SQL, that are imported on the first use
+LAZY_MODULES = ('py_datatools.sql_copy', 'py_datatools.ckey_index', 'logging', 'uuid', 'decimal', 'struct', 'json')
+# scenario: (statement, modules, that must not be imported)
+SCENARIOS = {
+    'package': (
+        'import py_datatools',
+        ('py_datatools.common', 'py_datatools.py_datatools', 'py_datatools.dt_helper') + LAZY_MODULES
+    ),
+    'try_bool': (
+        'import py_datatools; py_datatools.try_bool',
+        ('py_datatools.py_datatools', 'py_datatools.dt_helper', 're', 'typing') + LAZY_MODULES
+    ),
+    'dt_helper': (
+        'import py_datatools; py_datatools.to_start_of_month', ('py_datatools.py_datatools',) + LAZY_MODULES
+    ),
+    'all': ('from py_datatools import *', ()),
+}
+MIN_SLOWDOWN = 0.1  # noise of small timings, part of the interpreter startup time
+
+
+def import_times(statement: str) -> dict:
+    """ Cumulative import times of the modules imported by the statement.
+
+    Args:
+        statement: python code
+    Returns:
+        module name: microseconds, nested modules are indented
+    """
+    # bytecode is written, otherwise the compilation of the modules is measured
+    env = {key: value for key, value in os.environ.items() if key != 'PYTHONDONTWRITEBYTECODE'}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement], cwd=ROOT, env=env, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # nested modules are indented after the separator
+        times[name[1:].rstrip()] = int(cumulative)
+    return times
+
+
+def _top_level_us(times: dict, skip: set = frozenset()) -> int:
+    """ Import time of the statement: the cumulative time of the top level modules covers the nested ones.
+
+    Args:
+        times: result of import_times()
+        skip: modules of the interpreter startup
+    Returns:
+        microseconds
+    """
+    return sum(us for name, us in times.items() if not name.startswith(' ') and name not in skip)
+
+
+def measure(runs: int) -> dict:
+    """ Measure the scenarios. The times are relative to the import time of the interpreter startup (`pass`),
+        so the baseline does not depend on the speed of the machine. The startup is measured before each run
+        of the scenarios, the median of the ratios of the runs is less sensitive to the load of the machine.
+
+    Args:
+        runs: number of runs of each scenario
+    Returns:
+        scenario: {
+            'ratio': median time / startup time, 'us': best microseconds, 'modules': imported modules of the package,
+            'forbidden': imported modules, that must not be imported
+        }
+    """
+    # the names are indented by the nesting, that differs between the startup and the scenarios
+    startup = {name.strip() for name in import_times('pass')}
+    # warm up: bytecode of the modules
+    for statement, _ in SCENARIOS.values():
+        import_times(statement)
+    ratios = {scenario: [] for scenario in SCENARIOS}
+    totals = {scenario: [] for scenario in SCENARIOS}
+    modules = {scenario: set() for scenario in SCENARIOS}
+    for _ in range(runs):
+        startup_us = _top_level_us(import_times('pass'))
+        for scenario, (statement, _) in SCENARIOS.items():
+            times = import_times(statement)
+            total = _top_level_us(times, startup)
+            ratios[scenario].append(total / startup_us)
+            totals[scenario].append(total)
+            modules[scenario].update(name.strip() for name in times if name.strip() not in startup)
+    # the other modules depend on the interpreter and the site packages of the host, they are not saved
+    return {
+        scenario: {
+            'ratio': round(statistics.median(ratios[scenario]), 3), 'us': min(totals[scenario]),
+            'modules': sorted(name for name in modules[scenario] if name.startswith('py_datatools')),
+            'forbidden': sorted(modules[scenario] & set(forbidden))
+        }
+        for scenario, (_, forbidden) in SCENARIOS.items()
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """ Regressions of the results.
+
+    Args:
+        results: results of measure()
+        baseline: saved results of measure()
+        threshold: allowed relative slowdown
+    Returns:
+        messages about the regressions
+    """
+    regressions = []
+    for scenario in SCENARIOS:
+        if results[scenario]['forbidden']:
+            regressions.append(f'{scenario}: eagerly imports {", ".join(results[scenario]["forbidden"])}')
+        base_ratio = baseline.get(scenario, {}).get('ratio')
+        ratio = results[scenario]['ratio']
+        if base_ratio and ratio > base_ratio * (1 + threshold) and ratio - base_ratio > MIN_SLOWDOWN:
+            regressions.append(
+                f'{scenario}: {ratio:.2f} x startup, baseline {base_ratio:.2f} x startup '
+                f'(+{ratio / base_ratio - 1:.0%})'
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=15, help='runs of each scenario')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative slowdown')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline json file')
+    parser.add_argument('--save', action='store_true', help='save the results as the baseline')
+    args = parser.parse_args()
+
+    results = measure(args.runs)
+    for scenario, result in results.items():
+        print(f'{scenario:<10} {result["ratio"]:>6.2f} x startup {result["us"]:>8} us  {", ".join(result["modules"])}')
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as file_obj:
+            json.dump(results, file_obj, indent=4, sort_keys=True)
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file_obj:
+            baseline = json.load(file_obj)
+    regressions = compare(results, baseline, args.threshold)
+    for message in regressions:
+        print(f'REGRESSION {message}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
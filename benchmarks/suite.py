@@ -0,0 +1,531 @@
+# -*- coding: utf-8 -*-
+""" BENCHMARK SUITE OF THE PUBLIC HOT PATHS OF PY_DATATOOLS.
+    Every public function of the package and every public method of its helper classes has a case, except the
+    names of UNMEASURED, compare fails on a public name without a case. The classes of dt_helper are measured by
+    their constructors and main methods.
+    Every case runs over deterministic synthetic data (benchmarks/data.py) of each scale up to the maximum scale
+    of the case (quadratic ones are capped), the lru caches of the package are cleared before every run.
+    The best time of the repeats gives the throughput. A separate run under tracemalloc gives the peak memory and
+    the retained blocks: memory blocks allocated by the run and still alive after it (its result and caches).
+    Short-lived allocations are not counted, they show in the peak memory only.
+
+    python benchmarks/suite.py run                        # print the results
+    python benchmarks/suite.py run --output results.json  # and write them
+    python benchmarks/suite.py save                       # write the baseline benchmarks/baselines/suite.json
+    python benchmarks/suite.py compare                    # run and compare with the baseline
+    python benchmarks/suite.py compare --results results.json --threshold 0.5
+    python benchmarks/suite.py run --scales 1e6,1e7 --filter dt.   # large scales are opt-in
+"""
+__author__ = 'kokarev.nv'
+
+import gc
+import io
+import os
+import sys
+import json
+import logging
+import argparse
+import tracemalloc
+from importlib.util import find_spec
+from random import Random
+from time import perf_counter
+from datetime import date, timedelta
+from typing import Any, Callable, NamedTuple, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import data  # noqa: E402
+import py_datatools  # noqa: E402
+from py_datatools import (  # noqa: E402
+    exec_if_cond, raise_if_cond, try_true, try_false, try_bool, Collections, Numbers, CKey, Text, Validators, SQLHelper,
+    CopyWriter, TypeInferrer, dt_helper
+)
+from py_datatools import py_datatools as helpers  # noqa: E402
+
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baselines', 'suite.json')
+DEFAULT_SCALES = (10 ** 3, 10 ** 4, 10 ** 5)
+SEED = 20230517
+MIN_SLOWDOWN_S = 0.0005  # noise of small timings
+MIN_PEAK_GROWTH_KIB = 64
+MIN_RETAINED_BLOCKS_GROWTH = 256
+MIN_REPEATS_S = 0.2  # small cases are repeated at least this long
+REPEATS_BUDGET_S = 2.0  # repeats stop, when the case took longer
+
+
+class Case(NamedTuple):
+    """ Benchmark case: make(rng, qty) builds the data once, run(data) is measured, the case is skipped without
+        the optional dependency `requires`.
+    """
+    make: Callable[[Random, int], Any]
+    run: Callable[[Any], Any]
+    max_scale: int = 10 ** 7
+    requires: Optional[str] = None
+
+
+CKEY = CKey(['region', 'shop', 'sku', 'day'], [int, int, str, int])
+TODAY = date(2020, 6, 15)
+COPY_COLUMNS = [
+    ('id', 'bigint'), ('name', 'text'), ('day', 'date'), ('value', 'double precision'), ('flag', 'boolean'),
+    ('attrs', 'hstore')
+]
+# public names without their own cases: constants, result types (CKeyIndex is measured by the ckey.index cases)
+# and the introspection of the caches
+UNMEASURED = {
+    'CKey.DELIMETER', 'CKeyIndex', 'SQLHelper.PgSqlType', 'SQLHelper.LazyHstoreDict', 'SQLHelper.statement_cache_info',
+    'AggregatePlan', 'AggregatePiece', 'AggregateSegment', 'AggregateSummary'
+}
+# prefix of the case names: owner of the measured names
+CASE_PREFIXES = {
+    'common': '', 'copy': '', 'collections': 'Collections.', 'numbers': 'Numbers.', 'ckey': 'CKey.', 'text': 'Text.',
+    'validators': 'Validators.', 'sql': 'SQLHelper.', 'dt': ''
+}
+SQL_LOGGER = logging.getLogger('py_datatools.benchmarks')
+SQL_LOGGER.addHandler(logging.NullHandler())
+SQL_LOGGER.setLevel(logging.DEBUG)
+SQL_LOGGER.propagate = False
+_prepared = SQLHelper.prepare_sql(lambda sql_query: sql_query)
+
+
+def _pairs_columns(rng: Random, qty: int) -> tuple:
+    pairs = data.date_pairs(rng, qty)
+    return [begin for begin, _ in pairs], [end for _, end in pairs]
+
+
+def _each(func: Callable, *args, **kwargs) -> Callable:
+    """ Run of func(value, *args, **kwargs) for every value of the data. """
+    return lambda values: [func(value, *args, **kwargs) for value in values]
+
+
+def _each_pair(func: Callable, *args, **kwargs) -> Callable:
+    """ Run of func(begin, end, *args, **kwargs) for every pair of the data. """
+    return lambda pairs: [func(begin, end, *args, **kwargs) for begin, end in pairs]
+
+
+def _times(func: Callable, *args) -> Callable:
+    """ Run of func(*args) qty times for the functions without input, the data is range(qty). """
+    return lambda values: [func(*args) for _ in values]
+
+
+def _range(rng: Random, qty: int) -> range:
+    return range(qty)
+
+
+def _nested_hstores(rng: Random, qty: int) -> list:
+    return [SQLHelper.dict_to_hstore(value) for value in data.nested_dicts(rng, qty)]
+
+
+def _copy(rows: list, binary: bool) -> int:
+    writer = CopyWriter(COPY_COLUMNS, io.BytesIO() if binary else io.StringIO(), binary=binary)
+    writer.write_rows(rows)
+    writer.close()
+    return writer.rows_qty
+
+
+def _infer(values: list) -> Any:
+    inferrer = TypeInferrer()
+    inferrer.update(values)
+    return inferrer.pg_type
+
+
+def _today_scope(values: range) -> None:
+    for _ in values:
+        with dt_helper.today_scope(TODAY):
+            pass
+
+
+def _period_aggregator(rng: Random, qty: int) -> tuple:
+    aggregator = dt_helper.PeriodAggregator()
+    aggregator.update(data.timestamps(rng, qty), [rng.random() for _ in range(qty)])
+    return aggregator, data.date_pairs(rng, 1000)
+
+
+CASES = {
+    # common functions
+    'common.exec_if_cond': Case(data.small_values, _each(lambda value: exec_if_cond(value, str, value))),
+    'common.raise_if_cond': Case(data.small_values, _each(lambda value: raise_if_cond(value == 'missing', ''))),
+    'common.try_true': Case(data.small_values, _each(try_true)),
+    'common.try_false': Case(data.small_values, _each(try_false)),
+    'common.try_bool': Case(data.small_values, _each(try_bool)),
+    # Collections
+    'collections.coalesce': Case(
+        data.nullable_columns, lambda columns: [Collections.coalesce(*row) for row in zip(*columns)]
+    ),
+    'collections.distinct': Case(data.small_values, lambda values: Collections.distinct(*values), 10 ** 4),
+    'collections.coalesce_columns': Case(
+        data.nullable_columns, lambda columns: Collections.coalesce_columns(*columns)
+    ),
+    'collections.get_diff_list': Case(
+        lambda rng, qty: (data.small_values(rng, qty), data.small_values(rng, qty // 2)),
+        lambda args: Collections.get_diff_list(*args), 10 ** 4
+    ),
+    'collections.get_common_uniques': Case(
+        lambda rng, qty: (data.ckeys(rng, qty), data.ckeys(rng, qty)),
+        lambda args: Collections.get_common_uniques(*args), 10 ** 4
+    ),
+    'collections.is_subset': Case(
+        lambda rng, qty: (data.ckeys(rng, qty), data.ckeys(rng, qty)),
+        lambda args: Collections.is_subset(*args), 10 ** 3
+    ),
+    'collections.split_sequence_gen': Case(
+        data.ckeys, lambda values: list(Collections.split_sequence_gen(values, 100))
+    ),
+    'collections.extract_subelements': Case(
+        lambda rng, qty: [tuple(data.small_values(rng, 3)) for _ in range(qty)], Collections.extract_subelements
+    ),
+    # Numbers
+    'numbers.parse_int': Case(data.number_strings, lambda values: [Numbers.parse_int(value) for value in values]),
+    'numbers.try_int': Case(data.digit_strings, _each(Numbers.try_int)),
+    'numbers.try_float': Case(data.digit_strings, _each(Numbers.try_float)),
+    'numbers.get_formatted_tooltip': Case(data.numbers, _each(Numbers.get_formatted_tooltip)),
+    'numbers.unique_id': Case(_range, _times(Numbers.unique_id)),
+    'numbers.digitize_string': Case(
+        data.number_strings, lambda values: [Numbers.digitize_string(value) for value in values]
+    ),
+    # CKey
+    'ckey.unpack_dict': Case(data.ckeys, _each(CKEY.unpack_dict)),
+    'ckey.unpack': Case(data.ckeys, _each(CKEY.unpack, 'region', 'sku')),
+    'ckey.unpack_list': Case(data.ckeys, lambda compk_list: list(CKEY.unpack_list(compk_list))),
+    'ckey.decode': Case(data.ckeys, _each(CKEY.decode)),
+    'ckey.pack': Case(
+        lambda rng, qty: [CKEY.unpack_dict(compk) for compk in data.ckeys(rng, qty)],
+        lambda dicts: [CKEY.pack(keys_dict) for keys_dict in dicts]
+    ),
+    'ckey.index': Case(data.ckeys, CKEY.index, 10 ** 6),
+    'ckey.index.prefix': Case(
+        lambda rng, qty: CKEY.index(data.ckeys(rng, qty)),
+        lambda index: [index.prefix(region) for region in range(1, 80)], 10 ** 6
+    ),
+    'ckey.join': Case(
+        lambda rng, qty: (data.ckeys(rng, qty), data.ckeys(rng, qty)),
+        lambda args: sum(1 for _ in CKEY.join(*args, on=['region', 'shop', 'sku'])), 10 ** 6
+    ),
+    # Text
+    'text.crop_text_line_by_line': Case(
+        data.texts, lambda lines: [Text.crop_text_line_by_line(line, 2, 16) for line in lines], 10 ** 6
+    ),
+    'text.parse_string_full_name': Case(
+        data.full_names, lambda names: [Text.parse_string_full_name(name) for name in names], 10 ** 6
+    ),
+    # Validators
+    'validators.validate_inn': Case(data.inns, lambda inns: [Validators.validate_inn(inn) for inn in inns]),
+    'validators.validate_snils': Case(
+        data.snils, lambda values: [Validators.validate_snils(value) for value in values]
+    ),
+    # SQLHelper, the sql texts have qty rows
+    'sql.prepare_sql': Case(data.sql_query, _prepared),
+    'sql.normalize_sql': Case(data.sql_query, SQLHelper.normalize_sql),
+    'sql.logging_sql': Case(data.sql_query, SQLHelper.logging_sql),
+    'sql.iter_sql_pages': Case(data.sql_query, lambda query: sum(1 for _ in SQLHelper.iter_sql_pages(query))),
+    'sql.iter_sql_pages.bytes': Case(
+        lambda rng, qty: data.sql_query(rng, qty).encode(),
+        lambda query: sum(1 for _ in SQLHelper.iter_sql_pages(query))
+    ),
+    'sql.log_sql': Case(data.sql_query, lambda query: SQLHelper.log_sql(query, SQL_LOGGER)),
+    'sql.hstore_to_dict': Case(data.hstores, lambda values: [SQLHelper.hstore_to_dict(value) for value in values]),
+    'sql.hstore_to_dict_many': Case(data.hstores, SQLHelper.hstore_to_dict_many),
+    'sql.hstore_to_dict_recursive': Case(_nested_hstores, _each(SQLHelper.hstore_to_dict_recursive)),
+    'sql.hstore_to_dict_recursive.lazy': Case(
+        _nested_hstores, _each(SQLHelper.hstore_to_dict_recursive, lazy=True)
+    ),
+    'sql.dict_to_hstore': Case(data.dicts, lambda dicts: [SQLHelper.dict_to_hstore(value) for value in dicts]),
+    'sql.dicts_to_hstore_many': Case(data.dicts, SQLHelper.dicts_to_hstore_many),
+    'sql.build_in_queries': Case(
+        lambda rng, qty: list(range(qty)),
+        lambda params: list(SQLHelper.build_in_queries('SELECT * FROM t WHERE id IN ({})', params))
+    ),
+    'sql.build_values_queries': Case(
+        lambda rng, qty: [(idx, f'name{idx}', None) for idx in range(qty)],
+        lambda rows: list(SQLHelper.build_values_queries('INSERT INTO t (id, name, note) VALUES {}', rows))
+    ),
+    'copy.CopyWriter.text': Case(data.copy_rows, lambda rows: _copy(rows, False)),
+    'copy.CopyWriter.binary': Case(data.copy_rows, lambda rows: _copy(rows, True)),
+    'copy.TypeInferrer': Case(data.digit_strings, _infer),
+    'sql.infer_pg_type': Case(data.digit_strings, SQLHelper.infer_pg_type),
+    'sql.infer_pg_types': Case(
+        lambda rng, qty: {
+            'id': list(range(qty)), 'value': data.digit_strings(rng, qty), 'day': data.date_strings(rng, qty)
+        },
+        SQLHelper.infer_pg_types
+    ),
+    # dt_helper
+    'dt.is_period_week': Case(data.date_pairs, _each_pair(dt_helper.is_period_week)),
+    'dt.is_period_month': Case(data.date_pairs, _each_pair(dt_helper.is_period_month)),
+    'dt.is_period_quarter': Case(data.date_pairs, _each_pair(dt_helper.is_period_quarter)),
+    'dt.is_period_half_year': Case(data.date_pairs, _each_pair(dt_helper.is_period_half_year)),
+    'dt.is_period_year': Case(data.date_pairs, _each_pair(dt_helper.is_period_year)),
+    'dt.is_period_day': Case(data.date_pairs, _each_pair(dt_helper.is_period_day)),
+    'dt.is_period_other': Case(data.date_pairs, _each_pair(dt_helper.is_period_other)),
+    'dt.classify_period': Case(data.date_pairs, _each_pair(dt_helper.classify_period)),
+    'dt.classify_periods': Case(data.date_pairs, dt_helper.classify_periods),
+    'dt.get_some_days_ago': Case(data.dates, _each(dt_helper.get_some_days_ago, 10)),
+    'dt.get_current_dot_position': Case(
+        data.date_pairs, lambda pairs: [dt_helper.get_current_dot_position(*pair, pair[0], TODAY) for pair in pairs]
+    ),
+    'dt.get_begin_period': Case(data.dates, _each(dt_helper.get_begin_period)),
+    'dt.get_end_period': Case(data.dates, _each(dt_helper.get_end_period)),
+    'dt.get_default_datebegin': Case(_range, _times(dt_helper.get_default_datebegin)),
+    'dt.get_default_dateend': Case(_range, _times(dt_helper.get_default_dateend)),
+    'dt.get_today': Case(_range, _times(dt_helper.get_today)),
+    'dt.today_scope': Case(_range, _today_scope),
+    'dt.parse_date': Case(data.date_strings, _each(dt_helper.parse_date)),
+    'dt.parse_dates_many': Case(data.date_strings, dt_helper.parse_dates_many),
+    'dt.to_start_of_month': Case(data.dates, lambda days: [dt_helper.to_start_of_month(day) for day in days]),
+    'dt.to_start_of_hour': Case(data.timestamps, _each(dt_helper.to_start_of_hour)),
+    'dt.to_end_of_month': Case(data.dates, lambda days: [dt_helper.to_end_of_month(day) for day in days]),
+    'dt.to_end_of_day': Case(data.dates, _each(dt_helper.to_end_of_day)),
+    'dt.to_begin_of_day': Case(data.dates, _each(dt_helper.to_begin_of_day)),
+    'dt.to_begin_of_year': Case(data.dates, _each(dt_helper.to_begin_of_year)),
+    'dt.to_end_of_year': Case(data.dates, _each(dt_helper.to_end_of_year)),
+    'dt.to_start_of_prev_month': Case(data.dates, _each(dt_helper.to_start_of_prev_month)),
+    'dt.is_full_month': Case(data.date_pairs, _each_pair(dt_helper.is_full_month)),
+    'dt.is_eq_year': Case(data.date_pairs, _each_pair(dt_helper.is_eq_year)),
+    'dt.is_eq_month': Case(data.date_pairs, _each_pair(dt_helper.is_eq_month)),
+    'dt.is_eq_two_month': Case(data.date_pairs, _each_pair(dt_helper.is_eq_two_month)),
+    'dt.get_prev_date_by_month': Case(
+        data.dates, _each(dt_helper.get_prev_date_by_month, dt_helper.PERIOD_TYPE_MONTH)
+    ),
+    'dt.is_last_month_day': Case(data.dates, _each(dt_helper.is_last_month_day)),
+    'dt.is_first_month_day': Case(data.dates, _each(dt_helper.is_first_month_day)),
+    'dt.begin_of_current_quarter': Case(
+        data.dates, lambda days: [dt_helper.begin_of_current_quarter(day) for day in days]
+    ),
+    'dt.end_of_current_quarter': Case(data.dates, _each(dt_helper.end_of_current_quarter)),
+    'dt.get_quarter_name': Case(data.dates, lambda days: [dt_helper.get_quarter_name(day) for day in days]),
+    'dt.get_infinity_date': Case(data.dates, _each(dt_helper.get_infinity_date)),
+    'dt.timedelta_months': Case(data.dates, lambda days: [dt_helper.timedelta_months(day, 5) for day in days]),
+    'dt.in_current_period': Case(data.date_pairs, _each_pair(dt_helper.in_current_period, today=TODAY)),
+    'dt.in_current_period_many': Case(
+        _pairs_columns, lambda columns: dt_helper.in_current_period_many(*columns, today=TODAY)
+    ),
+    'dt.delta_month_two_period': Case(data.date_pairs, _each_pair(dt_helper.delta_month_two_period)),
+    'dt.delta_month_two_period_many': Case(
+        _pairs_columns, lambda columns: dt_helper.delta_month_two_period_many(*columns)
+    ),
+    'dt.split_dates_for_aggregate': Case(
+        data.date_pairs, lambda pairs: [dt_helper.split_dates_for_aggregate(*pair) for pair in pairs]
+    ),
+    'dt.get_left_for_aggregate': Case(data.date_pairs, _each_pair(dt_helper.get_left_for_aggregate)),
+    'dt.get_right_for_aggregate': Case(
+        lambda rng, qty: [
+            (*pair, dt_helper.get_left_for_aggregate(*pair)[1]) for pair in data.date_pairs(rng, qty)
+        ],
+        lambda triples: [dt_helper.get_right_for_aggregate(*triple) for triple in triples]
+    ),
+    'dt.split_dates_by_aggregates': Case(
+        data.date_pairs, lambda pairs: [dt_helper.split_dates_by_aggregates(*pair) for pair in pairs], 10 ** 4
+    ),
+    'dt.plan_aggregates': Case(data.date_pairs, dt_helper.plan_aggregates),
+    'dt.iter_periods': Case(
+        data.date_pairs, lambda pairs: sum(1 for pair in pairs for _ in dt_helper.iter_periods(*pair))
+    ),
+    'dt.periods_array': Case(data.date_pairs, _each_pair(dt_helper.periods_array), requires='numpy'),
+    'dt.prior_period_dates': Case(data.dates, dt_helper.prior_period_dates),
+    'dt.align_prior_period': Case(data.dates, dt_helper.align_prior_period),
+    'dt.bucket_counts': Case(data.timestamps, dt_helper.bucket_counts),
+    'dt.BucketCounter': Case(data.timestamps, lambda timestamps: dt_helper.BucketCounter().update(timestamps)),
+    'dt.PeriodIndex': Case(data.date_pairs, dt_helper.PeriodIndex, 10 ** 6),
+    'dt.PeriodIndex.overlap': Case(
+        lambda rng, qty: (dt_helper.PeriodIndex(data.date_pairs(rng, qty)), data.date_pairs(rng, 1000)),
+        lambda args: [args[0].overlap(*pair) for pair in args[1]], 10 ** 4
+    ),
+    'dt.PeriodIndex.contains_many': Case(
+        lambda rng, qty: (dt_helper.PeriodIndex(data.date_pairs(rng, qty)), data.dates(rng, 1000)),
+        lambda args: args[0].contains_many(args[1]), 10 ** 4
+    ),
+    'dt.PeriodAggregator.update': Case(
+        lambda rng, qty: (data.timestamps(rng, qty), [rng.random() for _ in range(qty)]),
+        lambda args: dt_helper.PeriodAggregator(retention=timedelta(days=400)).update(*args)
+    ),
+    'dt.PeriodAggregator.query': Case(
+        _period_aggregator, lambda args: [args[0].query(*pair) for pair in args[1]], 10 ** 5
+    ),
+}
+
+
+def _cached_functions() -> list:
+    """ lru_cache functions of the package, their caches are cleared before every run of the cases.
+
+    Returns:
+        functions with cache_clear
+    """
+    return [
+        value for module in (helpers, dt_helper) for value in vars(module).values()
+        if callable(getattr(value, 'cache_clear', None))
+    ]
+
+
+CACHED_FUNCTIONS = _cached_functions()
+
+
+def _clear_caches():
+    for func in CACHED_FUNCTIONS:
+        func.cache_clear()
+
+
+def uncovered() -> list:
+    """ Public names of the package and public attributes of its helper classes without cases.
+
+    Returns:
+        names, e.g. ['SQLHelper.log_sql']
+    """
+    covered = set()
+    for case_name in CASES:
+        prefix, name = case_name.split('.')[:2]
+        covered.add(f'{CASE_PREFIXES[prefix]}{name}')
+    names = set(py_datatools.__all__)
+    for class_name in ('Collections', 'Numbers', 'CKey', 'Text', 'Validators', 'SQLHelper'):
+        names.update(f'{class_name}.{attr}' for attr in vars(getattr(helpers, class_name)) if not attr.startswith('_'))
+    names -= set(CASE_PREFIXES[prefix].rstrip('.') for prefix in CASE_PREFIXES)
+    return sorted(names - covered - UNMEASURED)
+
+
+def measure_case(case: Case, qty: int, repeats: int, seed: int = SEED) -> dict:
+    """ Measure the case over the data of the scale. The lru caches of the package are cleared before every run.
+
+    Args:
+        case: benchmark case
+        qty: scale, number of items
+        repeats: number of timed runs, fast cases are run more, slow ones less
+        seed: seed of the data generator
+    Returns:
+        {
+            'seconds': best time, 'ops': items per second, 'peak_kib': tracemalloc peak,
+            'retained_blocks': memory blocks allocated by the run and still alive after it
+        }
+    """
+    case_data = case.make(Random(seed), qty)
+    gc.collect()
+    times = []
+    while (len(times) < repeats or sum(times) < MIN_REPEATS_S) and sum(times) < REPEATS_BUDGET_S:
+        _clear_caches()
+        started = perf_counter()
+        case.run(case_data)
+        times.append(perf_counter() - started)
+
+    _clear_caches()
+    gc.collect()
+    tracemalloc.start()
+    result = case.run(case_data)
+    _, peak = tracemalloc.get_traced_memory()
+    # every trace of the snapshot is a block allocated by the run: its result and the filled caches
+    snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+    tracemalloc.stop()
+    del result
+
+    seconds = min(times)
+    return {
+        'seconds': seconds,
+        'ops': round(qty / seconds) if seconds else None,
+        'peak_kib': round(peak / 1024, 1),
+        'retained_blocks': sum(stat.count for stat in snapshot.statistics('filename')),
+    }
+
+
+def measure(scales: tuple, name_filter: str = '', repeats: int = 5) -> dict:
+    """ Measure the cases.
+
+    Args:
+        scales: numbers of items, scales above the maximum scale of a case are skipped
+        name_filter: substring of the case names
+        repeats: number of timed runs
+    Returns:
+        case name: {scale: result of measure_case}
+    """
+    results = {}
+    for name, case in CASES.items():
+        if name_filter not in name:
+            continue
+        if case.requires and find_spec(case.requires) is None:
+            print(f'{name:<32} skipped, {case.requires} is not installed', flush=True)
+            continue
+        for qty in scales:
+            if qty > case.max_scale:
+                continue
+            result = measure_case(case, qty, repeats)
+            results.setdefault(name, {})[str(qty)] = result
+            print(
+                f'{name:<32} {qty:>9} {result["ops"] or 0:>12} ops/s {result["peak_kib"]:>12} KiB '
+                f'{result["retained_blocks"]:>9} retained blocks', flush=True
+            )
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """ Regressions of the results.
+
+    Args:
+        results: results of measure()
+        baseline: saved results of measure()
+        threshold: allowed relative growth of the time, the peak memory and the retained blocks
+    Returns:
+        messages about the regressions
+    """
+    regressions = []
+    for name, scales in results.items():
+        for qty, result in scales.items():
+            base = baseline.get(name, {}).get(qty)
+            if not base:
+                continue
+            checks = (
+                ('time', result['seconds'], base['seconds'], MIN_SLOWDOWN_S),
+                ('peak memory', result['peak_kib'], base['peak_kib'], MIN_PEAK_GROWTH_KIB),
+                ('retained blocks', result['retained_blocks'], base['retained_blocks'], MIN_RETAINED_BLOCKS_GROWTH),
+            )
+            for metric, value, base_value, min_growth in checks:
+                if value > base_value * (1 + threshold) and value - base_value > min_growth:
+                    growth = f' (+{value / base_value - 1:.0%})' if base_value > 0 else ''
+                    regressions.append(f'{name} [{qty}]: {metric} {value:g}, baseline {base_value:g}{growth}')
+    return regressions
+
+
+def _parse_scales(value: str) -> tuple:
+    return tuple(int(float(scale)) for scale in value.split(','))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('run', 'save', 'compare'))
+    parser.add_argument('--scales', type=_parse_scales, default=DEFAULT_SCALES, help='comma separated, e.g. 1e3,1e5')
+    parser.add_argument('--filter', default='', help='substring of the case names')
+    parser.add_argument('--repeats', type=int, default=5, help='number of timed runs of each case')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative growth')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline json file')
+    parser.add_argument('--output', help='write the results of run into the json file')
+    parser.add_argument('--results', help='compare the saved results instead of running the cases')
+    args = parser.parse_args()
+
+    if args.command == 'compare' and args.results:
+        with open(args.results) as file_obj:
+            results = json.load(file_obj)
+    else:
+        results = measure(args.scales, args.filter, args.repeats)
+
+    output = args.baseline if args.command == 'save' else args.output
+    if output:
+        baseline = {}
+        if args.command == 'save' and os.path.exists(output):
+            # partial runs (--filter, --scales) update the baseline
+            with open(output) as file_obj:
+                baseline = json.load(file_obj)
+        for name, scales in results.items():
+            baseline.setdefault(name, {}).update(scales)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as file_obj:
+            json.dump(baseline, file_obj, indent=4, sort_keys=True)
+    if args.command != 'compare':
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file_obj:
+            baseline = json.load(file_obj)
+    regressions = compare(results, baseline, args.threshold)
+    regressions.extend(f'{name}: no benchmark case' for name in uncovered())
+    for message in regressions:
+        print(f'REGRESSION {message}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
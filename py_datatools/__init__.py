@@ -8,47 +8,53 @@ INIT PY_DATATOOLS
 """
 __author__ = 'kokarev.nv'
 
-from .py_datatools import (
-    exec_if_cond, raise_if_cond, try_true, try_false, try_bool, Collections, Numbers, Text, CKey, Validators,
-    SQLHelper
-)
-from .dt_helper import (
-    is_period_week,
-    is_period_month,
-    is_period_quarter,
-    is_period_half_year,
-    is_period_year,
-    is_period_day,
-    is_period_other,
-    get_some_days_ago,
-    get_current_dot_position,
-    get_begin_period,
-    get_end_period,
-    get_default_datebegin,
-    get_default_dateend,
-    to_start_of_month,
-    to_start_of_hour,
-    to_end_of_month,
-    to_end_of_day,
-    to_begin_of_day,
-    to_begin_of_year,
-    to_end_of_year,
-    to_start_of_prev_month,
-    is_full_month,
-    is_eq_year,
-    is_eq_month,
-    is_eq_two_month,
-    get_prev_date_by_month,
-    in_current_period,
-    is_last_month_day,
-    is_first_month_day,
-    begin_of_current_quarter,
-    end_of_current_quarter,
-    timedelta_months,
-    get_quarter_name,
-    get_infinity_date,
-    delta_month_two_period,
-    split_dates_for_aggregate,
-    get_left_for_aggregate,
-    get_right_for_aggregate
-)
+# public name: submodule, the submodules are imported on the first access to their names (PEP 562)
+_LAZY_NAMES = {
+    **dict.fromkeys(('exec_if_cond', 'raise_if_cond', 'try_true', 'try_false', 'try_bool'), 'common'),
+    **dict.fromkeys(('Collections', 'Numbers', 'Text', 'CKey', 'Validators', 'SQLHelper'), 'py_datatools'),
+    **dict.fromkeys(('CopyWriter', 'TypeInferrer'), 'sql_copy'),
+    'CKeyIndex': 'ckey_index',
+    **dict.fromkeys((
+        'is_period_week', 'is_period_month', 'is_period_quarter', 'is_period_half_year', 'is_period_year',
+        'is_period_day', 'is_period_other', 'classify_period', 'classify_periods', 'get_some_days_ago',
+        'get_current_dot_position', 'get_begin_period', 'get_end_period', 'get_default_datebegin',
+        'get_default_dateend', 'to_start_of_month', 'to_start_of_hour', 'to_end_of_month', 'to_end_of_day',
+        'to_begin_of_day', 'to_begin_of_year', 'to_end_of_year', 'to_start_of_prev_month', 'is_full_month',
+        'is_eq_year', 'is_eq_month', 'is_eq_two_month', 'get_prev_date_by_month', 'in_current_period',
+        'in_current_period_many', 'get_today', 'today_scope', 'is_last_month_day', 'is_first_month_day',
+        'begin_of_current_quarter', 'end_of_current_quarter', 'timedelta_months', 'get_quarter_name',
+        'get_infinity_date', 'delta_month_two_period', 'delta_month_two_period_many', 'split_dates_for_aggregate',
+        'get_left_for_aggregate', 'get_right_for_aggregate', 'plan_aggregates', 'AggregatePlan', 'AggregatePiece',
+        'split_dates_by_aggregates', 'AggregateSegment', 'iter_periods', 'periods_array', 'parse_date',
+        'parse_dates_many', 'PeriodIndex', 'bucket_counts', 'BucketCounter', 'prior_period_dates', 'align_prior_period',
+        'PeriodAggregator', 'AggregateSummary'
+    ), 'dt_helper'),
+}
+
+__all__ = list(_LAZY_NAMES)
+
+
+def __getattr__(name: str):
+    """ Import the submodule of the public name on the first access.
+
+    Args:
+        name: attribute name
+    Returns:
+        attribute of the submodule
+    """
+    module_name = _LAZY_NAMES.get(name)
+    if module_name is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    # the same as `from .module_name import name`, visible to -X importtime unlike importlib.import_module
+    value = getattr(__import__(module_name, globals(), fromlist=(name,), level=1), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    """ Names of the package including the not yet imported ones.
+
+    Returns:
+        sorted names
+    """
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+""" INDEX OF COMPOSITE KEYS OF CKey.
+"""
+__author__ = 'kokarev.nv'
+
+from array import array
+
+from bisect import bisect_left, bisect_right
+from typing import Optional, Sequence
+from .py_datatools import CKey, raise_if_cond
+
+
+class CKeyIndex:
+    """ Index of a list of composite keys of CKey.
+        Every key is decoded once, the values are stored by columns (int and float columns without empty values
+        as typed arrays). Full keys are hashed, indexes on leading keys and on join keys are built on demand.
+    """
+    TYPECODES = {int: 'q', float: 'd'}
+
+    def __init__(self, ckey: CKey, compk_list: Sequence[str]):
+        """ Builds the index.
+
+        Args:
+            ckey: composite key configuration.
+            compk_list: list of composite keys, empty keys are not indexed.
+        """
+        self.ckey = ckey
+        self.size = len(compk_list)
+        names_qty = len(ckey.NAMES)
+        self.empty = {pos for pos, compk in enumerate(compk_list) if not compk}
+        splitted = [
+            compk.split(ckey.DELIMETER) if compk else [''] * names_qty for compk in compk_list
+        ]
+        raise_if_cond(
+            any(len(parts) != names_qty for parts in splitted), 'Composite key has a wrong number of keys.', ValueError
+        )
+        # keys are decoded by columns, each distinct text value once
+        decoded_columns = []
+        for cast, texts in zip(ckey.TYPES, zip(*splitted) if splitted else [()] * names_qty):
+            values = {text: cast(text) for text in set(texts) if text}
+            decoded_columns.append([values.get(text) for text in texts])
+        self.full_index = {}
+        add_row = self.full_index.setdefault
+        for pos, row in enumerate(zip(*decoded_columns)):
+            if pos not in self.empty:
+                add_row(row, []).append(pos)
+        self.columns = {}
+        for name, cast, column in zip(ckey.NAMES, ckey.TYPES, decoded_columns):
+            typecode = self.TYPECODES.get(cast)
+            if typecode and column.count(None) == len(self.empty):
+                try:
+                    # positions of the empty keys are filled with zeros
+                    column = array(typecode, [0 if value is None else value for value in column])
+                except OverflowError:
+                    pass
+            self.columns[name] = column
+        self._prefix_indexes = {}
+        self._hash_indexes = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def row(self, pos: int) -> dict:
+        """ Values of the key at the position.
+
+        Args:
+            pos: position of the key in the list.
+        Returns:
+            dict of keys, None for an empty key.
+        """
+        if pos in self.empty:
+            return None
+        return {name: column[pos] for name, column in self.columns.items()}
+
+    def find(self, compk: str) -> list:
+        """ Positions of the composite key.
+
+        Args:
+            compk: text value of composite key.
+        Returns:
+            list of positions.
+        """
+        return list(self.full_index.get(self.ckey.decode(compk), ()))
+
+    @staticmethod
+    def _sort_key(values: Sequence) -> tuple:
+        """ Sortable representation of the values with empty ones, empty values go first.
+
+        Args:
+            values: values of keys.
+        Returns:
+            tuple of (is not empty, value) pairs.
+        """
+        return tuple((value is not None, value) for value in values)
+
+    def _prefix_index(self, qty: int) -> tuple:
+        """ Sorted index on the leading keys.
+
+        Args:
+            qty: number of the leading keys.
+        Returns:
+            sorted prefixes (sort keys, if there are empty values), positions in the same order
+            and the flag of sort keys.
+        """
+        if qty not in self._prefix_indexes:
+            columns = [self.columns[name] for name in self.ckey.NAMES[:qty]]
+            has_empty = any(
+                value is None for column in columns if not isinstance(column, array) for value in column
+            )
+            prefixes = list(zip(*columns))
+            if has_empty:
+                prefixes = [self._sort_key(prefix) for prefix in prefixes]
+            positions = [pos for pos in range(self.size) if pos not in self.empty]
+            positions.sort(key=prefixes.__getitem__)
+            self._prefix_indexes[qty] = ([prefixes[pos] for pos in positions], array('q', positions), has_empty)
+        return self._prefix_indexes[qty]
+
+    def prefix(self, *values) -> list:
+        """ Positions of the keys, that begin with the values.
+
+        Args:
+            values: values of the leading keys.
+        Returns:
+            list of positions in the order of the keys.
+        """
+        return self.prefix_range(values, values)
+
+    def prefix_range(self, low: Sequence, high: Sequence) -> list:
+        """ Positions of the keys, whose leading keys are between low and high (included).
+
+        Args:
+            low: lower values of the leading keys.
+            high: upper values of the leading keys, the same number as low.
+        Returns:
+            list of positions in the order of the keys.
+        """
+        raise_if_cond(len(low) != len(high), 'Bounds of the prefix have different lengths.', ValueError)
+        prefixes, positions, has_empty = self._prefix_index(len(low))
+        if has_empty:
+            low, high = self._sort_key(low), self._sort_key(high)
+            return positions[bisect_left(prefixes, low):bisect_right(prefixes, high)].tolist()
+        low, high = tuple(low), tuple(high)
+        # there are no empty values in the index, an empty value of a bound goes before all values:
+        # the keys begin from the leading part of the low bound and end before the leading part of the high one
+        begin = bisect_left(prefixes, low[:low.index(None)] if None in low else low)
+        end = bisect_left(prefixes, high[:high.index(None)]) if None in high else bisect_right(prefixes, high)
+        return positions[begin:end].tolist()
+
+    def _hash_index(self, on: tuple) -> dict:
+        """ Hash index on the keys.
+
+        Args:
+            on: names of the keys.
+        Returns:
+            dict of values of the keys: positions.
+        """
+        if on == tuple(self.ckey.NAMES):
+            return self.full_index
+        if on not in self._hash_indexes:
+            idxs = [self.ckey.NAMES.index(name) for name in on]
+            hash_index = {}
+            for row, positions in self.full_index.items():
+                hash_index.setdefault(tuple(row[idx] for idx in idxs), []).extend(positions)
+            self._hash_indexes[on] = hash_index
+        return self._hash_indexes[on]
+
+    def join(self, compk_list: Sequence[str], on: Optional[Sequence[str]] = None):
+        """ Hash join of the composite keys with the index.
+
+        Args:
+            compk_list: list of composite keys.
+            on: names of the keys to join on, all NAMES by default.
+        Yields:
+            tuple: positions of the matched keys in compk_list and in the index.
+        """
+        on = tuple(on or self.ckey.NAMES)
+        hash_index = self._hash_index(on)
+        idxs = [self.ckey.NAMES.index(name) for name in on]
+        decode = self.ckey.decode
+        for left_pos, compk in enumerate(compk_list):
+            if not compk:
+                continue
+            row = decode(compk)
+            for right_pos in hash_index.get(tuple(row[idx] for idx in idxs), ()):
+                yield left_pos, right_pos
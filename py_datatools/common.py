@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+""" COMMON FUNCTIONS: CONDITIONS AND CASTS TO BOOLEAN.
+    The module imports neither typing nor re, so `py_datatools.try_bool` does not pay for the rest of the helpers.
+"""
+from __future__ import annotations
+
+__author__ = 'kokarev.nv'
+
+from .constants import PREDEFINED_TRUE_ARRAY, PREDEFINED_FALSE_ARRAY
+
+TYPE_CHECKING = False  # typing.TYPE_CHECKING without importing typing
+if TYPE_CHECKING:
+    from typing import Any
+
+
+def exec_if_cond(cond: bool, func: Any, *args) -> Any:
+    """ Execute a function with any positional args if condition True.
+
+    Args:
+        cond (bool): function execution condition
+        func (Any): callable object, exec function
+    Returns:
+        Any: function execution result
+    """
+    if cond:
+        func(*args)
+
+
+def raise_if_cond(cond: bool, error_msg: str, exc_class=Exception):
+    """ Raise an exception with error message, if condition is true.
+
+    Args:
+        cond (bool): exception condition
+        error_msg (str): mesage text
+        exc_class (Exception, optional): exception class. Defaults to Exception.
+    """
+    if cond:
+        raise exc_class(error_msg)
+
+
+def try_true(value: Any) -> Any:
+    """ Trying to cast a predefined value to boolean True.
+
+    Args:
+        value (Any): value to cast
+    Returns:
+        bool, Any: casted value or started value
+    """
+    return str(value).lower() in PREDEFINED_TRUE_ARRAY or value
+
+
+def try_false(value: Any) -> Any:
+    """ Trying to cast a predefined value to boolean False.
+
+    Args:
+        value (Any): value to cast
+    Returns:
+        bool, Any: casted value or started value
+    """
+    return False if str(value).lower() in PREDEFINED_FALSE_ARRAY else value
+
+
+def try_bool(value: Any) -> Any:
+    """ Trying to cast a predefined value to boolean.
+
+    Args:
+        value (Any): value to cast
+    Returns:
+        bool, Any: casted value or started value
+    """
+    if isinstance(value, bool):
+        return value
+
+    ans = try_true(value)
+    if not isinstance(ans, bool):
+        ans = try_false(value)
+
+    return ans
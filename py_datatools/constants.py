@@ -3,10 +3,74 @@
 """
 __author__ = 'kokarev.nv'
 
-import re
-
-
 PREDEFINED_TRUE_ARRAY = ("true", "t", "1", "yes", "y")
 PREDEFINED_FALSE_ARRAY = ("false", "f", "0", "no", "n")
 VALID_ARRAY_TYPES = (tuple, list, set)
-ONLY_NUMBERS_SYMBOLS = re.compile(r'^[0-9]+$')
+# separators of the canonical PostgreSQL hstore output: `"k1"=>"v1", "k2"=>"v2"`.
+HSTORE_ARROWS = frozenset(('=>', ' => '))
+HSTORE_DELIMITERS = frozenset((',', ', '))
+HSTORE_ESCAPE_TABLE = str.maketrans({'"': '\\"', '\\': '\\\\'})
+# PostgreSQL COPY text format escaping of a field.
+COPY_TEXT_ESCAPE_TABLE = str.maketrans({'\\': '\\\\', '\n': '\\n', '\r': '\\r', '\t': '\\t'})
+# hstore escaping followed by COPY text escaping in one translate pass.
+HSTORE_COPY_ESCAPE_TABLE = str.maketrans({
+    '"': '\\\\"', '\\': '\\\\\\\\', '\n': '\\n', '\r': '\\r', '\t': '\\t'
+})
+# PostgreSQL COPY binary format.
+COPY_BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + b'\x00' * 8
+COPY_BINARY_TRAILER = b'\xff\xff'
+COPY_BINARY_NULL = b'\xff\xff\xff\xff'
+# date(2000, 1, 1).toordinal(), the PostgreSQL epoch of dates and timestamps.
+PG_EPOCH_ORDINAL = 730120
+FLOAT_TEXT_SPECIALS = {'nan': 'NaN', 'inf': 'Infinity', '-inf': '-Infinity'}
+PG_SMALLINT_RANGE = (-2 ** 15, 2 ** 15 - 1)
+PG_INT_RANGE = (-2 ** 31, 2 ** 31 - 1)
+PG_BIGINT_RANGE = (-2 ** 63, 2 ** 63 - 1)
+# sizes of parameter lists in generated statements, so the server sees a few statement shapes only.
+SQL_PARAMS_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+SQL_PARAMSTYLES = ('format', 'qmark', 'numeric')
+SQL_LOG_LEVEL = 10  # logging.DEBUG, without importing logging
+COALESCE_MODES = ('none', 'falsy')
+# regular expressions: name: pattern, compiled on the first access (PEP 562), so the modules, that need the other
+# constants only, do not import re.
+_PATTERNS = {
+    'ONLY_NUMBERS_SYMBOLS': r'^[0-9]+$',
+    # one `"key"=>"value"` / `key=>NULL` pair of the hstore text format, anchored at the scan position.
+    'HSTORE_PAIR_PATTERN': (
+        r'(?s)\s*(?:"([^"\\]*(?:\\.[^"\\]*)*)"|([^\s",=>]+))'
+        r'\s*=>\s*'
+        r'(?:"([^"\\]*(?:\\.[^"\\]*)*)"|([^\s",=>]+))'
+        r'\s*(,|\Z)'
+    ),
+    'HSTORE_ESCAPED_CHAR': r'(?s)\\(.)',
+    # a value that starts like a nested `"key"=>` hstore.
+    'HSTORE_NESTED_PREFIX': r'\s*"[^"\\]*(?:\\.[^"\\]*)*"\s*=>',
+    # quotes left around SQL literals by python formatting: '" and "' become ', 'NULL' (also '"NULL"') becomes NULL.
+    'SQL_LOG_NORMALIZE_PATTERN': r"""'"?NULL"?'|'"|"'""",
+    'SQL_LOG_NORMALIZE_BYTES_PATTERN': rb"""'"?NULL"?'|'"|"'""",
+    # textual forms of values, that are safe to load into the inferred PostgreSQL type.
+    'PG_INT_STRING': r'[-+]?[0-9]+',
+    'PG_NUMERIC_STRING': r'[-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?',
+    'PG_DATE_STRING': r'[0-9]{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12][0-9]|3[01])',
+    'PG_TIMESTAMP_STRING': (
+        r'[0-9]{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12][0-9]|3[01])'
+        r'(?:[ T](?:[01][0-9]|2[0-3]):[0-5][0-9](?::[0-5][0-9](?:\.[0-9]+)?)?'
+        r'(Z|[-+](?:[01][0-9]|2[0-3])(?::?[0-5][0-9])?)?)?'
+    ),
+}
+
+
+def __getattr__(name: str):
+    """ Compile the regular expression on the first access.
+
+    Args:
+        name: attribute name
+    Returns:
+        compiled regular expression
+    """
+    if name not in _PATTERNS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    import re
+
+    value = globals()[name] = re.compile(_PATTERNS[name])
+    return value
@@ -3,9 +3,14 @@
 """
 __author__ = 'kokarev.nv'
 
-from typing import Tuple
-from datetime import date, timedelta, datetime
+import functools
+from array import array
+from bisect import bisect_right
+from typing import Tuple, Sequence, Optional, Iterable, List, NamedTuple
+from datetime import date, time, timedelta, datetime
 import calendar
+from contextlib import contextmanager
+from contextvars import ContextVar
 
 PERIOD_TYPE_HOUR = 'hour'
 PERIOD_TYPE_MONTH = 'month'
@@ -14,6 +19,8 @@ PERIOD_TYPE_WEEK = 'week'
 PERIOD_TYPE_DAY = 'day'
 PERIOD_TYPE_QUARTER = 'quarter'
 PERIOD_TYPE_HALF_YEAR = 'halfyear'
+PERIOD_TYPE_OTHER = 'other'
+_ONE_DAY = timedelta(days=1)
 
 
 def is_period_week(begin: date, end: date) -> bool:
@@ -131,6 +138,48 @@ def is_period_other(begin: date, end: date) -> bool:
     return timedelta(days=1) <= end - begin
 
 
+@functools.lru_cache(maxsize=1024)
+def classify_period(begin: date, end: date) -> Optional[str]:
+    """ The most specific type of the period, the boundaries are computed once.
+        Types are checked in the order of the is_period_* methods: day, week, month, quarter, half a year, year.
+
+    Args:
+        begin: beginning
+        end: end
+    Returns:
+        PERIOD_TYPE_* constant, PERIOD_TYPE_OTHER for any other period or None if the end is before the beginning
+    """
+    if end < begin:
+        return None
+    if begin == end:
+        return PERIOD_TYPE_DAY
+    if end - begin < timedelta(7) and begin.weekday() <= end.weekday():
+        return PERIOD_TYPE_WEEK
+    if begin != to_start_of_month(begin) or end != to_end_of_month(end):
+        return PERIOD_TYPE_OTHER
+    months_qty = (end.year - begin.year) * 12 + end.month - begin.month
+    if months_qty == 0:
+        return PERIOD_TYPE_MONTH
+    if months_qty == 2 and begin.month in (1, 4, 7, 10):
+        return PERIOD_TYPE_QUARTER
+    if months_qty == 5 and begin.month in (1, 7):
+        return PERIOD_TYPE_HALF_YEAR
+    if months_qty == 11 and begin.month == 1:
+        return PERIOD_TYPE_YEAR
+    return PERIOD_TYPE_OTHER
+
+
+def classify_periods(periods: Iterable[Tuple[date, date]]) -> List[Optional[str]]:
+    """ classify_period() for each (begin, end) pair, repeated periods are taken from the cache.
+
+    Args:
+        periods: (begin, end) pairs
+    Returns:
+        types of the periods
+    """
+    return [classify_period(begin, end) for begin, end in periods]
+
+
 def get_some_days_ago(date_: date, days_count: int):
     """ Returns date = passed date - number of days.
 
@@ -154,13 +203,18 @@ def get_current_dot_position(date_begin: date, _date_end: date, date_begin_analy
     Returns:
         norm_pos_date: calculated day
     """
-    norm_pos_month = date_begin.month + (today.month - date_begin_analyze.month)
+    # months from the start of analysis, the year of the position moves with them
+    norm_pos_year, norm_pos_month = divmod(
+        date_begin.year * 12 + date_begin.month - 1 +
+        (today.year - date_begin_analyze.year) * 12 + today.month - date_begin_analyze.month, 12
+    )
+    norm_pos_month += 1
     # Maximum day in a month
-    max_day = calendar.monthrange(date_begin.year, norm_pos_month)[1]
+    max_day = calendar.monthrange(norm_pos_year, norm_pos_month)[1]
 
     # If the current day is longer than there can be in a month, leave the last day of the month.
     norm_pos_day = max_day if today.day > max_day else today.day
-    norm_pos_date = date(date_begin.year, norm_pos_month, norm_pos_day)
+    norm_pos_date = date(norm_pos_year, norm_pos_month, norm_pos_day)
 
     return norm_pos_date
 
@@ -226,6 +280,245 @@ def get_default_dateend() -> date:
     return date(2070, 12, 31)
 
 
+class CalendarIndex:
+    """ Precomputed calendar boundaries of a range of years, built once by get_calendar_index().
+        Months are indexed by (year - first year) * 12 + month - 1, days by date.toordinal().
+        Boundaries are shared date objects, so lookups do not allocate.
+    """
+    __slots__ = (
+        'first_year', 'months_qty', 'first_ordinal', 'last_ordinal', 'month_lens', 'month_start_ordinals',
+        'month_of_day', 'month_starts', 'month_ends', 'quarter_starts', 'quarter_ends', 'half_year_starts',
+        'half_year_ends', 'year_starts', 'year_ends'
+    )
+
+    def __init__(self, begin: date, end: date):
+        """ Build the tables for the years from begin to end.
+
+        Args:
+            begin: first date of the range, the whole year is indexed
+            end: last date of the range, the whole year is indexed
+        """
+        self.first_year = begin.year
+        self.months_qty = (end.year - begin.year + 1) * 12
+        self.month_starts = [
+            date(self.first_year + idx // 12, idx % 12 + 1, 1) for idx in range(self.months_qty + 1)
+        ]
+        self.month_start_ordinals = array('l', [month_start.toordinal() for month_start in self.month_starts])
+        self.month_lens = array('B', [
+            self.month_start_ordinals[idx + 1] - self.month_start_ordinals[idx] for idx in range(self.months_qty)
+        ])
+        self.month_ends = [
+            date.fromordinal(self.month_start_ordinals[idx + 1] - 1) for idx in range(self.months_qty)
+        ]
+        del self.month_starts[-1]
+        self.first_ordinal = self.month_start_ordinals[0]
+        self.last_ordinal = self.month_start_ordinals[-1] - 1
+        self.month_of_day = array('H')
+        for idx, month_len in enumerate(self.month_lens):
+            self.month_of_day.extend([idx] * month_len)
+
+        # boundaries of the periods, that contain the month
+        self.quarter_starts = [self.month_starts[idx - idx % 3] for idx in range(self.months_qty)]
+        self.quarter_ends = [self.month_ends[idx - idx % 3 + 2] for idx in range(self.months_qty)]
+        self.half_year_starts = [self.month_starts[idx - idx % 6] for idx in range(self.months_qty)]
+        self.half_year_ends = [self.month_ends[idx - idx % 6 + 5] for idx in range(self.months_qty)]
+        self.year_starts = [self.month_starts[idx - idx % 12] for idx in range(self.months_qty)]
+        self.year_ends = [self.month_ends[idx - idx % 12 + 11] for idx in range(self.months_qty)]
+
+    def month_index(self, date_: date) -> Optional[int]:
+        """ Index of the month of the date.
+
+        Args:
+            date_: date
+        Returns:
+            index of the month or None if the date is out of the range
+        """
+        idx = (date_.year - self.first_year) * 12 + date_.month - 1
+        return idx if 0 <= idx < self.months_qty else None
+
+    def month_index_of_ordinal(self, ordinal: int) -> Optional[int]:
+        """ Index of the month of the day ordinal.
+
+        Args:
+            ordinal: date.toordinal() of the day
+        Returns:
+            index of the month or None if the day is out of the range
+        """
+        if self.first_ordinal <= ordinal <= self.last_ordinal:
+            return self.month_of_day[ordinal - self.first_ordinal]
+        return None
+
+
+_CALENDAR_INDEX = None
+
+
+def get_calendar_index() -> CalendarIndex:
+    """ Calendar index of the get_default_datebegin()-get_default_dateend() range, built on the first call.
+
+    Returns:
+        calendar index
+    """
+    global _CALENDAR_INDEX
+    if _CALENDAR_INDEX is None:
+        _CALENDAR_INDEX = CalendarIndex(get_default_datebegin(), get_default_dateend())
+    return _CALENDAR_INDEX
+
+
+_INFINITY_DATE = date(9999, 12, 31)
+
+
+def _is_digits(value: str) -> bool:
+    """ The string consists of ASCII digits only. int() also accepts signs, whitespace, underscores and
+        non-ASCII digits, they are not allowed in the date formats.
+
+    Args:
+        value: string
+    Returns:
+        bool
+    """
+    return value.isdigit() and value.isascii()
+
+
+def _parse_iso_date(value: str) -> date:
+    """ Parse the yyyy-mm-dd string.
+
+    Args:
+        value: date string
+    Returns:
+        date
+    Raises:
+        ValueError: the string is not a valid date of the format
+    """
+    if len(value) != 10 or value[4] != '-' or value[7] != '-' or not _is_digits(value[:4] + value[5:7] + value[8:]):
+        raise ValueError('Date {!r} does not match the yyyy-mm-dd format'.format(value))
+    return date(int(value[:4]), int(value[5:7]), int(value[8:]))
+
+
+def _parse_dotted_date(value: str) -> date:
+    """ Parse the dd.mm.yyyy string.
+
+    Args:
+        value: date string
+    Returns:
+        date
+    Raises:
+        ValueError: the string is not a valid date of the format
+    """
+    if len(value) != 10 or value[2] != '.' or value[5] != '.' or not _is_digits(value[:2] + value[3:5] + value[6:]):
+        raise ValueError('Date {!r} does not match the dd.mm.yyyy format'.format(value))
+    return date(int(value[6:]), int(value[3:5]), int(value[:2]))
+
+
+def _parse_compact_date(value: str) -> date:
+    """ Parse the yyyymmdd string.
+
+    Args:
+        value: date string
+    Returns:
+        date
+    Raises:
+        ValueError: the string is not a valid date of the format
+    """
+    if len(value) != 8 or not _is_digits(value):
+        raise ValueError('Date {!r} does not match the yyyymmdd format'.format(value))
+    return date(int(value[:4]), int(value[4:6]), int(value[6:]))
+
+
+_DATE_PARSERS = (_parse_iso_date, _parse_dotted_date, _parse_compact_date)
+
+
+def _detect_date_parser(value: str):
+    """ Parser of the format of the date string.
+
+    Args:
+        value: date string
+    Returns:
+        one of _DATE_PARSERS or None if the string is not in any of the formats
+    """
+    for parser in _DATE_PARSERS:
+        try:
+            parser(value)
+        except ValueError:
+            continue
+        return parser
+    return None
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_date_value(value) -> date:
+    """ Parse the date string or yyyymmdd int, the results are cached.
+
+    Args:
+        value: date string or int
+    Returns:
+        date
+    Raises:
+        ValueError: the value is not a date in any of the formats
+    """
+    if isinstance(value, int):
+        value = str(value)
+    if value == 'infinity':
+        return _INFINITY_DATE
+    for parser in _DATE_PARSERS:
+        try:
+            return parser(value)
+        except ValueError:
+            pass
+    # not zero-padded dates and the like, strptime also accepts space-padded days and non-ASCII digits
+    if _is_digits(value.replace('.', '').replace('-', '')):
+        for date_format in ('%d.%m.%Y', '%Y-%m-%d', '%Y%m%d'):
+            try:
+                return datetime.strptime(value, date_format).date()
+            except ValueError:
+                pass
+    raise ValueError('Unknown date format: {!r}'.format(value))
+
+
+def parse_date(value) -> Optional[date]:
+    """ Parse the date of the formats: yyyy-mm-dd, dd.mm.yyyy, yyyymmdd (str or int) and 'infinity'.
+
+    Args:
+        value: date string, yyyymmdd int, date or datetime (returned as is) or None
+    Returns:
+        date, date(9999, 12, 31) for 'infinity'
+    Raises:
+        ValueError: the value is not a date in any of the formats
+    """
+    if value is None or isinstance(value, date):
+        return value
+    return _parse_date_value(value)
+
+
+def parse_dates_many(values: Iterable) -> List[Optional[date]]:
+    """ Batch version of parse_date, the format is detected once by the first string of the column.
+
+    Args:
+        values: date strings, yyyymmdd ints, dates or None
+    Returns:
+        dates
+    """
+    parser = None
+    parsed = {}  # columns repeat their values
+    result = []
+    for value in values:
+        if isinstance(value, str):
+            date_ = parsed.get(value)
+            if date_ is not None:
+                result.append(date_)
+                continue
+            if parser is None:
+                parser = _detect_date_parser(value)
+            if parser is not None:
+                try:
+                    date_ = parsed[value] = parser(value)
+                    result.append(date_)
+                    continue
+                except ValueError:
+                    pass
+        result.append(parse_date(value))
+    return result
+
+
 def to_start_of_month(date_: date) -> date:
     """ Based on the passed date, returns the start date of the current month.
 
@@ -234,6 +527,10 @@ def to_start_of_month(date_: date) -> date:
     Returns:
         start date of the current month
     """
+    calendar_index = get_calendar_index()
+    idx = calendar_index.month_index(date_)
+    if idx is not None:
+        return calendar_index.month_starts[idx]
     return date(year=date_.year, month=date_.month, day=1)
 
 
@@ -256,6 +553,10 @@ def to_end_of_month(date_: date) -> date:
     Returns:
         end date of the current month
     """
+    calendar_index = get_calendar_index()
+    idx = calendar_index.month_index(date_)
+    if idx is not None:
+        return calendar_index.month_ends[idx]
     result = to_start_of_month(date_) + timedelta(days=32)
     return result - timedelta(days=result.day)
 
@@ -290,6 +591,10 @@ def to_begin_of_year(date_: date) -> date:
     Returns:
         start date of the year
     """
+    calendar_index = get_calendar_index()
+    idx = calendar_index.month_index(date_)
+    if idx is not None:
+        return calendar_index.year_starts[idx]
     return date(year=date_.year, month=1, day=1)
 
 
@@ -301,6 +606,10 @@ def to_end_of_year(date_: date) -> date:
     Returns:
         end of year date
     """
+    calendar_index = get_calendar_index()
+    idx = calendar_index.month_index(date_)
+    if idx is not None:
+        return calendar_index.year_ends[idx]
     return date(year=date_.year, month=12, day=31)
 
 
@@ -341,15 +650,9 @@ def is_eq_year(datebegin: date, dateend: date) -> bool:
     if not(datebegin and dateend):
         return False
     if isinstance(datebegin, str):
-        try:
-            datebegin = datetime.strptime(datebegin, '%d.%m.%Y')
-        except ValueError:
-            datebegin = datetime.strptime(datebegin, '%Y-%m-%d')
+        datebegin = parse_date(datebegin)
     if isinstance(dateend, str):
-        try:
-            dateend = datetime.strptime(dateend, '%d.%m.%Y')
-        except ValueError:
-            dateend = datetime.strptime(dateend, '%Y-%m-%d')
+        dateend = parse_date(dateend)
     datebegin_year = date(datebegin.year, 1, 1)
     dateend_year = date(dateend.year, 12, 31)
     return datebegin == datebegin_year and dateend == dateend_year
@@ -419,16 +722,68 @@ def get_prev_date_by_month(datebegin: date, quant: str) -> date:
     return rs_date
 
 
-def in_current_period(datebegin: date, dateend: date) -> bool:
+_TODAY = ContextVar('py_datatools_today', default=None)
+
+
+def get_today() -> date:
+    """ Current date, frozen inside today_scope().
+
+    Returns:
+        current date
+    """
+    today = _TODAY.get()
+    return today if today is not None else date.today()
+
+
+@contextmanager
+def today_scope(today: Optional[date] = None):
+    """ Freeze the current date of get_today() and in_current_period() for the scope (thread and task local).
+
+    Args:
+        today: date to use, the current date at the entry by default
+    Yields:
+        the frozen date
+    """
+    today = today or date.today()
+    token = _TODAY.set(today)
+    try:
+        yield today
+    finally:
+        _TODAY.reset(token)
+
+
+def in_current_period(datebegin: date, dateend: date, today: Optional[date] = None) -> bool:
     """ The method checks whether we are in a period or not, relative to the current date.
 
     Args:
         datebegin: start date
         dateend: end date
+        today: current date, get_today() by default
     Returns:
         are we in the period or not, relative to the current date.
     """
-    return datebegin <= datetime.now().date() <= dateend
+    return datebegin <= (today or get_today()) <= dateend
+
+
+def in_current_period_many(datebegins: Sequence, dateends: Sequence, today: Optional[date] = None) -> Sequence[bool]:
+    """ Batch version of in_current_period, all periods are checked against the same current date.
+        NumPy datetime64 arrays are computed by array operations, NaT bounds give False.
+
+    Args:
+        datebegins: start dates
+        dateends: end dates of the same length
+        today: current date, get_today() by default
+    Returns:
+        are we in the periods: list or NumPy bool array
+    """
+    today = today or get_today()
+    if getattr(datebegins, 'dtype', None) is None or getattr(dateends, 'dtype', None) is None:
+        return [datebegin <= today <= dateend for datebegin, dateend in zip(datebegins, dateends)]
+
+    import numpy as np
+
+    today = np.datetime64(today, 'D')
+    return (datebegins <= today) & (today <= dateends)
 
 
 def is_last_month_day(day: date) -> bool:
@@ -439,6 +794,10 @@ def is_last_month_day(day: date) -> bool:
     Returns:
         Is the last day of the month transmitted.
     """
+    calendar_index = get_calendar_index()
+    idx = calendar_index.month_index(day)
+    if idx is not None:
+        return day.day == calendar_index.month_lens[idx]
     return (day + timedelta(days=1)).month != day.month
 
 
@@ -450,7 +809,7 @@ def is_first_month_day(day: date) -> bool:
     Returns:
         Is the first day of the month transmitted.
     """
-    return (day - timedelta(days=1)).month != day.month
+    return day.day == 1
 
 
 def begin_of_current_quarter(current_date: date) -> date:
@@ -461,19 +820,11 @@ def begin_of_current_quarter(current_date: date) -> date:
     Returns:
         quarter start date
     """
-    # находим даты начал кварталов текущего года
-    current_quarter = date(year=current_date.year, month=1, day=1)
-    second_quarter = date(year=current_date.year, month=4, day=1)
-    third_quarter = date(year=current_date.year, month=7, day=1)
-    fourth_quarter = date(year=current_date.year, month=10, day=1)
-    # отбираем дату квартала, в промежуток которой попала текущая дата
-    if fourth_quarter <= current_date:
-        current_quarter = fourth_quarter
-    elif third_quarter <= current_date:
-        current_quarter = third_quarter
-    elif second_quarter <= current_date:
-        current_quarter = second_quarter
-    return current_quarter
+    calendar_index = get_calendar_index()
+    idx = calendar_index.month_index(current_date)
+    if idx is not None:
+        return calendar_index.quarter_starts[idx]
+    return date(year=current_date.year, month=(current_date.month - 1) // 3 * 3 + 1, day=1)
 
 
 def end_of_current_quarter(current_date: date) -> date:
@@ -484,6 +835,10 @@ def end_of_current_quarter(current_date: date) -> date:
     Returns:
         last date of the quarter
     """
+    calendar_index = get_calendar_index()
+    idx = calendar_index.month_index(current_date)
+    if idx is not None:
+        return calendar_index.quarter_ends[idx]
     begin_quarter = begin_of_current_quarter(current_date)
     return to_end_of_month(date(year=begin_quarter.year, month=begin_quarter.month + 2, day=1))
 
@@ -498,10 +853,13 @@ def timedelta_months(sourcedate: str, months: int) -> timedelta:
         timedelta - how many days need to be added to get the specified number of months
     """
     new_date = sourcedate
-    if isinstance(new_date, str):
-        new_date = datetime.strptime(new_date, '%d.%m.%Y').date()
-    if isinstance(new_date, int):
-        new_date = datetime.strptime(str(new_date), '%Y%m%d').date()
+    if isinstance(new_date, (str, int)):
+        new_date = parse_date(new_date)
+    calendar_index = get_calendar_index()
+    idx = calendar_index.month_index(new_date)
+    if idx is not None and 0 <= idx + months < calendar_index.months_qty:
+        day = min(new_date.day, calendar_index.month_lens[idx + months])
+        return date.fromordinal(calendar_index.month_start_ordinals[idx + months] + day - 1) - new_date - _ONE_DAY
     month = new_date.month - 1 + months
     year = new_date.year + month // 12
     month = month % 12 + 1
@@ -539,16 +897,24 @@ def get_infinity_date(current_date) -> date:
         maximum date
     """
     if isinstance(current_date, str):
-        if current_date == 'infinity' or current_date is None:
-            current_date = date(9999, 12, 31)
-        else:
-            current_date = datetime.strptime(current_date, "%Y-%m-%d").date()
-
+        current_date = parse_date(current_date)
     return current_date
 
 
+def _time_of_day(value: date) -> time:
+    """ Time part of a datetime, midnight for a date.
+
+    Args:
+        value: date or datetime
+    Returns:
+        time of the day
+    """
+    return value.time() if isinstance(value, datetime) else time.min
+
+
 def delta_month_two_period(first: datetime, second: datetime) -> int:
-    """ The method counts how many months are between 2 dates.
+    """ The method counts how many full months are between 2 dates.
+        A month started on the 29th-31st day ends on the last day of a shorter month.
 
     Args:
         first: Date
@@ -560,14 +926,40 @@ def delta_month_two_period(first: datetime, second: datetime) -> int:
         return 0
     if first > second:
         first, second = second, first
-    delta = 0
-    while True:
-        mdays = calendar.monthrange(first.year, second.month)[1]
-        first += timedelta(days=mdays)
-        if first <= second:
-            delta += 1
-        else:
-            break
+    delta = (second.year - first.year) * 12 + second.month - first.month
+    anchor_day = min(first.day, calendar.monthrange(second.year, second.month)[1])
+    if second.day < anchor_day or second.day == anchor_day and _time_of_day(second) < _time_of_day(first):
+        delta -= 1
+    return delta
+
+
+def delta_month_two_period_many(firsts: Sequence, seconds: Sequence) -> Sequence[int]:
+    """ Batch version of delta_month_two_period.
+        NumPy datetime64 arrays are computed by array operations, NaT pairs give 0.
+
+    Args:
+        firsts: dates
+        seconds: dates of the same length
+    Returns:
+        Numbers of months between dates: list or NumPy int64 array
+    """
+    if getattr(firsts, 'dtype', None) is None or getattr(seconds, 'dtype', None) is None:
+        return [delta_month_two_period(first, second) for first, second in zip(firsts, seconds)]
+
+    import numpy as np
+
+    dtype = np.promote_types(firsts.dtype, seconds.dtype)
+    firsts, seconds = firsts.astype(dtype), seconds.astype(dtype)
+    low, high = np.minimum(firsts, seconds), np.maximum(firsts, seconds)
+    low_month, high_month = low.astype('M8[M]'), high.astype('M8[M]')
+    low_day = low.astype('M8[D]')
+    delta = (high_month - low_month).astype(np.int64)
+    # offsets inside the month: days and the time of the day
+    high_offset = high - high_month.astype(dtype)
+    high_month_len = (high_month + 1).astype('M8[D]') - high_month.astype('M8[D]')
+    anchor = np.minimum(low_day - low_month.astype('M8[D]'), high_month_len - np.timedelta64(1, 'D'))
+    delta -= high_offset < anchor + (low - low_day.astype(dtype))
+    delta[np.isnat(low) | np.isnat(high)] = 0
     return delta
 
 
@@ -642,3 +1034,1104 @@ def get_right_for_aggregate(date_begin: date, date_end: date, date_end_left: dat
         elif is_eq_month(date_begin, date_end):
             end_center = date_end_right
     return end_center, begin_right, begin_end
+
+
+class AggregatePiece(NamedTuple):
+    """ Part of a range, read from a fetch range of an AggregatePlan.
+    """
+    period_type: str  # PERIOD_TYPE_MONTH - monthly aggregates, PERIOD_TYPE_DAY - daily data
+    begin: date
+    end: date
+    fetch_index: int  # index in month_ranges or day_ranges of the plan
+
+
+class AggregatePlan(NamedTuple):
+    """ Merged fetch plan of many ranges, built by plan_aggregates().
+    """
+    month_ranges: List[Tuple[date, date]]
+    day_ranges: List[Tuple[date, date]]
+    pieces: List[List[AggregatePiece]]  # pieces of each original range, in date order
+
+
+def _merge_ranges(ranges: List[Tuple[date, date]]) -> List[Tuple[date, date]]:
+    """ Union of the ranges as the minimal list of sorted disjoint ranges, adjacent ranges are joined.
+
+    Args:
+        ranges: (begin, end) pairs
+    Returns:
+        merged (begin, end) pairs
+    """
+    merged = []
+    for begin, end in sorted(ranges):
+        if merged and begin <= merged[-1][1] + _ONE_DAY:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((begin, end))
+    return merged
+
+
+def plan_aggregates(ranges: Iterable[Tuple[date, date]]) -> AggregatePlan:
+    """ Plan the reading of many ranges by monthly aggregates and daily data.
+        Each range is split by split_dates_for_aggregate(), the month and day segments of all ranges are merged
+        into the minimal sets of fetch ranges, so every aggregate is read once.
+
+    Args:
+        ranges: (begin, end) pairs, empty or inverted ranges get no pieces
+    Returns:
+        fetch ranges of the monthly aggregates and the daily data, pieces to reassemble each range
+    """
+    splits = []
+    segments = {PERIOD_TYPE_MONTH: [], PERIOD_TYPE_DAY: []}
+    for date_begin, date_end in ranges:
+        split = []
+        if date_begin and date_end and date_begin <= date_end:
+            begin_left, end_left, begin_center, end_center, begin_right, end_right = split_dates_for_aggregate(
+                date_begin, date_end
+            )
+            # a center, that ends before it begins, is empty
+            for period_type, begin, end in (
+                (PERIOD_TYPE_DAY, begin_left, end_left),
+                (PERIOD_TYPE_MONTH, begin_center, end_center),
+                (PERIOD_TYPE_DAY, begin_right, end_right)
+            ):
+                if begin and end and begin <= end:
+                    split.append((period_type, begin, end))
+                    segments[period_type].append((begin, end))
+        splits.append(split)
+
+    fetch_ranges = {period_type: _merge_ranges(type_segments) for period_type, type_segments in segments.items()}
+    fetch_begins = {
+        period_type: [begin for begin, _ in type_ranges] for period_type, type_ranges in fetch_ranges.items()
+    }
+    pieces = [
+        [
+            AggregatePiece(period_type, begin, end, bisect_right(fetch_begins[period_type], begin) - 1)
+            for period_type, begin, end in split
+        ]
+        for split in splits
+    ]
+    return AggregatePlan(fetch_ranges[PERIOD_TYPE_MONTH], fetch_ranges[PERIOD_TYPE_DAY], pieces)
+
+
+class AggregateSegment(NamedTuple):
+    """ Segment of a range, covered by one aggregate of the period type.
+    """
+    period_type: str
+    begin: date  # first day (hour) of the segment
+    end: date  # last day (hour) of the segment
+
+
+# months in the period for the month-based period types
+_PERIOD_MONTHS = {PERIOD_TYPE_YEAR: 12, PERIOD_TYPE_HALF_YEAR: 6, PERIOD_TYPE_QUARTER: 3, PERIOD_TYPE_MONTH: 1}
+DEFAULT_AGGREGATE_TYPES = (
+    PERIOD_TYPE_YEAR, PERIOD_TYPE_HALF_YEAR, PERIOD_TYPE_QUARTER, PERIOD_TYPE_MONTH, PERIOD_TYPE_WEEK, PERIOD_TYPE_DAY
+)
+
+
+def _next_aggregate_boundary(ordinal: int, period_type: str) -> Optional[int]:
+    """ Ordinal of the day after the period of the type, that begins at the day.
+
+    Args:
+        ordinal: date.toordinal() of the day
+        period_type: PERIOD_TYPE_* from day to year
+    Returns:
+        ordinal of the next period or None if no period of the type begins at the day
+    """
+    if period_type == PERIOD_TYPE_DAY:
+        return ordinal + 1
+    if period_type == PERIOD_TYPE_WEEK:
+        return ordinal + 7 if ordinal % 7 == 1 else None
+    day = date.fromordinal(ordinal)
+    months = _PERIOD_MONTHS[period_type]
+    if day.day != 1 or (day.month - 1) % months:
+        return None
+    year, month = divmod(day.year * 12 + day.month - 1 + months, 12)
+    return date(year, month + 1, 1).toordinal()
+
+
+def _next_aggregate_position(position: int, period_type: str, by_hours: bool) -> Optional[int]:
+    """ Position after the period of the type, that begins at the position.
+
+    Args:
+        position: ordinal of the day or, by hours, ordinal * 24 + hour
+        period_type: PERIOD_TYPE_* from hour to year
+        by_hours: positions are hours
+    Returns:
+        next position or None if no period of the type begins at the position
+    """
+    if period_type == PERIOD_TYPE_HOUR:
+        return position + 1
+    if not by_hours:
+        return _next_aggregate_boundary(position, period_type)
+    if position % 24:
+        return None
+    next_ordinal = _next_aggregate_boundary(position // 24, period_type)
+    return next_ordinal * 24 if next_ordinal is not None else None
+
+
+def _greedy_aggregates(start: int, stop: int, ordered_types: List[str], by_hours: bool) -> Optional[list]:
+    """ Cover [start, stop) by the largest period, that begins at each position and fits the range.
+        The periods of the types must be nested (laminar): any two of them are disjoint or one contains the other,
+        then the cover is the fewest one.
+
+    Args:
+        start: first position
+        stop: position after the range
+        ordered_types: PERIOD_TYPE_* from the largest
+        by_hours: positions are hours
+    Returns:
+        [(period type, position, next position)] or None if the range can not be covered
+    """
+    pieces = []
+    position = start
+    while position < stop:
+        for period_type in ordered_types:
+            next_position = _next_aggregate_position(position, period_type, by_hours)
+            if next_position is not None and next_position <= stop:
+                break
+        else:
+            return None
+        pieces.append((period_type, position, next_position))
+        position = next_position
+    return pieces
+
+
+def _month_position(month: int, scale: int) -> int:
+    """ Position of the first day of the month.
+
+    Args:
+        month: year * 12 + month - 1
+        scale: 1 for days, 24 for hours
+    Returns:
+        position
+    """
+    return date(month // 12, month % 12 + 1, 1).toordinal() * scale
+
+
+def _month_aggregates(first_month: int, last_month: int, month_types: List[str]) -> list:
+    """ Greedy cover of the months [first_month, last_month) by the month-based periods, that are nested.
+
+    Args:
+        first_month: number of the first month (year * 12 + month - 1), a boundary of the smallest type
+        last_month: number of the month after the range, a boundary of the smallest type
+        month_types: month-based PERIOD_TYPE_* from the largest
+    Returns:
+        [(period type, month number, next month number)]
+    """
+    pieces = []
+    month = first_month
+    while month < last_month:
+        for period_type in month_types:
+            months = _PERIOD_MONTHS[period_type]
+            if not month % months and month + months <= last_month:
+                break
+        pieces.append((period_type, month, month + months))
+        month += months
+    return pieces
+
+
+def _edge_aggregates(start: int, stop: int, by_hours: bool) -> list:
+    """ Fewest cover of [start, stop) by weeks, days and, by hours, hours: the hours up to the midnight,
+        the days up to the monday, the weeks and the rest days and hours.
+
+    Args:
+        start: first position
+        stop: position after the range
+        by_hours: positions are hours
+    Returns:
+        [(period type, position, next position)]
+    """
+    scale = 24 if by_hours else 1
+    first_day = -(-start // scale)
+    last_day = stop // scale
+    if first_day >= last_day:
+        return [(PERIOD_TYPE_HOUR, hour, hour + 1) for hour in range(start, stop)]
+    # mondays are the ordinals 1, 8, ...
+    first_monday = first_day + (1 - first_day) % 7
+    last_monday = first_monday + (last_day - first_monday) // 7 * 7 if first_monday <= last_day else last_day
+    pieces = [(PERIOD_TYPE_HOUR, hour, hour + 1) for hour in range(start, first_day * scale)]
+    pieces.extend(
+        (PERIOD_TYPE_DAY, day * scale, day * scale + scale) for day in range(first_day, min(first_monday, last_day))
+    )
+    pieces.extend(
+        (PERIOD_TYPE_WEEK, day * scale, day * scale + 7 * scale) for day in range(first_monday, last_monday, 7)
+    )
+    pieces.extend((PERIOD_TYPE_DAY, day * scale, day * scale + scale) for day in range(last_monday, last_day))
+    pieces.extend((PERIOD_TYPE_HOUR, hour, hour + 1) for hour in range(last_day * scale, stop))
+    return pieces
+
+
+def _search_aggregates(start: int, stop: int, ordered_types: List[str], by_hours: bool) -> Optional[list]:
+    """ Cover [start, stop) by the fewest periods by the breadth-first search over the period boundaries.
+        Visits every position, that a period of the types reaches, so it suits sparse types only.
+
+    Args:
+        start: first position
+        stop: position after the range
+        ordered_types: PERIOD_TYPE_* from the largest
+        by_hours: positions are hours
+    Returns:
+        [(period type, position, next position)] or None if the range can not be covered
+    """
+    # every aggregate costs one, so the first visit of a position is the cheapest
+    previous = {start: None}
+    layer = [start]
+    while layer and stop not in previous:
+        next_layer = []
+        for position in layer:
+            for period_type in ordered_types:
+                next_position = _next_aggregate_position(position, period_type, by_hours)
+                if next_position is not None and next_position <= stop and next_position not in previous:
+                    previous[next_position] = (position, period_type)
+                    next_layer.append(next_position)
+        layer = next_layer
+    if stop not in previous:
+        return None
+
+    pieces = []
+    position = stop
+    while previous[position] is not None:
+        prev_position, period_type = previous[position]
+        pieces.append((period_type, prev_position, position))
+        position = prev_position
+    pieces.reverse()
+    return pieces
+
+
+# candidates of the first (last) month-based boundary of the cover, see split_dates_by_aggregates
+_EDGE_BOUNDARIES_QTY = 4
+
+
+def split_dates_by_aggregates(
+    date_begin: date, date_end: date, period_types: Iterable[str] = DEFAULT_AGGREGATE_TYPES
+) -> List[AggregateSegment]:
+    """ Cover the range with the fewest aggregates of the available period types.
+        The generalization of split_dates_for_aggregate. Without weeks (or without month-based types) the periods
+        are nested and the largest fitting period from the beginning gives the fewest cover in O(segments).
+        Weeks cross the months, so then the month-based periods are taken greedily between two month boundaries,
+        and the edges before and after them are covered by weeks, days and hours: only a few boundaries near
+        the ends of the range are tried, because each month moved to the edges costs at least 4 weeks.
+        Datetimes are covered by hours, if PERIOD_TYPE_HOUR is available, otherwise the range is covered by days.
+
+    Args:
+        date_begin: period start date
+        date_end: period end date (included)
+        period_types: available PERIOD_TYPE_* from hour to year
+    Returns:
+        Segments of the range in the date order, empty list for an empty range
+    """
+    period_types = set(period_types)
+    by_hours = PERIOD_TYPE_HOUR in period_types and isinstance(date_begin, datetime)
+    if by_hours:
+        # positions are hours, the day-based periods begin at midnight
+        start = date_begin.toordinal() * 24 + date_begin.hour
+        stop = date_end.toordinal() * 24 + date_end.hour + 1
+        scale = 24
+    else:
+        start = date_begin.toordinal()
+        stop = date_end.toordinal() + 1
+        scale = 1
+    if start >= stop:
+        return []
+    ordered_types = [period_type for period_type in DEFAULT_AGGREGATE_TYPES if period_type in period_types]
+    if by_hours:
+        ordered_types.append(PERIOD_TYPE_HOUR)
+    month_types = [period_type for period_type in ordered_types if period_type in _PERIOD_MONTHS]
+
+    if PERIOD_TYPE_WEEK not in period_types or not month_types:
+        pieces = _greedy_aggregates(start, stop, ordered_types, by_hours)
+    elif PERIOD_TYPE_DAY not in period_types:
+        # weeks can not be cut at the month boundaries, the edges are not bounded
+        pieces = _search_aggregates(start, stop, ordered_types, by_hours)
+    else:
+        # boundaries of the smallest month-based periods inside the range by the month numbers
+        months = _PERIOD_MONTHS[month_types[-1]]
+        first_day = date.fromordinal(-(-start // scale))
+        last_day = date.fromordinal(stop // scale)
+        first_month = first_day.year * 12 + first_day.month - 1 + (first_day.day != 1)
+        first_month += -first_month % months
+        last_month = last_day.year * 12 + last_day.month - 1
+        last_month -= last_month % months
+        boundaries_qty = (last_month - first_month) // months + 1 if first_month <= last_month else 0
+        firsts = [first_month + idx * months for idx in range(min(_EDGE_BOUNDARIES_QTY, boundaries_qty))]
+        lasts = [last_month - idx * months for idx in range(min(_EDGE_BOUNDARIES_QTY, boundaries_qty))]
+
+        right_edges = {
+            month: _edge_aggregates(_month_position(month, scale), stop, by_hours)
+            for month in lasts
+        }
+        # (edge pieces, month pieces, edge pieces)
+        covers = []
+        for left_month in firsts:
+            left_pieces = _edge_aggregates(start, _month_position(left_month, scale), by_hours)
+            for right_month in lasts:
+                if right_month > left_month:
+                    covers.append((
+                        left_pieces, _month_aggregates(left_month, right_month, month_types), right_edges[right_month]
+                    ))
+        if boundaries_qty <= 2 * _EDGE_BOUNDARIES_QTY:
+            # few months may be cheaper by weeks
+            covers.append((_edge_aggregates(start, stop, by_hours), [], []))
+        left_pieces, month_pieces, right_pieces = min(covers, key=lambda cover: sum(map(len, cover)))
+        pieces = left_pieces + [
+            (period_type, _month_position(month, scale), _month_position(next_month, scale))
+            for period_type, month, next_month in month_pieces
+        ] + right_pieces
+    if pieces is None:
+        raise ValueError('The range can not be covered by the period types: {}'.format(sorted(period_types)))
+
+    segments = []
+    for period_type, position, next_position in pieces:
+        if by_hours:
+            begin = datetime.fromordinal(position // 24) + timedelta(hours=position % 24)
+            end = datetime.fromordinal((next_position - 1) // 24) + timedelta(hours=(next_position - 1) % 24)
+        else:
+            begin, end = date.fromordinal(position), date.fromordinal(next_position - 1)
+        segments.append(AggregateSegment(period_type, begin, end))
+    return segments
+
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_END_OF_HOUR = timedelta(minutes=59, seconds=59, microseconds=999999)
+
+
+def _period_key(date_: date, period_type: str) -> int:
+    """ Sequential number of the period of the type, that contains the date.
+        Months, quarters and half-years are counted from the year 0, weeks begin on monday.
+
+    Args:
+        date_: date (datetime for hours)
+        period_type: PERIOD_TYPE_*
+    Returns:
+        number of the period
+    """
+    if period_type == PERIOD_TYPE_DAY:
+        return date_.toordinal()
+    if period_type == PERIOD_TYPE_HOUR:
+        return date_.toordinal() * 24 + date_.hour
+    if period_type == PERIOD_TYPE_WEEK:
+        return (date_.toordinal() - 1) // 7
+    return (date_.year * 12 + date_.month - 1) // _PERIOD_MONTHS[period_type]
+
+
+def _period_bounds(key: int, period_type: str) -> Tuple[date, date]:
+    """ Start and end of the period by its number from _period_key().
+
+    Args:
+        key: number of the period
+        period_type: PERIOD_TYPE_*
+    Returns:
+        first and last day of the period, first and last moment of the hour for PERIOD_TYPE_HOUR
+    """
+    if period_type == PERIOD_TYPE_DAY:
+        day = date.fromordinal(key)
+        return day, day
+    if period_type == PERIOD_TYPE_HOUR:
+        start = datetime.fromordinal(key // 24) + timedelta(hours=key % 24)
+        return start, start + _END_OF_HOUR
+    if period_type == PERIOD_TYPE_WEEK:
+        return date.fromordinal(key * 7 + 1), date.fromordinal(key * 7 + 7)
+    months = _PERIOD_MONTHS[period_type]
+    first_month = key * months
+    calendar_index = get_calendar_index()
+    idx = first_month - calendar_index.first_year * 12
+    if 0 <= idx and idx + months <= calendar_index.months_qty:
+        return calendar_index.month_starts[idx], calendar_index.month_ends[idx + months - 1]
+    year, month = divmod(first_month + months, 12)
+    return date(first_month // 12, first_month % 12 + 1, 1), date(year, month + 1, 1) - _ONE_DAY
+
+
+def iter_periods(begin: date, end: date, period_type: str = PERIOD_TYPE_MONTH) -> Iterable[Tuple[date, date]]:
+    """ Lazily iterate the periods of the type from the one, that contains begin, to the one, that contains end.
+
+    Args:
+        begin: start date
+        end: end date
+        period_type: PERIOD_TYPE_*
+    Yields:
+        start and end of each period, see _period_bounds()
+    """
+    for key in range(_period_key(begin, period_type), _period_key(end, period_type) + 1):
+        yield _period_bounds(key, period_type)
+
+
+def periods_array(begin: date, end: date, period_type: str = PERIOD_TYPE_MONTH):
+    """ NumPy version of iter_periods.
+
+    Args:
+        begin: start date
+        end: end date
+        period_type: PERIOD_TYPE_*
+    Returns:
+        starts and ends of the periods: datetime64[D] arrays, datetime64[us] arrays for PERIOD_TYPE_HOUR
+    """
+    import numpy as np
+
+    keys = np.arange(_period_key(begin, period_type), _period_key(end, period_type) + 1, dtype=np.int64)
+    if period_type == PERIOD_TYPE_HOUR:
+        starts = (keys - _EPOCH_ORDINAL * 24).astype('M8[h]').astype('M8[us]')
+        return starts, starts + np.timedelta64(_END_OF_HOUR)
+    if period_type == PERIOD_TYPE_DAY:
+        starts = (keys - _EPOCH_ORDINAL).astype('M8[D]')
+        return starts, starts
+    if period_type == PERIOD_TYPE_WEEK:
+        starts = (keys * 7 + 1 - _EPOCH_ORDINAL).astype('M8[D]')
+        return starts, starts + np.timedelta64(6, 'D')
+    months = _PERIOD_MONTHS[period_type]
+    first_months = keys * months - 1970 * 12
+    starts = first_months.astype('M8[M]').astype('M8[D]')
+    return starts, (first_months + months).astype('M8[M]').astype('M8[D]') - np.timedelta64(1, 'D')
+
+
+class PeriodIndex:
+    """ Index of (datebegin, dateend) periods for the point, overlap and bulk stabbing queries in O(log n + k).
+        An implicit augmented interval tree (cgranges): the periods are sorted by the beginning and kept in ordinal
+        arrays, the node of level k at the index i stores the maximum end of its subtree.
+        Dates are inclusive, None and 'infinity' ends are unbounded (see get_infinity_date), None beginnings too.
+        Added periods are kept in a buffer, that is merged into the tree, when it grows.
+    """
+    __slots__ = ('_periods', '_starts', '_ends', '_maxes', '_ids', '_max_level', '_pending')
+
+    _MIN_PENDING = 256  # the buffer is merged, when it is longer than this and 1/16 of the tree
+    _SCAN_LEVEL = 3  # subtrees of the level and lower are scanned linearly
+
+    def __init__(self, periods: Iterable[Tuple[date, date]] = ()):
+        """ Build the index.
+
+        Args:
+            periods: (datebegin, dateend) pairs, ids of the periods are their positions
+        """
+        self._periods = []
+        self._pending = []
+        for datebegin, dateend in periods:
+            self._periods.append(self._bounds(datebegin, dateend))
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return len(self._periods)
+
+    @staticmethod
+    def _bounds(datebegin: date, dateend: date) -> Tuple[date, date]:
+        """ Normalized bounds of the period.
+
+        Args:
+            datebegin: start date, None - unbounded
+            dateend: end date, None or 'infinity' - unbounded
+        Returns:
+            start and end dates
+        """
+        datebegin = parse_date(datebegin) if datebegin is not None else date.min
+        dateend = get_infinity_date(dateend) if dateend is not None else get_infinity_date('infinity')
+        return datebegin, dateend
+
+    def _rebuild(self):
+        """ Sort all the periods and build the tree.
+        """
+        # half-open [start, end) ordinals
+        starts = [datebegin.toordinal() for datebegin, _ in self._periods]
+        ends = [dateend.toordinal() + 1 for _, dateend in self._periods]
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        self._ids = array('q', order)
+        self._starts = array('l', [starts[period_id] for period_id in order])
+        self._ends = array('l', [ends[period_id] for period_id in order])
+        self._maxes = array('l', self._ends)
+        self._pending = []
+        self._max_level = self._build_maxes(self._ends, self._maxes)
+
+    @staticmethod
+    def _build_maxes(ends: array, maxes: array) -> int:
+        """ Fill maximum ends of the subtrees of the internal nodes.
+
+        Args:
+            ends: ends of the periods in the order of the beginnings
+            maxes: maximum ends of the subtrees, initialized with ends
+        Returns:
+            level of the root
+        """
+        size = len(ends)
+        if not size:
+            return -1
+        last_idx = (size - 1) & ~1  # the last leaf
+        last_max = maxes[last_idx]
+        level = 1
+        while 1 << level <= size:
+            half = 1 << (level - 1)
+            for idx in range((half << 1) - 1, size, half << 2):
+                right_max = maxes[idx + half] if idx + half < size else last_max
+                maxes[idx] = max(ends[idx], maxes[idx - half], right_max)
+            last_idx = last_idx - half if last_idx >> level & 1 else last_idx + half
+            if last_idx < size and maxes[last_idx] > last_max:
+                last_max = maxes[last_idx]
+            level += 1
+        return level - 1
+
+    def add(self, datebegin: date, dateend: date) -> int:
+        """ Add the period.
+
+        Args:
+            datebegin: start date
+            dateend: end date
+        Returns:
+            id of the period
+        """
+        period_id = len(self._periods)
+        self._periods.append(self._bounds(datebegin, dateend))
+        self._pending.append(period_id)
+        if len(self._pending) > max(self._MIN_PENDING, len(self._starts) >> 4):
+            self._rebuild()
+        return period_id
+
+    def period(self, period_id: int) -> Tuple[date, date]:
+        """ Bounds of the period.
+
+        Args:
+            period_id: id of the period
+        Returns:
+            start and end dates
+        """
+        return self._periods[period_id]
+
+    def _overlap(self, start: int, end: int) -> List[int]:
+        """ Ids of the periods, that overlap the half-open ordinal range.
+
+        Args:
+            start: first ordinal
+            end: ordinal after the last one
+        Returns:
+            ids of the tree periods in the order of the beginnings, then ids of the added ones
+        """
+        starts, ends, maxes, ids = self._starts, self._ends, self._maxes, self._ids
+        size = len(starts)
+        result = []
+        if size:
+            # (level, node index, left child is processed)
+            stack = [(self._max_level, (1 << self._max_level) - 1, False)]
+            while stack:
+                level, idx, left_done = stack.pop()
+                if level <= self._SCAN_LEVEL:
+                    first = idx >> level << level
+                    for pos in range(first, min(first + (1 << (level + 1)) - 1, size)):
+                        if starts[pos] >= end:
+                            break
+                        if start < ends[pos]:
+                            result.append(ids[pos])
+                elif not left_done:
+                    left = idx - (1 << (level - 1))
+                    stack.append((level, idx, True))
+                    if left >= size or maxes[left] > start:
+                        stack.append((level - 1, left, False))
+                elif idx < size and starts[idx] < end:
+                    if start < ends[idx]:
+                        result.append(ids[idx])
+                    stack.append((level - 1, idx + (1 << (level - 1)), False))
+        for period_id in self._pending:
+            datebegin, dateend = self._periods[period_id]
+            if datebegin.toordinal() < end and start <= dateend.toordinal():
+                result.append(period_id)
+        return result
+
+    def contains(self, day: date) -> List[int]:
+        """ Ids of the periods, that contain the date.
+
+        Args:
+            day: date
+        Returns:
+            ids of the periods
+        """
+        ordinal = parse_date(day).toordinal()
+        return self._overlap(ordinal, ordinal + 1)
+
+    def overlap(self, datebegin: date, dateend: date) -> List[int]:
+        """ Ids of the periods, that overlap the range.
+
+        Args:
+            datebegin: start date
+            dateend: end date (included)
+        Returns:
+            ids of the periods
+        """
+        datebegin, dateend = self._bounds(datebegin, dateend)
+        return self._overlap(datebegin.toordinal(), dateend.toordinal() + 1)
+
+    def contains_many(self, days: Iterable[date]) -> List[List[int]]:
+        """ Bulk stabbing: ids of the periods, that contain each of the dates.
+
+        Args:
+            days: dates
+        Returns:
+            ids of the periods for each date
+        """
+        return [self.contains(day) for day in days]
+
+
+def _period_keys_array(timestamps, period_type: str):
+    """ NumPy version of _period_key.
+
+    Args:
+        timestamps: datetime64 array without NaT
+        period_type: PERIOD_TYPE_*
+    Returns:
+        int64 array of the numbers of the periods
+    """
+    import numpy as np
+
+    if period_type == PERIOD_TYPE_HOUR:
+        return timestamps.astype('M8[h]').astype(np.int64) + _EPOCH_ORDINAL * 24
+    if period_type in (PERIOD_TYPE_DAY, PERIOD_TYPE_WEEK):
+        ordinals = timestamps.astype('M8[D]').astype(np.int64) + _EPOCH_ORDINAL
+        return ordinals if period_type == PERIOD_TYPE_DAY else (ordinals - 1) // 7
+    return (timestamps.astype('M8[M]').astype(np.int64) + 1970 * 12) // _PERIOD_MONTHS[period_type]
+
+
+class BucketCounter:
+    """ Counts (or sums of weights) of the timestamps by the periods of the type, built chunk by chunk.
+        Only the non-empty buckets are stored, the results are zero-filled between the first and the last one.
+    """
+    __slots__ = ('period_type', 'counts')
+
+    def __init__(self, period_type: str = PERIOD_TYPE_HOUR):
+        """ Create an empty counter.
+
+        Args:
+            period_type: PERIOD_TYPE_* of the buckets
+        """
+        self.period_type = period_type
+        self.counts = {}  # number of the period (see _period_key) -> count
+
+    def update(self, timestamps: Iterable, weights: Optional[Iterable] = None) -> 'BucketCounter':
+        """ Count the chunk of timestamps. NumPy datetime64 arrays are counted by bincount, NaT is skipped.
+
+        Args:
+            timestamps: dates or datetimes, None is skipped
+            weights: weights of the timestamps, 1 by default
+        Returns:
+            the counter
+        """
+        counts = self.counts
+        if getattr(timestamps, 'dtype', None) is None:
+            period_type = self.period_type
+            if weights is None:
+                for timestamp in timestamps:
+                    if timestamp is not None:
+                        key = _period_key(timestamp, period_type)
+                        counts[key] = counts.get(key, 0) + 1
+            else:
+                for timestamp, weight in zip(timestamps, weights):
+                    if timestamp is not None:
+                        key = _period_key(timestamp, period_type)
+                        counts[key] = counts.get(key, 0) + weight
+            return self
+
+        import numpy as np
+
+        is_valid = ~np.isnat(timestamps)
+        timestamps = timestamps[is_valid]
+        if weights is not None:
+            weights = np.asarray(weights)[is_valid]
+        if not timestamps.size:
+            return self
+        keys = _period_keys_array(timestamps, self.period_type)
+        first_key = int(keys.min())
+        chunk_counts = np.bincount(keys - first_key, weights=weights)
+        non_empty = np.flatnonzero(chunk_counts)
+        for key, count in zip((non_empty + first_key).tolist(), chunk_counts[non_empty].tolist()):
+            counts[key] = counts.get(key, 0) + count
+        return self
+
+    def items(self) -> List[Tuple[date, float]]:
+        """ Zero-filled buckets.
+
+        Returns:
+            (period start, count) pairs in the date order
+        """
+        if not self.counts:
+            return []
+        counts = self.counts
+        return [
+            (_period_bounds(key, self.period_type)[0], counts.get(key, 0))
+            for key in range(min(counts), max(counts) + 1)
+        ]
+
+    def to_arrays(self):
+        """ NumPy version of items.
+
+        Returns:
+            period starts (see periods_array) and counts arrays
+        """
+        import numpy as np
+
+        if not self.counts:
+            return np.array([], dtype='M8[D]'), np.array([], dtype=np.int64)
+        first_key, last_key = min(self.counts), max(self.counts)
+        starts, _ = periods_array(
+            _period_bounds(first_key, self.period_type)[0], _period_bounds(last_key, self.period_type)[0],
+            self.period_type
+        )
+        values = list(self.counts.values())
+        dtype = np.float64 if any(isinstance(value, float) for value in values) else np.int64
+        counts = np.zeros(last_key - first_key + 1, dtype=dtype)
+        counts[np.fromiter(self.counts, dtype=np.int64, count=len(self.counts)) - first_key] = values
+        return starts, counts
+
+
+def bucket_counts(timestamps: Iterable, period_type: str = PERIOD_TYPE_HOUR, weights: Optional[Iterable] = None):
+    """ Zero-filled histogram of the timestamps by the periods of the type.
+        Streams of chunks are counted by BucketCounter.
+
+    Args:
+        timestamps: dates, datetimes or NumPy datetime64 array
+        period_type: PERIOD_TYPE_* of the buckets
+        weights: weights of the timestamps, 1 by default
+    Returns:
+        (period start, count) pairs or, for a NumPy array, period starts and counts arrays
+    """
+    counter = BucketCounter(period_type).update(timestamps, weights)
+    if getattr(timestamps, 'dtype', None) is None:
+        return counter.items()
+    return counter.to_arrays()
+
+
+def prior_period_dates(dates: Sequence, period_type: str = PERIOD_TYPE_YEAR) -> Sequence:
+    """ Counterparts of the dates in the prior month, quarter, half a year or year.
+        The day of the month is kept and clamped to the end of the month (31.03 -> 28.02), the time is kept.
+        NumPy datetime64 arrays are computed by array operations, NaT stays NaT.
+
+    Args:
+        dates: dates or datetimes
+        period_type: PERIOD_TYPE_* from month to year
+    Returns:
+        dates of the prior period: list or NumPy datetime64 array of the same unit
+    """
+    months = _PERIOD_MONTHS[period_type]
+    if getattr(dates, 'dtype', None) is None:
+        result = []
+        for date_ in dates:
+            year, month = divmod(date_.year * 12 + date_.month - 1 - months, 12)
+            day = min(date_.day, calendar.monthrange(year, month + 1)[1])
+            result.append(date_.replace(year=year, month=month + 1, day=day))
+        return result
+
+    import numpy as np
+
+    days = dates.astype('M8[D]')
+    month_starts = dates.astype('M8[M]')
+    prior_months = month_starts - np.timedelta64(months, 'M')
+    prior_month_lens = (prior_months + 1).astype('M8[D]') - prior_months.astype('M8[D]')
+    day_offsets = np.minimum(days - month_starts.astype('M8[D]'), prior_month_lens - np.timedelta64(1, 'D'))
+    return (prior_months.astype('M8[D]') + day_offsets).astype(dates.dtype) + (dates - days.astype(dates.dtype))
+
+
+def align_prior_period(
+    dates: Sequence, prior_dates: Optional[Sequence] = None, period_type: str = PERIOD_TYPE_YEAR
+) -> Sequence[int]:
+    """ Index mapping of a series to its counterparts in the prior period (see prior_period_dates).
+        E.g. for year-over-year: values[i] is compared with prior_values[mapping[i]].
+        NumPy datetime64 arrays are matched by a sorted search.
+
+    Args:
+        dates: dates of the series
+        prior_dates: dates of the series to align to, the same series by default
+        period_type: PERIOD_TYPE_* from month to year
+    Returns:
+        index in prior_dates of the counterpart of each date (the first one of equal dates) or -1:
+        list or NumPy int64 array
+    """
+    if prior_dates is None:
+        prior_dates = dates
+    targets = prior_period_dates(dates, period_type)
+    if getattr(targets, 'dtype', None) is None or getattr(prior_dates, 'dtype', None) is None:
+        positions = {}
+        for idx, prior_date in enumerate(prior_dates):
+            positions.setdefault(prior_date, idx)
+        return [positions.get(target, -1) for target in targets]
+
+    import numpy as np
+
+    targets = targets.astype(np.promote_types(targets.dtype, prior_dates.dtype))
+    order = np.argsort(prior_dates, kind='stable')
+    sorted_dates = prior_dates[order].astype(targets.dtype)
+    if not sorted_dates.size:
+        return np.full(targets.shape, -1, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(sorted_dates, targets), sorted_dates.size - 1)
+    return np.where(sorted_dates[positions] == targets, order[positions], -1).astype(np.int64)
+
+
+class AggregateSummary(NamedTuple):
+    """ Summary of the values of a range.
+    """
+    count: int
+    sum: float
+    min: Optional[float]
+    max: Optional[float]
+
+
+# the dense arrays of _PeriodBuckets grow at once by at most this number of periods or their length, farther periods
+# are kept in a dict, so a single outlier (an event of 1970 in a stream of 2024 hours) does not allocate every period
+# between them
+_DENSE_MAX_GAP = 1024
+
+
+class _PeriodBuckets:
+    """ Array-backed accumulators of the consecutive periods of a type from first_key.
+        The periods far from the arrays are accumulated in the sparse dict.
+    """
+    __slots__ = ('period_type', 'first_key', 'counts', 'sums', 'mins', 'maxes', 'sparse')
+
+    def __init__(self, period_type: str):
+        self.period_type = period_type
+        self.first_key = None
+        self.counts = array('q')
+        self.sums = array('d')
+        self.mins = array('d')
+        self.maxes = array('d')
+        self.sparse = {}  # number of the period -> [count, sum, min, max]
+
+    def _reserve(self, key: int) -> Optional[int]:
+        """ Grow the arrays to the period, if it is not farther than _DENSE_MAX_GAP or their length from them.
+
+        Args:
+            key: number of the period (see _period_key)
+        Returns:
+            position of the period in the arrays, None for a period of the sparse dict
+        """
+        if self.first_key is None or not self.counts:
+            self.first_key = key
+        max_gap = max(_DENSE_MAX_GAP, len(self.counts))
+        if key < self.first_key:
+            qty = self.first_key - key
+            if qty > max_gap:
+                return None
+            self.counts[0:0] = array('q', bytes(8 * qty))
+            self.sums[0:0] = array('d', bytes(8 * qty))
+            self.mins[0:0] = array('d', [float('inf')]) * qty
+            self.maxes[0:0] = array('d', [float('-inf')]) * qty
+            self.first_key = key
+        pos = key - self.first_key
+        if pos >= len(self.counts):
+            qty = pos - len(self.counts) + 1
+            if qty > max_gap:
+                return None
+            self.counts.extend(array('q', bytes(8 * qty)))
+            self.sums.extend(array('d', bytes(8 * qty)))
+            self.mins.extend(array('d', [float('inf')]) * qty)
+            self.maxes.extend(array('d', [float('-inf')]) * qty)
+        return pos
+
+    def add(self, key: int, count: int, sum_: float, min_: float, max_: float):
+        """ Add the summary of values to the period.
+
+        Args:
+            key: number of the period
+            count: number of the values
+            sum_: sum of the values
+            min_: minimum of the values
+            max_: maximum of the values
+        """
+        pos = self._reserve(key)
+        if pos is None:
+            bucket = self.sparse.get(key)
+            if bucket is None:
+                self.sparse[key] = [count, sum_, min_, max_]
+            else:
+                bucket[0] += count
+                bucket[1] += sum_
+                bucket[2] = min(bucket[2], min_)
+                bucket[3] = max(bucket[3], max_)
+            return
+        self.counts[pos] += count
+        self.sums[pos] += sum_
+        if min_ < self.mins[pos]:
+            self.mins[pos] = min_
+        if max_ > self.maxes[pos]:
+            self.maxes[pos] = max_
+
+    def evict_before(self, key: int):
+        """ Drop the periods before the period.
+
+        Args:
+            key: number of the first period to keep
+        """
+        if self.sparse:
+            for sparse_key in [sparse_key for sparse_key in self.sparse if sparse_key < key]:
+                del self.sparse[sparse_key]
+        if self.first_key is None or key <= self.first_key:
+            return
+        qty = min(key - self.first_key, len(self.counts))
+        for values in (self.counts, self.sums, self.mins, self.maxes):
+            del values[:qty]
+        self.first_key = key
+
+    def summary(self, first_key: int, last_key: int) -> Tuple[int, float, float, float]:
+        """ Summary of the periods from first_key to last_key.
+
+        Args:
+            first_key: number of the first period
+            last_key: number of the last period (included)
+        Returns:
+            count, sum, minimum and maximum
+        """
+        count, sum_, min_, max_ = 0, 0.0, float('inf'), float('-inf')
+        if self.first_key is not None:
+            first = max(first_key - self.first_key, 0)
+            last = min(last_key - self.first_key + 1, len(self.counts))
+            if first < last:
+                count, sum_ = sum(self.counts[first:last]), sum(self.sums[first:last])
+                min_, max_ = min(self.mins[first:last]), max(self.maxes[first:last])
+        for key, (sparse_count, sparse_sum, sparse_min, sparse_max) in self.sparse.items():
+            if first_key <= key <= last_key:
+                count += sparse_count
+                sum_ += sparse_sum
+                min_ = min(min_, sparse_min)
+                max_ = max(max_, sparse_max)
+        return count, sum_, min_, max_
+
+
+class PeriodAggregator:
+    """ Incremental count/sum/min/max of a stream of (timestamp, value) by the periods of several types at once.
+        Days and months are always kept: range queries combine them by split_dates_for_aggregate().
+    """
+    __slots__ = ('buckets', 'retention', 'latest')
+
+    def __init__(self, period_types: Iterable[str] = (PERIOD_TYPE_DAY, PERIOD_TYPE_MONTH),
+                 retention: Optional[timedelta] = None):
+        """ Create an empty aggregator.
+
+        Args:
+            period_types: PERIOD_TYPE_* of the buckets
+            retention: buckets, that end earlier than the latest timestamp minus retention, are dropped
+                       (a month is kept, while any of its days is in the window)
+        """
+        period_types = set(period_types) | {PERIOD_TYPE_DAY, PERIOD_TYPE_MONTH}
+        self.buckets = {period_type: _PeriodBuckets(period_type) for period_type in period_types}
+        self.retention = retention
+        self.latest = None
+
+    def update(self, timestamps: Iterable, values: Iterable) -> 'PeriodAggregator':
+        """ Consume the batch. NumPy datetime64 arrays are reduced by array operations, NaT is skipped.
+
+        Args:
+            timestamps: dates or datetimes (datetimes for PERIOD_TYPE_HOUR), None is skipped
+            values: numbers of the same length
+        Returns:
+            the aggregator
+        """
+        if getattr(timestamps, 'dtype', None) is None:
+            latest = self.latest
+            for timestamp, value in zip(timestamps, values):
+                if timestamp is None:
+                    continue
+                for period_type, buckets in self.buckets.items():
+                    buckets.add(_period_key(timestamp, period_type), 1, value, value, value)
+                if latest is None or timestamp > latest:
+                    latest = timestamp
+            self.latest = latest
+        else:
+            self._update_array(timestamps, values)
+        if self.retention is not None and self.latest is not None:
+            self.evict(self.latest - self.retention)
+        return self
+
+    def _update_array(self, timestamps, values):
+        """ Consume the batch of NumPy arrays.
+
+        Args:
+            timestamps: datetime64 array
+            values: numbers array of the same length
+        """
+        import numpy as np
+
+        is_valid = ~np.isnat(timestamps)
+        timestamps = timestamps[is_valid]
+        values = np.asarray(values, dtype=np.float64)[is_valid]
+        if not timestamps.size:
+            return
+        for period_type, buckets in self.buckets.items():
+            keys = _period_keys_array(timestamps, period_type)
+            first_key = int(keys.min())
+            if int(keys.max()) - first_key < keys.size + _DENSE_MAX_GAP:
+                offsets = keys - first_key
+                counts = np.bincount(offsets)
+                period_keys = np.arange(first_key, first_key + counts.size)
+            else:
+                # far-apart periods are numbered by the rank, the arrays do not cover the gaps between them
+                period_keys, offsets = np.unique(keys, return_inverse=True)
+                counts = np.bincount(offsets)
+            sums = np.bincount(offsets, weights=values)
+            mins = np.full(counts.size, np.inf)
+            maxes = np.full(counts.size, -np.inf)
+            np.minimum.at(mins, offsets, values)
+            np.maximum.at(maxes, offsets, values)
+            non_empty = np.flatnonzero(counts)
+            for key, count, sum_, min_, max_ in zip(
+                period_keys[non_empty].tolist(), counts[non_empty].tolist(), sums[non_empty].tolist(),
+                mins[non_empty].tolist(), maxes[non_empty].tolist()
+            ):
+                buckets.add(key, count, sum_, min_, max_)
+        # dates for the day and coarser units, datetimes otherwise
+        is_dates = np.datetime_data(timestamps.dtype)[0] in ('Y', 'M', 'W', 'D')
+        latest = timestamps.max().astype('M8[D]' if is_dates else 'M8[us]').item()
+        if self.latest is None or latest > self.latest:
+            self.latest = latest
+
+    def evict(self, before: date):
+        """ Drop the buckets, that end before the date.
+
+        Args:
+            before: date (datetime) of the retention boundary
+        """
+        for period_type, buckets in self.buckets.items():
+            buckets.evict_before(_period_key(before, period_type))
+
+    def bucket(self, day: date, period_type: str = PERIOD_TYPE_MONTH) -> AggregateSummary:
+        """ Summary of the period of the type, that contains the date.
+
+        Args:
+            day: date
+            period_type: one of the PERIOD_TYPE_* of the aggregator
+        Returns:
+            summary of the period
+        """
+        key = _period_key(day, period_type)
+        return self._summary([self.buckets[period_type].summary(key, key)])
+
+    def query(self, date_begin: date, date_end: date) -> AggregateSummary:
+        """ Summary of the range, combined from the monthly buckets of the center and the daily ones of the edges.
+
+        Args:
+            date_begin: period start date
+            date_end: period end date (included)
+        Returns:
+            summary of the range
+        """
+        parts = []
+        if date_begin and date_end and date_begin <= date_end:
+            begin_left, end_left, begin_center, end_center, begin_right, end_right = split_dates_for_aggregate(
+                date_begin, date_end
+            )
+            for period_type, begin, end in (
+                (PERIOD_TYPE_DAY, begin_left, end_left),
+                (PERIOD_TYPE_MONTH, begin_center, end_center),
+                (PERIOD_TYPE_DAY, begin_right, end_right)
+            ):
+                if begin and end and begin <= end:
+                    parts.append(self.buckets[period_type].summary(
+                        _period_key(begin, period_type), _period_key(end, period_type)
+                    ))
+        return self._summary(parts)
+
+    @staticmethod
+    def _summary(parts: List[Tuple[int, float, float, float]]) -> AggregateSummary:
+        """ Combine the summaries of the parts.
+
+        Args:
+            parts: (count, sum, min, max) of the parts
+        Returns:
+            summary
+        """
+        count = sum(part[0] for part in parts)
+        if not count:
+            return AggregateSummary(0, 0.0, None, None)
+        return AggregateSummary(
+            count, sum(part[1] for part in parts), min(part[2] for part in parts), max(part[3] for part in parts)
+        )
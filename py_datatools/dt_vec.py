@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+""" VECTORIZED DT_HELPER BOUNDARY FUNCTIONS OVER NUMPY DATETIME64 ARRAYS.
+    Each function matches the scalar function of dt_helper with the same name element-wise, NaT stays NaT.
+"""
+__author__ = 'kokarev.nv'
+
+from typing import Iterable
+
+import numpy as np
+
+QUARTER_NAMES = np.array(['I', 'II', 'III', 'IV'])
+
+
+def as_datetime64(dates: Iterable) -> np.ndarray:
+    """ Convert dates to a datetime64 array, datetime64 arrays are returned as is.
+
+    Args:
+        dates: datetime64 array or sequence of dates/datetimes
+    Returns:
+        datetime64 array
+    """
+    dates = np.asarray(dates)
+    if dates.dtype.kind != 'M':
+        dates = dates.astype('M8[us]')
+    return dates
+
+
+def _month_numbers(dates: np.ndarray) -> np.ndarray:
+    """ Months since 1970-01 of the dates, NaT gives 0.
+
+    Args:
+        dates: datetime64 array
+    Returns:
+        int64 array
+    """
+    return np.where(np.isnat(dates), 0, dates.astype('M8[M]').astype(np.int64))
+
+
+def to_start_of_month(dates: Iterable) -> np.ndarray:
+    """ Start dates of the months of the dates.
+
+    Args:
+        dates: datetime64 array or sequence of dates
+    Returns:
+        datetime64[D] array
+    """
+    return as_datetime64(dates).astype('M8[M]').astype('M8[D]')
+
+
+def to_end_of_month(dates: Iterable) -> np.ndarray:
+    """ End dates of the months of the dates.
+
+    Args:
+        dates: datetime64 array or sequence of dates
+    Returns:
+        datetime64[D] array
+    """
+    return (as_datetime64(dates).astype('M8[M]') + 1).astype('M8[D]') - np.timedelta64(1, 'D')
+
+
+def to_start_of_hour(dates: Iterable) -> np.ndarray:
+    """ Date and time of the beginning of the hours of the timestamps.
+
+    Args:
+        dates: datetime64 array or sequence of datetimes
+    Returns:
+        datetime64[s] array
+    """
+    return as_datetime64(dates).astype('M8[h]').astype('M8[s]')
+
+
+def to_begin_of_year(dates: Iterable) -> np.ndarray:
+    """ Start dates of the years of the dates.
+
+    Args:
+        dates: datetime64 array or sequence of dates
+    Returns:
+        datetime64[D] array
+    """
+    return as_datetime64(dates).astype('M8[Y]').astype('M8[D]')
+
+
+def begin_of_current_quarter(dates: Iterable) -> np.ndarray:
+    """ Start dates of the quarters of the dates.
+
+    Args:
+        dates: datetime64 array or sequence of dates
+    Returns:
+        datetime64[D] array
+    """
+    dates = as_datetime64(dates)
+    months = _month_numbers(dates)
+    result = (months - months % 3).astype('M8[M]').astype('M8[D]')
+    result[np.isnat(dates)] = np.datetime64('NaT')
+    return result
+
+
+def get_quarter_name(dates: Iterable) -> np.ndarray:
+    """ Names of the quarters of the dates (Roman numerals), NaT gives an empty string.
+
+    Args:
+        dates: datetime64 array or sequence of dates
+    Returns:
+        str array
+    """
+    dates = as_datetime64(dates)
+    result = QUARTER_NAMES[_month_numbers(dates) % 12 // 3]
+    result[np.isnat(dates)] = ''
+    return result
@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+""" OPT-IN INSTRUMENTATION OF THE PUBLIC FUNCTIONS.
+    enable() replaces the public functions of the package (__all__) and the public methods of Collections, Numbers,
+    CKey, Text, Validators and SQLHelper with wrappers, that count calls, errors, latency and input sizes into
+    per-thread counters, disable() puts the original functions back, so nothing is paid, while the instrumentation
+    is off. The counters of a finished thread are merged into the common ones. Only the outermost public calls are
+    counted: the functions called by another public function (try_true by try_bool) are a part of its call.
+    Names imported by `from py_datatools... import name` before enable() keep calling the original functions.
+
+    from py_datatools import instrument
+
+    instrument.enable()
+    ...
+    instrument.snapshot()                             # {'dt_helper.to_start_of_month': {'calls': 10, ...}, ...}
+    instrument.write_prometheus('/var/lib/node_exporter/py_datatools.prom')
+    instrument.disable()
+"""
+__author__ = 'kokarev.nv'
+
+import os
+import weakref
+import inspect
+import tempfile
+import threading
+import functools
+from time import perf_counter
+from typing import Callable, Iterable, Optional
+
+from . import common
+from . import dt_helper
+from . import py_datatools
+
+INSTRUMENTED_CLASSES = ('Collections', 'Numbers', 'CKey', 'Text', 'Validators', 'SQLHelper')
+# log2 buckets: a latency of 2 ** (idx - 1) <= microseconds < 2 ** idx and an input size of bit_length idx
+LATENCY_BUCKETS = 32
+SIZE_BUCKETS = 40
+PERCENTILES = (0.5, 0.9, 0.99)
+METRIC_PREFIX = 'py_datatools'
+
+# reentrant: the counters of a finished thread can be merged by the garbage collector inside a locked section
+_lock = threading.RLock()
+_local = threading.local()
+_thread_stats = []  # counters of the running threads: {name: [calls, errors, seconds, latency buckets, size buckets]}
+_finished_stats = {}  # counters of the finished threads
+_patches = []  # (owner, attribute name, original attribute)
+
+
+class _ThreadMarker:
+    """ Object of the thread-local storage, it is deleted with the storage, when the thread ends. """
+
+
+def _merge(total: dict, stats: dict):
+    """ Add the counters to the total ones.
+
+    Args:
+        total: counters to update
+        stats: added counters
+    """
+    for name, (calls, errors, seconds, latency, sizes) in list(stats.items()):
+        counters = total.get(name)
+        if counters is None:
+            counters = total[name] = [0, 0, 0.0, [0] * LATENCY_BUCKETS, [0] * SIZE_BUCKETS]
+        counters[0] += calls
+        counters[1] += errors
+        counters[2] += seconds
+        counters[3] = [left + right for left, right in zip(counters[3], latency)]
+        counters[4] = [left + right for left, right in zip(counters[4], sizes)]
+
+
+def _retire_stats(stats: dict):
+    """ Merge the counters of the finished thread into the common ones and forget the thread.
+
+    Args:
+        stats: counters of the thread
+    """
+    with _lock:
+        _merge(_finished_stats, stats)
+        _thread_stats.remove(stats)
+
+
+def _get_stats(name: str) -> list:
+    """ Counters of the function in the current thread.
+
+    Args:
+        name: instrumented name
+    Returns:
+        [calls, errors, seconds, latency buckets, size buckets]
+    """
+    try:
+        stats = _local.stats
+    except AttributeError:
+        stats = _local.stats = {}
+        _local.marker = marker = _ThreadMarker()
+        with _lock:
+            _thread_stats.append(stats)
+        weakref.finalize(marker, _retire_stats, stats)
+    counters = stats.get(name)
+    if counters is None:
+        counters = stats[name] = [0, 0, 0.0, [0] * LATENCY_BUCKETS, [0] * SIZE_BUCKETS]
+    return counters
+
+
+def _record(name: str, seconds: float, size: Optional[int], failed: bool):
+    """ Count one call.
+
+    Args:
+        name: instrumented name
+        seconds: duration of the call
+        size: input size, None if unknown
+        failed: the call raised an exception
+    """
+    counters = _get_stats(name)
+    counters[0] += 1
+    counters[1] += failed
+    counters[2] += seconds
+    counters[3][min(int(seconds * 1000000).bit_length(), LATENCY_BUCKETS - 1)] += 1
+    if size is not None:
+        counters[4][min(size.bit_length(), SIZE_BUCKETS - 1)] += 1
+
+
+def _size_getter(func: Callable) -> Callable:
+    """ Getter of the input size of the calls: the number of the variadic arguments (distinct(*args)),
+        otherwise the length of the first argument after self/cls, if it has one.
+
+    Args:
+        func: original function
+    Returns:
+        function (args) -> Optional[int]
+    """
+    try:
+        params = list(inspect.signature(func).parameters.values())
+    except (TypeError, ValueError):
+        return lambda args: None
+    skip = 1 if params and params[0].name in ('self', 'cls') else 0
+    params = params[skip:]
+    if params and params[0].kind is inspect.Parameter.VAR_POSITIONAL:
+        return lambda args: len(args) - skip
+
+    def first_len(args: tuple) -> Optional[int]:
+        if len(args) > skip:
+            try:
+                return len(args[skip])
+            except TypeError:
+                pass
+        return None
+
+    return first_len
+
+
+def _wrap(name: str, func: Callable) -> Callable:
+    """ Instrumented version of the function. Generators are measured by the time spent inside them.
+        Only the outermost public call of the thread is recorded, the nested ones (try_true called by try_bool)
+        are a part of its time.
+
+    Args:
+        name: instrumented name
+        func: original function
+    Returns:
+        wrapper
+    """
+    size_of = _size_getter(func)
+
+    if inspect.isgeneratorfunction(func):
+        def measured(generator, args: tuple, seconds: float):
+            failed = False
+            try:
+                while True:
+                    depth = getattr(_local, 'depth', 0)
+                    _local.depth = depth + 1
+                    started = perf_counter()
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                    except BaseException:
+                        failed = True
+                        raise
+                    finally:
+                        seconds += perf_counter() - started
+                        _local.depth = depth
+                    yield item
+            finally:
+                # the consumer may stop early
+                generator.close()
+                _record(name, seconds, size_of(args), failed)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, 'depth', 0):
+                # called by another public function, the time is a part of its call
+                return func(*args, **kwargs)
+            started = perf_counter()
+            generator = func(*args, **kwargs)
+            return measured(generator, args, perf_counter() - started)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, 'depth', 0):
+                # called by another public function, the time is a part of its call
+                return func(*args, **kwargs)
+            _local.depth = 1
+            failed = True
+            started = perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                _local.depth = 0
+                _record(name, perf_counter() - started, size_of(args), failed)
+
+    # lru_cache functions keep cache_info/cache_clear
+    for attr in ('cache_info', 'cache_clear'):
+        if hasattr(func, attr):
+            setattr(wrapper, attr, getattr(func, attr))
+    return wrapper
+
+
+def _targets() -> Iterable[tuple]:
+    """ Public functions to instrument: the functions of the package __all__ and the methods of the classes.
+
+    Yields:
+        (owner, attribute name, instrumented name)
+    """
+    package = __import__(__package__)
+    modules = {'common': common, 'py_datatools': py_datatools, 'dt_helper': dt_helper}
+    for attr in package.__all__:
+        # submodules of the other names are not imported
+        module = modules.get(package._LAZY_NAMES[attr])
+        value = getattr(module, attr, None)
+        if callable(value) and not isinstance(value, type):
+            yield module, attr, f'{module.__name__.rpartition(".")[2]}.{attr}'
+    for class_name in INSTRUMENTED_CLASSES:
+        owner = getattr(py_datatools, class_name)
+        for attr, value in vars(owner).items():
+            if not attr.startswith('_') and not isinstance(value, type) and (
+                isinstance(value, (staticmethod, classmethod)) or callable(value)
+            ):
+                yield owner, attr, f'{class_name}.{attr}'
+
+
+def is_enabled() -> bool:
+    """ The public functions are instrumented.
+
+    Returns:
+        bool
+    """
+    return bool(_patches)
+
+
+def enable():
+    """ Instrument the public functions, the repeated call does nothing. """
+    with _lock:
+        if _patches:
+            return
+        package = __import__(__package__)
+        replaced = {}
+        for owner, attr, name in list(_targets()):
+            original = vars(owner)[attr]
+            if isinstance(original, (staticmethod, classmethod)):
+                patched = type(original)(_wrap(name, original.__func__))
+            else:
+                patched = replaced[original] = _wrap(name, original)
+            setattr(owner, attr, patched)
+            _patches.append((owner, attr, original))
+        # names, that were already loaded by the package __getattr__
+        for attr, value in list(vars(package).items()):
+            if callable(value) and not isinstance(value, type) and value in replaced:
+                setattr(package, attr, replaced[value])
+                _patches.append((package, attr, value))
+
+
+def disable():
+    """ Put the original functions back, the counters are kept. """
+    with _lock:
+        while _patches:
+            owner, attr, original = _patches.pop()
+            setattr(owner, attr, original)
+
+
+def reset():
+    """ Zero the counters of all the threads. """
+    with _lock:
+        _finished_stats.clear()
+        for stats in _thread_stats:
+            stats.clear()
+
+
+def _percentile(buckets: list, quantile: float) -> Optional[float]:
+    """ Upper bound of the latency bucket of the quantile.
+
+    Args:
+        buckets: latency buckets
+        quantile: 0..1
+    Returns:
+        seconds, None without calls
+    """
+    total = sum(buckets)
+    if not total:
+        return None
+    rank = quantile * total
+    seen = 0
+    for idx, count in enumerate(buckets):
+        seen += count
+        if seen >= rank:
+            return 2 ** idx / 1000000
+    return 2 ** (len(buckets) - 1) / 1000000
+
+
+def snapshot() -> dict:
+    """ Counters of all the threads summed by the functions. The counters of the other threads are read without
+        stopping them, so a snapshot can miss the calls, that are being counted.
+
+    Returns:
+        instrumented name: {
+            'calls', 'errors', 'seconds', 'p50', 'p90', 'p99' (seconds, upper bounds of the log2 buckets),
+            'latency_buckets': {upper bound seconds: calls}, 'size_buckets': {upper bound size: calls}
+        }
+    """
+    totals = {}
+    with _lock:
+        _merge(totals, _finished_stats)
+        thread_stats = list(_thread_stats)
+    for stats in thread_stats:
+        _merge(totals, stats)
+
+    result = {}
+    for name, (calls, errors, seconds, latency, sizes) in sorted(totals.items()):
+        result[name] = {
+            'calls': calls,
+            'errors': errors,
+            'seconds': seconds,
+            **{f'p{round(quantile * 100)}': _percentile(latency, quantile) for quantile in PERCENTILES},
+            'latency_buckets': {2 ** idx / 1000000: count for idx, count in enumerate(latency) if count},
+            'size_buckets': {2 ** idx - 1: count for idx, count in enumerate(sizes) if count},
+        }
+    return result
+
+
+def _histogram_lines(metric: str, labels: str, buckets: dict, count: int, sum_: Optional[float] = None) -> list:
+    """ Prometheus histogram samples with cumulative buckets.
+
+    Args:
+        metric: metric name
+        labels: `function="..."`
+        buckets: {upper bound: calls} of snapshot()
+        count: number of the observations
+        sum_: sum of the observations, if known
+    Returns:
+        lines
+    """
+    lines = []
+    cumulative = 0
+    for bound, calls in sorted(buckets.items()):
+        cumulative += calls
+        lines.append(f'{metric}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+    lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {count}')
+    if sum_ is not None:
+        lines.append(f'{metric}_sum{{{labels}}} {sum_!r}')
+    lines.append(f'{metric}_count{{{labels}}} {count}')
+    return lines
+
+
+def to_prometheus(data: Optional[dict] = None) -> str:
+    """ Prometheus text exposition format of the snapshot.
+
+    Args:
+        data: result of snapshot(), the current snapshot by default
+    Returns:
+        str
+    """
+    if data is None:
+        data = snapshot()
+    calls = f'{METRIC_PREFIX}_calls_total'
+    errors = f'{METRIC_PREFIX}_errors_total'
+    duration = f'{METRIC_PREFIX}_call_duration_seconds'
+    size = f'{METRIC_PREFIX}_call_input_size'
+    sections = {
+        calls: [f'# HELP {calls} Calls of the function.', f'# TYPE {calls} counter'],
+        errors: [f'# HELP {errors} Calls of the function, that raised an exception.', f'# TYPE {errors} counter'],
+        duration: [f'# HELP {duration} Latency of the function.', f'# TYPE {duration} histogram'],
+        size: [
+            f'# HELP {size} Length of the input of the function (the first argument or the variadic arguments).',
+            f'# TYPE {size} histogram'
+        ],
+    }
+    for name, stats in data.items():
+        labels = f'function="{name}"'
+        sections[calls].append(f'{calls}{{{labels}}} {stats["calls"]}')
+        sections[errors].append(f'{errors}{{{labels}}} {stats["errors"]}')
+        sections[duration].extend(
+            _histogram_lines(duration, labels, stats['latency_buckets'], stats['calls'], stats['seconds'])
+        )
+        if stats['size_buckets']:
+            sections[size].extend(
+                _histogram_lines(size, labels, stats['size_buckets'], sum(stats['size_buckets'].values()))
+            )
+    return ''.join(f'{line}\n' for lines in sections.values() for line in lines)
+
+
+def write_prometheus(path: str, data: Optional[dict] = None):
+    """ Write the snapshot in Prometheus text format into the local file (e.g. for the node_exporter textfile
+        collector). The file is replaced atomically, readers never see a partial file.
+
+    Args:
+        path: file path
+        data: result of snapshot(), the current snapshot by default
+    """
+    text = to_prometheus(data)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.py_datatools', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as file_obj:
+            file_obj.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
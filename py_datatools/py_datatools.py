@@ -3,81 +3,28 @@
 """
 __author__ = 'kokarev.nv'
 
-import json
 import functools
 
+from collections.abc import Mapping, MutableMapping
 from enum import Enum
-from re import findall
-from random import getrandbits
-from typing import Any, Optional, Union, Collection, Sequence, Callable
+from bisect import bisect_left, bisect_right
+from itertools import islice, chain
+from re import findall, Match
+from random import getrandbits, random
+from typing import TYPE_CHECKING, Any, Optional, Union, Collection, Sequence, Callable, Iterable
 from .constants import (
-    PREDEFINED_TRUE_ARRAY, PREDEFINED_FALSE_ARRAY, VALID_ARRAY_TYPES, ONLY_NUMBERS_SYMBOLS
+    VALID_ARRAY_TYPES, ONLY_NUMBERS_SYMBOLS, HSTORE_PAIR_PATTERN,
+    HSTORE_ESCAPED_CHAR, HSTORE_ARROWS, HSTORE_DELIMITERS, HSTORE_NESTED_PREFIX,
+    HSTORE_ESCAPE_TABLE, HSTORE_COPY_ESCAPE_TABLE, SQL_LOG_NORMALIZE_PATTERN, SQL_LOG_NORMALIZE_BYTES_PATTERN,
+    SQL_PARAMS_BUCKETS, SQL_PARAMSTYLES, SQL_LOG_LEVEL, COALESCE_MODES
 )
+# re-exported, `from py_datatools.py_datatools import try_bool` keeps working
+from .common import exec_if_cond, raise_if_cond, try_true, try_false, try_bool  # noqa: F401
 
+if TYPE_CHECKING:
+    import logging
 
-def exec_if_cond(cond: bool, func: Any, *args) -> Any:
-    """ Execute a function with any positional args if condition True.
-
-    Args:
-        cond (bool): function execution condition
-        func (Any): callable object, exec function
-    Returns:
-        Any: function execution result
-    """
-    if cond:
-        func(*args)
-
-
-def raise_if_cond(cond: bool, error_msg: str, exc_class=Exception):
-    """ Raise an exception with error message, if condition is true.
-
-    Args:
-        cond (bool): exception condition
-        error_msg (str): mesage text
-        exc_class (Exception, optional): exception class. Defaults to Exception.
-    """
-    if cond:
-        raise exc_class(error_msg)
-
-
-def try_true(value: Any) -> Any:
-    """ Trying to cast a predefined value to boolean True.
-
-    Args:
-        value (Any): value to cast
-    Returns:
-        bool, Any: casted value or started value
-    """
-    return str(value).lower() in PREDEFINED_TRUE_ARRAY or value
-
-
-def try_false(value: Any) -> Any:
-    """ Trying to cast a predefined value to boolean False.
-
-    Args:
-        value (Any): value to cast
-    Returns:
-        bool, Any: casted value or started value
-    """
-    return False if str(value).lower() in PREDEFINED_FALSE_ARRAY else value
-
-
-def try_bool(value: Any) -> Any:
-    """ Trying to cast a predefined value to boolean.
-
-    Args:
-        value (Any): value to cast
-    Returns:
-        bool, Any: casted value or started value
-    """
-    if isinstance(value, bool):
-        return value
-
-    ans = try_true(value)
-    if not isinstance(ans, bool):
-        ans = try_false(value)
-
-    return ans
+    from .ckey_index import CKeyIndex
 
 
 class Collections:
@@ -92,6 +39,93 @@ class Collections:
         """
         return next((el for el in args if el), args[-1])
 
+    @staticmethod
+    def _empty_mask(column, falsy: str):
+        """ NumPy mask of the empty elements of the column for coalesce_columns.
+
+        Args:
+            column (numpy.ndarray): column
+            falsy (str): 'none' - None, NaN and NaT are empty, 'falsy' - also elements that cast to False are empty
+        Returns:
+            numpy.ndarray: bool mask
+        """
+        import numpy as np
+
+        if column.dtype.kind in 'fcmM':
+            is_empty = np.isnan(column) if column.dtype.kind in 'fc' else np.isnat(column)
+        elif column.dtype.kind == 'O':
+            is_empty = np.equal(column, None)
+        else:
+            is_empty = np.zeros(column.shape, dtype=bool)
+        if falsy == 'falsy' and column.dtype.kind != 'M':
+            # NaN and NaT cast to True, but they stand for None; datetimes are never false, as in Python,
+            # though the epoch is zero
+            is_empty |= ~column.astype(bool)
+        return is_empty
+
+    @classmethod
+    def coalesce_columns(cls, *columns: Sequence, falsy: str = 'none') -> tuple:
+        """ Column-wise coalesce: for each row the element of the first column, that is not empty.
+            Later columns are examined only for the rows, that are still empty. If all elements of a row are empty,
+            then the element of the last column is returned with the source -1.
+            NumPy arrays are computed by array operations.
+
+        Args:
+            columns (Sequence): columns of the same length
+            falsy (str, optional): 'none' - None (NaN, NaT in NumPy arrays) is empty,
+                'falsy' - elements that cast to False (and NaN, NaT) are empty, as in coalesce. Defaults to 'none'.
+        Returns:
+            tuple: values (list or numpy.ndarray), index of the source column of each value (list or numpy.ndarray)
+        """
+        raise_if_cond(not columns, 'At least one column is required.', ValueError)
+        raise_if_cond(falsy not in COALESCE_MODES, f'Unknown falsy mode: {falsy}.', ValueError)
+        size = len(columns[0])
+        raise_if_cond(any(len(column) != size for column in columns), 'Columns have different lengths.', ValueError)
+
+        if all(getattr(column, 'dtype', None) is not None for column in columns):
+            import numpy as np
+
+            values = columns[0].astype(np.result_type(*columns))
+            is_empty = cls._empty_mask(columns[0], falsy)
+            sources = np.where(is_empty, -1, 0)
+            pending = np.flatnonzero(is_empty)
+            for column_idx, column in enumerate(columns[1:], 1):
+                if not pending.size:
+                    break
+                candidates = column[pending]
+                is_empty = cls._empty_mask(candidates, falsy)
+                filled = pending[~is_empty]
+                values[filled] = candidates[~is_empty]
+                sources[filled] = column_idx
+                pending = pending[is_empty]
+            values[pending] = columns[-1][pending]
+            return values, sources
+
+        if falsy == 'falsy':
+            values = list(columns[0])
+            sources = [0 if value else -1 for value in values]
+            pending = [idx for idx, value in enumerate(values) if not value]
+        else:
+            values = list(columns[0])
+            sources = [-1 if value is None else 0 for value in values]
+            pending = [idx for idx, value in enumerate(values) if value is None]
+        for column_idx, column in enumerate(columns[1:], 1):
+            if not pending:
+                break
+            still_empty = []
+            for idx in pending:
+                value = column[idx]
+                if value if falsy == 'falsy' else value is not None:
+                    values[idx] = value
+                    sources[idx] = column_idx
+                else:
+                    still_empty.append(idx)
+            pending = still_empty
+        last_column = columns[-1]
+        for idx in pending:
+            values[idx] = last_column[idx]
+        return values, sources
+
     @staticmethod
     def distinct(*args) -> list:
         """ Get only unique subelements that can be non-hashable types. Strongly typed matches only!
@@ -420,6 +454,44 @@ class CKey:
             [str(keys_dict.get(name)) if keys_dict.get(name) is not None else '' for name in self.NAMES]
         )
 
+    def decode(self, compk: str) -> tuple:
+        """ Unpacks one composite key into a tuple of values in the order of NAMES.
+
+        Args:
+            compk: text value of composite key.
+        Returns:
+            tuple of keys.
+        """
+        return tuple(
+            cast(value) if value else None for cast, value in zip(self.TYPES, compk.split(self.DELIMETER))
+        )
+
+    def index(self, compk_list: Sequence[str]) -> 'CKeyIndex':
+        """ Builds an index of composite keys.
+
+        Args:
+            compk_list: list of composite keys.
+        Returns:
+            CKeyIndex: index of the keys.
+        """
+        from .ckey_index import CKeyIndex
+
+        return CKeyIndex(self, compk_list)
+
+    def join(self, left_list: Sequence[str], right_list: Sequence[str], on: Optional[Sequence[str]] = None):
+        """ Hash join of two lists of composite keys.
+
+        Args:
+            left_list: left list of composite keys.
+            right_list: right list of composite keys, it is indexed.
+            on: names of the keys to join on, all NAMES by default.
+        Yields:
+            tuple: positions of the matched keys in the left and the right lists.
+        """
+        from .ckey_index import CKeyIndex
+
+        return CKeyIndex(self, right_list).join(left_list, on)
+
 
 class Text:
     """ String processing class.
@@ -615,6 +687,93 @@ class Validators:
         return result, error_msg
 
 
+def _sql_log_replacement(match: Match) -> str:
+    """ Replacement of SQL_LOG_NORMALIZE_PATTERN matches.
+
+    Args:
+        match: match of the pattern.
+    Returns:
+        str, replacement text.
+    """
+    return 'NULL' if len(match.group()) > 2 else "'"
+
+
+def _sql_log_bytes_replacement(match: Match) -> bytes:
+    """ Replacement of SQL_LOG_NORMALIZE_BYTES_PATTERN matches.
+
+    Args:
+        match: match of the pattern.
+    Returns:
+        bytes, replacement text.
+    """
+    return b'NULL' if len(match.group()) > 2 else b"'"
+
+
+def _utf8_boundary(data: Union[bytes, memoryview], idx: int) -> int:
+    """ Move the cut position back to the beginning of the UTF-8 character, that it splits.
+
+    Args:
+        data: UTF-8 encoded bytes.
+        idx: cut position, less than the length of the data.
+    Returns:
+        int, position of the cut that does not split a character (idx itself for invalid UTF-8).
+    """
+    start = idx
+    # at most 3 continuation bytes 0x80-0xBF follow the first byte of a character
+    while idx > 0 and start - idx < 3 and 0x80 <= data[idx] <= 0xBF:
+        idx -= 1
+    return start if 0x80 <= data[idx] <= 0xBF else idx
+
+
+@functools.lru_cache(maxsize=512)
+def _statement_text(template: str, rows_qty: int, width: int, paramstyle: str, offset: int) -> str:
+    """ Text of a statement with rows_qty placeholders (or VALUES rows of width placeholders, if width > 0).
+        Cached by the shape of the statement.
+
+    Args:
+        template: SQL text with one `{}` for the placeholders.
+        rows_qty: number of values (rows of VALUES).
+        width: number of values of a VALUES row, 0 for a plain list of placeholders.
+        paramstyle: 'format' (%s), 'qmark' (?) or 'numeric' ($1).
+        offset: number of the parameters before the placeholders, for the 'numeric' paramstyle.
+    Returns:
+        str, SQL statement.
+    Raises:
+        ValueError: unsupported paramstyle.
+    """
+    raise_if_cond(paramstyle not in SQL_PARAMSTYLES, f'Unsupported paramstyle: {paramstyle}', ValueError)
+    params_qty = rows_qty * max(width, 1)
+    if paramstyle == 'numeric':
+        marks = [f'${idx}' for idx in range(offset + 1, offset + params_qty + 1)]
+    else:
+        marks = ['%s' if paramstyle == 'format' else '?'] * params_qty
+
+    if width:
+        placeholders = ', '.join([f"({', '.join(marks[idx:idx + width])})" for idx in range(0, params_qty, width)])
+    else:
+        placeholders = ', '.join(marks)
+    return template.replace('{}', placeholders, 1)
+
+
+def _check_buckets(buckets: Sequence[int], min_bucket: Optional[int] = None):
+    """ Validate the sizes of the statements of build_in_queries and build_values_queries.
+
+    Args:
+        buckets: ascending sizes.
+        min_bucket: required smallest size, None for any.
+    Raises:
+        ValueError: the sizes are empty, not positive, not ascending or start with another size.
+    """
+    raise_if_cond(
+        not buckets or buckets[0] < 1 or any(left >= right for left, right in zip(buckets, buckets[1:])),
+        f'Buckets must be ascending positive sizes: {buckets!r}', ValueError
+    )
+    raise_if_cond(
+        min_bucket is not None and buckets[0] != min_bucket,
+        f'The smallest bucket must be {min_bucket}: {buckets!r}', ValueError
+    )
+
+
 class SQLHelper:
     """ SQL helper class.
     """
@@ -647,6 +806,93 @@ class SQLHelper:
         HSTORE = 'hstore'
         AUTO = ''
 
+    class LazyHstoreDict(MutableMapping):
+        """ Mapping of hstore pairs. Nested hstore values are kept raw and decoded on first access.
+            It is not a dict subclass, so dict(), {**mapping}, dict.update() and | read the values through
+            __getitem__ and get them decoded. Call resolve() to get plain dicts (for json.dumps etc.).
+        """
+        __slots__ = ('_pairs', '_pending')
+
+        def __init__(self, pairs: Union[dict, Iterable]=(), pending: Iterable=()):
+            self._pairs = dict(pairs)
+            self._pending = set(pending)
+
+        def _decode(self, key: Any):
+            """ Decode the raw nested value of the key, if it is still pending.
+
+            Args:
+                key (Any): dict key.
+            """
+            if key in self._pending:
+                self._pending.discard(key)
+                nested = SQLHelper._parse_hstore(self._pairs[key])
+                if nested is not None:
+                    self._pairs[key] = SQLHelper._decode_hstore_values(nested, lazy=True)
+
+        def __getitem__(self, key: Any) -> Any:
+            if self._pending:
+                self._decode(key)
+            return self._pairs[key]
+
+        def __setitem__(self, key: Any, value: Any):
+            self._pending.discard(key)
+            self._pairs[key] = value
+
+        def __delitem__(self, key: Any):
+            self._pending.discard(key)
+            del self._pairs[key]
+
+        def __iter__(self):
+            return iter(self._pairs)
+
+        def __len__(self) -> int:
+            return len(self._pairs)
+
+        def __contains__(self, key: Any) -> bool:
+            return key in self._pairs
+
+        def clear(self):
+            self._pending.clear()
+            self._pairs.clear()
+
+        def copy(self) -> 'SQLHelper.LazyHstoreDict':
+            return SQLHelper.LazyHstoreDict(self._pairs, self._pending)
+
+        def __or__(self, other: Any) -> dict:
+            if not isinstance(other, Mapping):
+                return NotImplemented
+            result = dict(self)
+            result.update(other)
+            return result
+
+        def __ror__(self, other: Any) -> dict:
+            if not isinstance(other, Mapping):
+                return NotImplemented
+            result = dict(other)
+            result.update(self)
+            return result
+
+        def __ior__(self, other: Any) -> 'SQLHelper.LazyHstoreDict':
+            self.update(other)
+            return self
+
+        def __reduce__(self) -> tuple:
+            return self.__class__, (self._pairs, self._pending)
+
+        def __repr__(self) -> str:
+            return repr(dict(self))
+
+        def resolve(self) -> dict:
+            """ Decode every nested level and return plain dicts.
+
+            Returns:
+                dict
+            """
+            return {
+                key: value.resolve() if isinstance(value, SQLHelper.LazyHstoreDict) else value
+                for key, value in self.items()
+            }
+
     def prepare_sql(func: Callable) -> Callable:
         """ Decorator for preparing SQL queries for logging.
 
@@ -657,7 +903,7 @@ class SQLHelper:
         """
 
         @functools.wraps(func)
-        def wrapper(sql_query: str) -> str:
+        def wrapper(sql_query: str, *args, **kwargs) -> str:
             """ Preparing an sql query. Getting rid of '', "' and 'None'.
 
             Args:
@@ -669,7 +915,7 @@ class SQLHelper:
             sql_query = sql_query.replace('\"\'', '\'')
             sql_query = sql_query.replace('\'NULL\'', 'NULL')
 
-            return func(sql_query)
+            return func(sql_query, *args, **kwargs)
 
         return wrapper
 
@@ -694,7 +940,222 @@ class SQLHelper:
 
         return log_list
 
-    def hstore_to_dict(hstore: str) -> dict:
+    def normalize_sql(sql_query: Union[str, bytes]) -> Union[str, bytes]:
+        """ Single-pass version of prepare_sql: '" and "' become ', 'NULL' becomes NULL.
+            Replacements are not rescanned, and a query without matches is returned as is, without a copy.
+
+        Args:
+            sql_query (Union[str, bytes]): SQL template, bytes as returned by cursor.mogrify are supported.
+        Returns:
+            Union[str, bytes], normalized query.
+        """
+        if isinstance(sql_query, str):
+            return SQL_LOG_NORMALIZE_PATTERN.sub(_sql_log_replacement, sql_query)
+        return SQL_LOG_NORMALIZE_BYTES_PATTERN.sub(_sql_log_bytes_replacement, sql_query)
+
+    def iter_sql_pages(query: Union[str, bytes, bytearray, memoryview], qty_lines: int=20000):
+        """ Lazy version of logging_sql pages. Bytes-like queries are paged by memoryview, without copies.
+
+            UTF-8 pages are cut at character boundaries, so a page holds at most qty_lines bytes.
+
+        Args:
+            query (Union[str, bytes, bytearray, memoryview]): SQL template.
+            qty_lines (int, optional): Number of characters (bytes) logged on one page.
+        Yields:
+            Iterator[Union[str, memoryview]]: page of the query.
+        """
+        if isinstance(query, str):
+            for idx in range(0, len(query), qty_lines):
+                yield query[idx:idx + qty_lines]
+            return
+
+        query = memoryview(query)
+        idx = 0
+        while idx < len(query):
+            end = idx + qty_lines
+            if end < len(query):
+                # a page shorter than a character keeps the split
+                end = max(_utf8_boundary(query, end), idx + 1)
+            yield query[idx:end]
+            idx = end
+
+    @classmethod
+    def log_sql(
+        cls,
+        query: Union[str, bytes],
+        logger: 'logging.Logger',
+        level: int=SQL_LOG_LEVEL,
+        qty_lines: int=20000,
+        max_len: Optional[int]=None,
+        sample_rate: float=1.0
+    ) -> int:
+        """ Method for logging full sql query by pages. Does nothing until the level is enabled for the logger.
+            The query is capped by max_len before normalization, so long statements cost a slice at most.
+
+        Args:
+            query (Union[str, bytes]): SQL template.
+            logger (logging.Logger): logger to write into.
+            level (int, optional): logging level. Defaults to SQL_LOG_LEVEL (logging.DEBUG).
+            qty_lines (int, optional): Number of characters (bytes for bytes queries) logged on one page.
+            max_len (Optional[int], optional): maximum number of logged characters (bytes for bytes queries).
+                Defaults to None (no limit).
+            sample_rate (float, optional): share of the queries to log. Defaults to 1.0.
+        Returns:
+            int, number of logged pages.
+        """
+        if not query or not logger.isEnabledFor(level) or sample_rate < 1.0 and random() >= sample_rate:
+            return 0
+
+        query_len = len(query)
+        is_truncated = max_len is not None and query_len > max_len
+        if is_truncated:
+            max_len = max_len if isinstance(query, str) else _utf8_boundary(query, max_len)
+            query = query[:max_len]
+
+        query = cls.normalize_sql(query)
+        if isinstance(query, str):
+            pages_qty = -(-len(query) // qty_lines)
+        else:
+            # bytes pages are cut at character boundaries, the count pass slices memoryviews only
+            pages_qty = sum(1 for _ in cls.iter_sql_pages(query, qty_lines))
+        for idx, page in enumerate(cls.iter_sql_pages(query, qty_lines), 1):
+            if isinstance(page, memoryview):
+                page = str(page, 'utf-8', 'replace')
+            logger.log(level, 'SQL [%d/%d]: %s', idx, pages_qty, page)
+
+        if is_truncated:
+            unit = 'characters' if isinstance(query, str) else 'bytes'
+            logger.log(level, 'SQL truncated: %d of %d %s are logged', max_len, query_len, unit)
+
+        return pages_qty
+
+    def build_in_queries(
+        template: str,
+        params: Sequence,
+        buckets: Sequence[int]=SQL_PARAMS_BUCKETS,
+        paramstyle: str='format',
+        offset: int=0
+    ):
+        """ Split a long IN list into statements of bounded size. Every chunk is padded by its last value
+            to the nearest bucket size, so the server prepares a few statement shapes only.
+
+        Args:
+            template (str): SQL template, `{}` marks the place of the IN list: "... WHERE id IN ({})".
+            params (Sequence): values of the IN list, they are passed as parameters, not formatted into SQL.
+            buckets (Sequence[int], optional): ascending sizes of IN lists, the last one is the chunk size.
+            paramstyle (str, optional): 'format' (%s), 'qmark' (?) or 'numeric' ($1). Defaults to 'format'.
+            offset (int, optional): number of numeric parameters before the IN list. Defaults to 0.
+        Yields:
+            Iterator[tuple]: (statement text, list of parameters).
+        Raises:
+            ValueError: the buckets are not ascending positive sizes.
+        """
+        _check_buckets(buckets)
+        chunk_size = buckets[-1]
+        for idx in range(0, len(params), chunk_size):
+            chunk = list(params[idx:idx + chunk_size])
+            size = buckets[bisect_left(buckets, len(chunk))]
+            chunk += [chunk[-1]] * (size - len(chunk))
+            yield _statement_text(template, size, 0, paramstyle, offset), chunk
+
+    def build_values_queries(
+        template: str,
+        rows: Sequence[Sequence],
+        buckets: Sequence[int]=SQL_PARAMS_BUCKETS,
+        paramstyle: str='format',
+        offset: int=0
+    ):
+        """ Split a multi-row VALUES list into statements of bucket sizes. Rows cannot be padded,
+            so a chunk is decomposed into the largest fitting buckets: 37 rows are sent as 32 + 4 + 1.
+
+        Args:
+            template (str): SQL template, `{}` marks the place of VALUES rows: "INSERT INTO t (a, b) VALUES {}".
+            rows (Sequence[Sequence]): rows of equal length, they are passed as parameters, not formatted into SQL.
+            buckets (Sequence[int], optional): ascending numbers of rows per statement, the first one is 1,
+                so that any remainder can be sent.
+            paramstyle (str, optional): 'format' (%s), 'qmark' (?) or 'numeric' ($1). Defaults to 'format'.
+            offset (int, optional): number of numeric parameters before the VALUES list. Defaults to 0.
+        Yields:
+            Iterator[tuple]: (statement text, flat list of parameters).
+        Raises:
+            ValueError: the buckets do not start with 1 or rows have different lengths.
+        """
+        _check_buckets(buckets, 1)
+        if not rows:
+            return
+
+        width = len(rows[0])
+        idx = 0
+        while idx < len(rows):
+            size = buckets[bisect_right(buckets, len(rows) - idx) - 1]
+            chunk = rows[idx:idx + size]
+            raise_if_cond(
+                any(len(row) != width for row in chunk), f'All VALUES rows must have {width} values.', ValueError
+            )
+            yield _statement_text(template, size, width, paramstyle, offset), list(chain.from_iterable(chunk))
+            idx += size
+
+    def statement_cache_info():
+        """ Hits, misses and size of the cache of statement texts by their shapes.
+
+        Returns:
+            CacheInfo
+        """
+        return _statement_text.cache_info()
+
+    def _parse_hstore(hstore: str) -> Optional[dict]:
+        """ Single-pass scan of a hstore format string.
+            Quoted and bare tokens, backslash escapes and NULL are supported.
+
+        Args:
+            hstore (str): hstore format string.
+        Returns:
+            Optional[dict]: parsed pairs or None if the string is not a valid hstore.
+        """
+        if '\\' not in hstore:
+            # fast path: without escapes every `"` is a token boundary, so the canonical output splits into
+            # [lead, key, arrow, value, delimiter, key, ..., value, tail].
+            parts = hstore.split('"')
+            last = len(parts) - 1
+            if (
+                last % 4 == 0 and
+                HSTORE_ARROWS.issuperset(parts[2::4]) and
+                HSTORE_DELIMITERS.issuperset(parts[4:last:4]) and
+                (not parts[0] or parts[0].isspace()) and
+                (not parts[last] or parts[last].isspace())
+            ):
+                return dict(zip(parts[1::4], parts[3::4]))
+
+        result_dict = {}
+        if hstore.isspace():
+            return result_dict
+
+        match_pair = HSTORE_PAIR_PATTERN.match
+        unescape = HSTORE_ESCAPED_CHAR.sub
+        pos, end = 0, len(hstore)
+        while pos < end:
+            pair = match_pair(hstore, pos)
+            if pair is None:
+                return None
+
+            key, bare_key, value, bare_value, _ = pair.groups()
+            if key is None:
+                key = bare_key
+            if '\\' in key:
+                key = unescape(r'\1', key)
+
+            if value is None:
+                value = None if bare_value.upper() == 'NULL' else bare_value
+            if value and '\\' in value:
+                value = unescape(r'\1', value)
+
+            result_dict[key] = value
+            pos = pair.end()
+
+        return result_dict
+
+    @classmethod
+    def hstore_to_dict(cls, hstore: str) -> dict:
         """ The method converts a hstore format string to a dict.
 
         Args:
@@ -702,32 +1163,211 @@ class SQLHelper:
         Returns:
             dict
         """
-        result_dict = {}
-        if hstore:
-            result_dict = json.loads('{' + hstore.replace('=>', ':').replace(':NULL', ':null') + '}')  # noqa: WPS336
+        if not hstore:
+            return {}
+
+        result_dict = cls._parse_hstore(hstore)
+        if result_dict is None:
+            raise ValueError(f'Invalid hstore format: {hstore[:64]!r}')
+
         return result_dict
 
     @classmethod
-    def hstore_to_dict_recursive(cls, hstore: str) -> dict:
+    def hstore_to_dict_many(cls, hstore_list: Iterable[Optional[str]]) -> list:
+        """ The method converts a column of hstore format strings (e.g. a whole result set) to a list of dicts.
+
+        Args:
+            hstore_list (Iterable[Optional[str]]): hstore format strings, NULL values are allowed.
+        Returns:
+            list of dicts.
+        """
+        to_dict = cls.hstore_to_dict
+        return [to_dict(hstore) for hstore in hstore_list]
+
+    @classmethod
+    def _decode_hstore_values(cls, pairs: dict, lazy: bool=False) -> dict:
+        """ Decode nested hstore values and digit strings of parsed pairs in place.
+            Nesting is detected by the shape of the value, so plain values cost a substring check only.
+
+        Args:
+            pairs (dict): parsed hstore pairs.
+            lazy (bool, optional): keep nested values raw until first access. Defaults to False.
+        Returns:
+            dict or LazyHstoreDict
+        """
+        pending = []
+        for key, value in pairs.items():
+            if value is None:
+                continue
+
+            if '=>' in value and HSTORE_NESTED_PREFIX.match(value):
+                if lazy:
+                    pending.append(key)
+                    continue
+
+                nested = cls._parse_hstore(value)
+                if nested is not None:
+                    pairs[key] = cls._decode_hstore_values(nested)
+                    continue
+
+            if value.isdecimal():
+                pairs[key] = int(value)
+
+        return cls.LazyHstoreDict(pairs, pending) if lazy else pairs
+
+    @classmethod
+    def hstore_to_dict_recursive(cls, hstore: str, lazy: bool=False) -> dict:
         """ The method converts the hstore format string into a dict and nested entries.
 
         Args:
             hstore (str): hstore format string in dict.
+            lazy (bool, optional): decode nested entries on first access only. Defaults to False.
         Returns:
-            dict
+            dict or LazyHstoreDict
         """
-        result_dict = {}
-        if hstore:
-            result_dict = json.loads('{' + hstore.replace('=>', ':') + '}')  # noqa: WPS336
-            for k, v in result_dict.items():
-                try:
-                    new_value = cls.hstore_to_dict_recursive(v)
-                except json.decoder.JSONDecodeError:
-                    new_value = v
+        return cls._decode_hstore_values(cls.hstore_to_dict(hstore), lazy)
 
-                if isinstance(new_value, str) and new_value.isdigit():
-                    new_value = int(new_value)
+    @classmethod
+    def _hstore_parts(cls, data: dict, parts: list, copy_escape: bool=False):
+        """ Append the tokens of one hstore literal to a shared parts buffer.
+            Tokens are translated only if they contain chars to escape.
+
+        Args:
+            data (dict): pairs to serialize. None values are NULLs, dict values are nested hstores.
+            parts (list): buffer of tokens to extend.
+            copy_escape (bool, optional): additionally escape for the COPY text format. Defaults to False.
+        """
+        table = HSTORE_COPY_ESCAPE_TABLE if copy_escape else HSTORE_ESCAPE_TABLE
+        extend = parts.extend
+        delimiter = ''
+        for key, value in data.items():
+            if not isinstance(key, str):
+                raise_if_cond(key is None, 'The hstore key cannot be NULL.', ValueError)
+                key = str(key)
+            if '\\' in key or '"' in key or copy_escape and ('\n' in key or '\r' in key or '\t' in key):
+                key = key.translate(table)
+
+            if value is None:
+                extend((delimiter, '"', key, '"=>NULL'))
+            else:
+                if not isinstance(value, str):
+                    value = cls.dict_to_hstore(value) if isinstance(value, Mapping) else str(value)
+                if '\\' in value or '"' in value or copy_escape and ('\n' in value or '\r' in value or '\t' in value):
+                    value = value.translate(table)
+                extend((delimiter, '"', key, '"=>"', value, '"'))
+            delimiter = ', '
 
-                result_dict[k] = new_value
+    @classmethod
+    def dict_to_hstore(cls, data: Optional[dict], file_obj: Any=None) -> Optional[str]:
+        """ The method converts a dict to a hstore format string. Nested dicts are written as nested hstores.
 
-        return result_dict
+        Args:
+            data (Optional[dict]): pairs to serialize.
+            file_obj (Any, optional): file-like object to write the literal into instead of returning it.
+        Returns:
+            Optional[str], hstore format string (None if file_obj is passed or data is None).
+        """
+        if data is None:
+            return None
+
+        parts = []
+        cls._hstore_parts(data, parts)
+        if file_obj is None:
+            return ''.join(parts)
+
+        file_obj.write(''.join(parts))
+
+    @classmethod
+    def dicts_to_hstore_many(
+        cls,
+        data_list: Iterable[Optional[dict]],
+        file_obj: Any=None,
+        chunk_size: int=1000
+    ) -> Union[list, int]:
+        """ The method converts a column of dicts to hstore format strings.
+            If file_obj is passed, the column is streamed into it as a single-column COPY text format:
+            one escaped literal per line, \\N for NULL rows. Tokens of chunk_size rows share one buffer,
+            so there is a single join and write per chunk.
+
+        Args:
+            data_list (Iterable[Optional[dict]]): dicts to serialize, None rows are NULLs.
+            file_obj (Any, optional): file-like object to write the COPY data into.
+            chunk_size (int, optional): number of rows per write. Defaults to 1000.
+        Returns:
+            list of hstore format strings, or the number of written rows if file_obj is passed.
+        """
+        if file_obj is None:
+            to_hstore = cls.dict_to_hstore
+            return [to_hstore(data) for data in data_list]
+
+        write_parts = cls._hstore_parts
+        parts = []
+        rows_qty = 0
+        for data in data_list:
+            if data is None:
+                parts.append('\\N')
+            else:
+                write_parts(data, parts, copy_escape=True)
+            parts.append('\n')
+            rows_qty += 1
+            if not rows_qty % chunk_size:
+                file_obj.write(''.join(parts))
+                parts.clear()
+
+        if parts:
+            file_obj.write(''.join(parts))
+
+        return rows_qty
+
+    @classmethod
+    def infer_pg_type(
+        cls,
+        values: Union[Sequence, Iterable],
+        sample_fraction: Optional[float]=None,
+        chunk_size: int=65536
+    ) -> 'SQLHelper.PgSqlType':
+        """ The method infers the narrowest safe PgSqlType of a column instead of PgSqlType.AUTO.
+
+        Args:
+            values (Union[Sequence, Iterable]): column values, sequence, iterator, array.array or NumPy array.
+            sample_fraction (Optional[float], optional): scan every 1/sample_fraction-th value only.
+            chunk_size (int, optional): number of values checked at once. Defaults to 65536.
+        Returns:
+            PgSqlType
+        """
+        from .sql_copy import TypeInferrer
+
+        step = max(1, round(1 / sample_fraction)) if sample_fraction else 1
+        inferrer = TypeInferrer()
+        if hasattr(values, '__getitem__') and hasattr(values, '__len__') and not isinstance(values, dict):
+            if step > 1:
+                values = values[::step]
+            for idx in range(0, len(values), chunk_size):
+                inferrer.update(values[idx:idx + chunk_size])
+        else:
+            values = iter(values) if step == 1 else islice(values, 0, None, step)
+            for chunk in iter(lambda: list(islice(values, chunk_size)), []):
+                inferrer.update(chunk)
+
+        return inferrer.pg_type
+
+    @classmethod
+    def infer_pg_types(
+        cls,
+        columns: dict,
+        sample_fraction: Optional[float]=None,
+        chunk_size: int=65536
+    ) -> dict:
+        """ The method infers PgSqlType of every column of a table.
+
+        Args:
+            columns (dict): column values by names.
+            sample_fraction (Optional[float], optional): scan every 1/sample_fraction-th value only.
+            chunk_size (int, optional): number of values checked at once. Defaults to 65536.
+        Returns:
+            dict, PgSqlType by column names.
+        """
+        return {
+            name: cls.infer_pg_type(values, sample_fraction, chunk_size)
+            for name, values in columns.items()
+        }
@@ -0,0 +1,839 @@
+# -*- coding: utf-8 -*-
+""" POSTGRESQL COPY FORMAT: FIELD ENCODERS, CopyWriter AND TypeInferrer.
+"""
+__author__ = 'kokarev.nv'
+
+import json
+import math
+
+from collections.abc import Mapping
+from uuid import UUID
+from struct import Struct, pack
+from decimal import Decimal
+from datetime import date, datetime, time, timedelta, timezone
+
+from typing import Any, Optional, Union, Sequence, Iterable
+from .constants import (
+    PREDEFINED_TRUE_ARRAY, PREDEFINED_FALSE_ARRAY,
+    COPY_TEXT_ESCAPE_TABLE, COPY_BINARY_HEADER, COPY_BINARY_TRAILER, COPY_BINARY_NULL, PG_EPOCH_ORDINAL,
+    FLOAT_TEXT_SPECIALS, PG_INT_STRING, PG_NUMERIC_STRING, PG_DATE_STRING, PG_TIMESTAMP_STRING, PG_SMALLINT_RANGE,
+    PG_INT_RANGE, PG_BIGINT_RANGE
+)
+from .py_datatools import SQLHelper, raise_if_cond, try_bool
+
+
+def _copy_text_escape(value: str) -> str:
+    """ Escape a field of the COPY text format. The translate pass runs only if the value contains special chars.
+
+    Args:
+        value: text of the field.
+    Returns:
+        str, escaped text.
+    """
+    if '\\' in value or '\n' in value or '\r' in value or '\t' in value:
+        return value.translate(COPY_TEXT_ESCAPE_TABLE)
+    return value
+
+
+def _copy_int(value: Any) -> int:
+    """ Integer value of an integer field. Floats and Decimals with a fractional part are not truncated, strings
+        must be decimal digits with an optional sign (int() also accepts whitespace and underscores).
+
+    Args:
+        value: python value of the field.
+    Returns:
+        int
+    """
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        raise_if_cond(not PG_INT_STRING.fullmatch(value), f'Incorrect integer value: {value!r}', ValueError)
+    elif isinstance(value, float):
+        raise_if_cond(not value.is_integer(), f'Incorrect integer value: {value!r}', ValueError)
+    elif isinstance(value, Decimal):
+        raise_if_cond(
+            not value.is_finite() or value != value.to_integral_value(),
+            f'Incorrect integer value: {value!r}', ValueError
+        )
+    return int(value)
+
+
+def _copy_text_int(value: Any) -> str:
+    """ COPY text field of smallint, int and bigint.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        str, text of the field.
+    """
+    return '%d' % _copy_int(value)
+
+
+def _copy_text_float(value: Any) -> str:
+    """ COPY text field of numeric, real and double precision.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        str, text of the field.
+    """
+    if isinstance(value, str):
+        # the text is written as is, so it must not need the COPY escaping
+        text = FLOAT_TEXT_SPECIALS.get(value, value)
+        raise_if_cond(
+            text not in FLOAT_TEXT_SPECIALS.values() and not PG_NUMERIC_STRING.fullmatch(text),
+            f'Incorrect numeric value: {value!r}', ValueError
+        )
+        return text
+    text = repr(value) if isinstance(value, float) else str(value)
+    return FLOAT_TEXT_SPECIALS.get(text, text)
+
+
+def _copy_text_str(value: Any) -> str:
+    """ COPY text field of text, uuid and other types with a valid str() form.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        str, text of the field.
+    """
+    return _copy_text_escape(value if isinstance(value, str) else str(value))
+
+
+def _copy_text_datetime(value: Any) -> str:
+    """ COPY text field of timestamp, timestamptz, date, time and timetz.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        str, text of the field.
+    """
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return _copy_text_str(value)
+
+
+def _copy_text_interval(value: Any) -> str:
+    """ COPY text field of interval.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        str, text of the field.
+    """
+    if isinstance(value, timedelta):
+        return '%d days %d.%06d seconds' % (value.days, value.seconds, value.microseconds)
+    return _copy_text_str(value)
+
+
+def _copy_text_bool(value: Any) -> str:
+    """ COPY text field of boolean, strings are casted by the try_bool vocabulary.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        str, text of the field.
+    """
+    value = try_bool(value)
+    raise_if_cond(not isinstance(value, bool), f'Incorrect boolean value: {value!r}', ValueError)
+    return 't' if value else 'f'
+
+
+def _copy_text_json(value: Any) -> str:
+    """ COPY text field of json and jsonb.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        str, text of the field.
+    """
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
+    return _copy_text_escape(value)
+
+
+def _copy_text_hstore(value: Any) -> str:
+    """ COPY text field of hstore.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        str, text of the field.
+    """
+    if not isinstance(value, Mapping):
+        return _copy_text_str(value)
+    parts = []
+    SQLHelper._hstore_parts(value, parts, copy_escape=True)
+    return ''.join(parts)
+
+
+def _copy_text_auto(value: Any) -> str:
+    """ COPY text field of a column without a concrete type, the encoder is chosen by the type of value.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        str, text of the field.
+    """
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, int):
+        return '%d' % value
+    if isinstance(value, (float, Decimal)):
+        return _copy_text_float(value)
+    if isinstance(value, (date, time)):
+        return _copy_text_datetime(value)
+    if isinstance(value, timedelta):
+        return _copy_text_interval(value)
+    if isinstance(value, (dict, list)):
+        return _copy_text_json(value)
+    return _copy_text_str(value)
+
+
+_INT16_FIELD = Struct('!ih').pack
+_INT32_FIELD = Struct('!ii').pack
+_INT64_FIELD = Struct('!iq').pack
+_FLOAT32_FIELD = Struct('!if').pack
+_FLOAT64_FIELD = Struct('!id').pack
+_TIMETZ_FIELD = Struct('!iqi').pack
+_INTERVAL_FIELD = Struct('!iqii').pack
+_INT32 = Struct('!i').pack
+
+
+def _copy_binary_int16(value: Any) -> bytes:
+    """ COPY binary field of smallint.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    return _INT16_FIELD(2, _copy_int(value))
+
+
+def _copy_binary_int32(value: Any) -> bytes:
+    """ COPY binary field of int.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    return _INT32_FIELD(4, _copy_int(value))
+
+
+def _copy_binary_int64(value: Any) -> bytes:
+    """ COPY binary field of bigint.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    return _INT64_FIELD(8, _copy_int(value))
+
+
+def _copy_binary_float32(value: Any) -> bytes:
+    """ COPY binary field of real.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    return _FLOAT32_FIELD(4, float(value))
+
+
+def _copy_binary_float64(value: Any) -> bytes:
+    """ COPY binary field of double precision.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    return _FLOAT64_FIELD(8, float(value))
+
+
+def _copy_binary_numeric(value: Any) -> bytes:
+    """ COPY binary field of numeric: base 10000 digits with weight, sign and display scale.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    if not isinstance(value, Decimal):
+        value = Decimal(repr(value) if isinstance(value, float) else value)
+
+    if value.is_nan():
+        return pack('!ihhHh', 8, 0, 0, 0xC000, 0)
+    if value.is_infinite():
+        return pack('!ihhHh', 8, 0, 0, 0xF000 if value.is_signed() else 0xD000, 0)
+
+    sign, digits, exponent = value.as_tuple()
+    dscale = max(0, -exponent)
+    # align the exponent and the length of digits to the groups of 4 decimal digits.
+    tail = exponent % 4
+    exponent -= tail
+    digits = ''.join(map(str, digits)) + '0' * tail
+    digits = '0' * (-len(digits) % 4) + digits
+    groups = [int(digits[idx:idx + 4]) for idx in range(0, len(digits), 4)]
+    weight = len(groups) - 1 + exponent // 4
+
+    lead = 0
+    while lead < len(groups) and not groups[lead]:
+        lead += 1
+    weight -= lead
+    groups = groups[lead:]
+    while groups and not groups[-1]:
+        groups.pop()
+    if not groups:
+        weight = 0
+
+    return pack(
+        f'!ihhHh{len(groups)}h', 8 + 2 * len(groups), len(groups), weight, 0x4000 if sign else 0, dscale, *groups
+    )
+
+
+def _copy_binary_text(value: Any) -> bytes:
+    """ COPY binary field of text, json and other types with a valid str() form.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    data = (value if isinstance(value, str) else str(value)).encode()
+    return _INT32(len(data)) + data
+
+
+def _copy_binary_jsonb(value: Any) -> bytes:
+    """ COPY binary field of jsonb: version 1 and json text.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
+    data = value.encode()
+    return _INT32(len(data) + 1) + b'\x01' + data
+
+
+def _copy_binary_json(value: Any) -> bytes:
+    """ COPY binary field of json.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
+    return _copy_binary_text(value)
+
+
+def _copy_binary_bool(value: Any) -> bytes:
+    """ COPY binary field of boolean, strings are casted by the try_bool vocabulary.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    value = try_bool(value)
+    raise_if_cond(not isinstance(value, bool), f'Incorrect boolean value: {value!r}', ValueError)
+    return b'\x00\x00\x00\x01\x01' if value else b'\x00\x00\x00\x01\x00'
+
+
+def _copy_binary_date(value: date) -> bytes:
+    """ COPY binary field of date: days since 2000-01-01.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    return _INT32_FIELD(4, value.toordinal() - PG_EPOCH_ORDINAL)
+
+
+def _copy_binary_timestamp(value: Union[datetime, date]) -> bytes:
+    """ COPY binary field of timestamp: microseconds since 2000-01-01 by the wall clock.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    days = value.toordinal() - PG_EPOCH_ORDINAL
+    if not isinstance(value, datetime):
+        return _INT64_FIELD(8, days * 86400000000)
+    seconds = days * 86400 + value.hour * 3600 + value.minute * 60 + value.second
+    return _INT64_FIELD(8, seconds * 1000000 + value.microsecond)
+
+
+def _copy_binary_timestamptz(value: Union[datetime, date]) -> bytes:
+    """ COPY binary field of timestamptz: microseconds since 2000-01-01 UTC. Naive values are taken as UTC.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return _copy_binary_timestamp(value)
+
+
+def _copy_binary_time(value: time) -> bytes:
+    """ COPY binary field of time: microseconds since midnight.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    seconds = value.hour * 3600 + value.minute * 60 + value.second
+    return _INT64_FIELD(8, seconds * 1000000 + value.microsecond)
+
+
+def _copy_binary_timetz(value: time) -> bytes:
+    """ COPY binary field of timetz: microseconds since midnight and the zone offset west of UTC in seconds.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    offset = value.utcoffset()
+    seconds = value.hour * 3600 + value.minute * 60 + value.second
+    return _TIMETZ_FIELD(
+        12, seconds * 1000000 + value.microsecond, -int(offset.total_seconds()) if offset is not None else 0
+    )
+
+
+def _copy_binary_interval(value: timedelta) -> bytes:
+    """ COPY binary field of interval: microseconds, days and months.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    return _INTERVAL_FIELD(16, value.seconds * 1000000 + value.microseconds, value.days, 0)
+
+
+def _copy_binary_uuid(value: Any) -> bytes:
+    """ COPY binary field of uuid.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    return _INT32(16) + (value if isinstance(value, UUID) else UUID(str(value))).bytes
+
+
+def _copy_binary_hstore(value: dict) -> bytes:
+    """ COPY binary field of hstore: number of pairs, then the length-prefixed key and value of each pair.
+
+    Args:
+        value: python value of the field.
+    Returns:
+        bytes, length-prefixed field.
+    """
+    data = bytearray(_INT32(len(value)))
+    for key, item in value.items():
+        raise_if_cond(key is None, 'The hstore key cannot be NULL.', ValueError)
+        key = (key if isinstance(key, str) else str(key)).encode()
+        data += _INT32(len(key))
+        data += key
+        if item is None:
+            data += COPY_BINARY_NULL
+        else:
+            if isinstance(item, Mapping):
+                item = SQLHelper.dict_to_hstore(item)
+            item = (item if isinstance(item, str) else str(item)).encode()
+            data += _INT32(len(item))
+            data += item
+    return _INT32(len(data)) + data
+
+
+def _copy_binary_auto(value: Any) -> bytes:
+    """ Binary COPY needs a concrete type of every column.
+
+    Args:
+        value: python value of the field.
+    Raises:
+        ValueError: always.
+    """
+    raise ValueError('The binary COPY format requires a concrete PgSqlType for every column.')
+
+
+_COPY_TEXT_ENCODERS = {
+    'smallint': _copy_text_int,
+    'int': _copy_text_int,
+    'bigint': _copy_text_int,
+    'numeric': _copy_text_float,
+    'real': _copy_text_float,
+    'double precision': _copy_text_float,
+    'text': _copy_text_str,
+    'timestamp': _copy_text_datetime,
+    'timestamptz': _copy_text_datetime,
+    'date': _copy_text_datetime,
+    'time': _copy_text_datetime,
+    'timetz': _copy_text_datetime,
+    'interval': _copy_text_interval,
+    'boolean': _copy_text_bool,
+    'uuid': _copy_text_str,
+    'json': _copy_text_json,
+    'jsonb': _copy_text_json,
+    'hstore': _copy_text_hstore,
+    '': _copy_text_auto,
+}
+
+_COPY_BINARY_ENCODERS = {
+    'smallint': _copy_binary_int16,
+    'int': _copy_binary_int32,
+    'bigint': _copy_binary_int64,
+    'numeric': _copy_binary_numeric,
+    'real': _copy_binary_float32,
+    'double precision': _copy_binary_float64,
+    'text': _copy_binary_text,
+    'timestamp': _copy_binary_timestamp,
+    'timestamptz': _copy_binary_timestamptz,
+    'date': _copy_binary_date,
+    'time': _copy_binary_time,
+    'timetz': _copy_binary_timetz,
+    'interval': _copy_binary_interval,
+    'boolean': _copy_binary_bool,
+    'uuid': _copy_binary_uuid,
+    'json': _copy_binary_json,
+    'jsonb': _copy_binary_jsonb,
+    'hstore': _copy_binary_hstore,
+    '': _copy_binary_auto,
+}
+
+
+def _quote_identifier(name: str) -> str:
+    """ Quoted SQL identifier, the name is kept as is (case, spaces, quotes).
+
+    Args:
+        name: name of a table or a column.
+    Returns:
+        str, e.g. "a""b" of a"b.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+class CopyWriter:
+    """ Writer of rows in the PostgreSQL COPY text or binary format into a file-like object.
+        Columns are described by (name, PgSqlType) pairs, every type has its own encoder.
+        Rows are buffered and written by chunks of chunk_size rows.
+    """
+    def __init__(
+        self,
+        columns: Sequence[tuple],
+        file_obj: Any,
+        binary: bool=False,
+        chunk_size: int=1000,
+        encoding: Optional[str]=None
+    ):
+        """ Init the writer.
+
+        Args:
+            columns (Sequence[tuple]): (name, PgSqlType or its value) pairs.
+            file_obj (Any): file-like object with the write method.
+            binary (bool, optional): write the binary format instead of the text one. Defaults to False.
+            chunk_size (int, optional): number of rows per write. Defaults to 1000.
+            encoding (Optional[str], optional): encode text chunks, if file_obj accepts bytes only.
+        """
+        self.names = [name for name, _ in columns]
+        self.types = [SQLHelper.PgSqlType(pg_type) for _, pg_type in columns]
+        encoders = _COPY_BINARY_ENCODERS if binary else _COPY_TEXT_ENCODERS
+        self._encoders = [encoders[pg_type.value] for pg_type in self.types]
+        self._tuple_header = pack('!h', len(self.names))
+        self.file_obj = file_obj
+        self.binary = binary
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+        self.rows_qty = 0
+        self._buffer = []
+        self._is_started = False
+
+    def copy_statement(self, table: str) -> str:
+        """ COPY ... FROM STDIN statement for the data of the writer.
+
+        Args:
+            table (str): name of the table, `schema.table` is quoted by parts. The names are quoted, so they are
+                case-sensitive.
+        Returns:
+            str, SQL statement.
+        """
+        table = '.'.join(map(_quote_identifier, table.split('.')))
+        columns = ', '.join(map(_quote_identifier, self.names))
+        return f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT {'binary' if self.binary else 'text'})"
+
+    def _encode_row(self, row: Union[Sequence, dict]) -> Union[str, bytes]:
+        """ Encode one row.
+
+        Args:
+            row (Union[Sequence, dict]): values in the order of columns or a dict by column names.
+        Returns:
+            Union[str, bytes], row of the COPY format.
+        """
+        if isinstance(row, dict):
+            row = [row.get(name) for name in self.names]
+        raise_if_cond(
+            len(row) != len(self._encoders),
+            f'Row length {len(row)} does not match the {len(self._encoders)} columns.',
+            ValueError
+        )
+        if self.binary:
+            return self._tuple_header + b''.join([
+                COPY_BINARY_NULL if value is None else encode(value)
+                for encode, value in zip(self._encoders, row)
+            ])
+        return '\t'.join([
+            '\\N' if value is None else encode(value) for encode, value in zip(self._encoders, row)
+        ]) + '\n'
+
+    def write_row(self, row: Union[Sequence, dict]):
+        """ Buffer one row, the buffer is written into file_obj by chunks.
+
+        Args:
+            row (Union[Sequence, dict]): values in the order of columns or a dict by column names.
+        """
+        self._buffer.append(self._encode_row(row))
+        self.rows_qty += 1
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def write_rows(self, rows: Iterable[Union[Sequence, dict]]) -> int:
+        """ Buffer rows, the buffer is written into file_obj by chunks.
+
+        Args:
+            rows (Iterable[Union[Sequence, dict]]): rows to write.
+        Returns:
+            int, number of written rows.
+        """
+        encode_row = self._encode_row
+        buffer = self._buffer
+        rows_qty = 0
+        for row in rows:
+            buffer.append(encode_row(row))
+            rows_qty += 1
+            if len(buffer) >= self.chunk_size:
+                self.flush()
+
+        self.rows_qty += rows_qty
+        return rows_qty
+
+    def flush(self):
+        """ Write the buffered rows into file_obj.
+        """
+        if not self._is_started:
+            self._is_started = True
+            if self.binary:
+                self._buffer.insert(0, COPY_BINARY_HEADER)
+
+        if self._buffer:
+            chunk = (b'' if self.binary else '').join(self._buffer)
+            self._buffer.clear()
+            self.file_obj.write(chunk.encode(self.encoding) if self.encoding and not self.binary else chunk)
+
+    def close(self):
+        """ Write the rest of the buffer and the trailer of the binary format.
+        """
+        self.flush()
+        if self.binary:
+            self.file_obj.write(COPY_BINARY_TRAILER)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+
+class TypeInferrer:
+    """ Incremental inference of the narrowest safe PgSqlType of a column, fed by chunks of values.
+        None, '' and NaN are nulls. Integer types win over boolean, so 0/1 columns stay numbers.
+        NumPy arrays are checked by array operations, without converting values to python objects.
+    """
+    BOOL_VOCABULARY = frozenset(PREDEFINED_TRUE_ARRAY + PREDEFINED_FALSE_ARRAY)
+    # types, that are checked together. Other types are checked by their str() form.
+    _TYPE_GROUPS = {
+        bool: bool, int: float, float: float, Decimal: float, date: date, datetime: date, timedelta: timedelta
+    }
+
+    def __init__(self):
+        self.int_range = None
+        self.is_int = self.is_float = self.is_numeric = self.is_bool = True
+        self.is_date = self.is_timestamp = self.is_interval = True
+        self.has_float = self.has_tz = False
+        self.values_qty = 0
+
+    def _merge_int_range(self, low: int, high: int):
+        """ Extend the range of integer values.
+        """
+        if self.int_range is not None:
+            low, high = min(low, self.int_range[0]), max(high, self.int_range[1])
+        self.int_range = (low, high)
+
+    def _kill(self, *alive: str):
+        """ Mark all candidates except the alive ones as impossible.
+        """
+        for name in ('is_int', 'is_float', 'is_numeric', 'is_bool', 'is_date', 'is_timestamp', 'is_interval'):
+            if name not in alive:
+                setattr(self, name, False)
+
+    def update(self, values: Union[Sequence, Iterable]):
+        """ Narrow the candidates by a chunk of values.
+
+        Args:
+            values (Union[Sequence, Iterable]): chunk of the column, a NumPy array is supported.
+        """
+        if getattr(values, 'dtype', None) is not None and values.dtype.kind in 'biufMm':
+            self._update_array(values)
+            return
+
+        chunk = [value for value in values if value is not None and value != '' and value == value]
+        if not chunk:
+            return
+
+        self.values_qty += len(chunk)
+        types = set(map(type, chunk))
+        if len({self._TYPE_GROUPS.get(value_type, str) for value_type in types}) == 1:
+            self._update_objects(chunk, types)
+            return
+
+        # every group of a mixed chunk narrows the candidates by its own rules, as if it came in a separate chunk.
+        groups = {}
+        for value in chunk:
+            groups.setdefault(self._TYPE_GROUPS.get(type(value), str), []).append(value)
+        for group in groups.values():
+            self._update_objects(group, set(map(type, group)))
+
+    def _update_objects(self, chunk: list, types: set):
+        """ Narrow the candidates by a chunk of not null python values of one type group.
+        """
+        if types <= {bool}:
+            self._kill('is_bool')
+        elif types <= {int}:
+            self._kill('is_int', 'is_float', 'is_numeric')
+            self._merge_int_range(min(chunk), max(chunk))
+        elif types <= {int, float}:
+            self._kill('is_int', 'is_float', 'is_numeric')
+            self.has_float = True
+            if self.is_int and all(map(float.is_integer, map(float, chunk))):
+                self._merge_int_range(int(min(chunk)), int(max(chunk)))
+            else:
+                self.is_int = False
+        elif types <= {int, float, Decimal}:
+            self._kill('is_numeric')
+        elif types <= {date}:
+            self._kill('is_date', 'is_timestamp')
+        elif types <= {date, datetime}:
+            self._kill('is_timestamp')
+            self.has_tz = self.has_tz or any(value.tzinfo is not None for value in chunk if type(value) is datetime)
+        elif types <= {timedelta}:
+            self._kill('is_interval')
+        else:
+            self._update_strings(chunk if types == {str} else list(map(str, chunk)))
+
+    def _update_strings(self, chunk: list):
+        """ Narrow the candidates by a chunk of not null strings.
+        """
+        self.is_float = self.is_interval = False
+        if self.is_int:
+            if all(map(PG_INT_STRING.fullmatch, chunk)):
+                ints = list(map(int, chunk))
+                self._merge_int_range(min(ints), max(ints))
+            else:
+                self.is_int = False
+        if self.is_numeric:
+            self.is_numeric = all(map(PG_NUMERIC_STRING.fullmatch, chunk))
+        if self.is_bool:
+            self.is_bool = self.BOOL_VOCABULARY.issuperset(map(str.lower, chunk))
+        if self.is_date:
+            self.is_date = all(map(PG_DATE_STRING.fullmatch, chunk)) and self._is_valid_dates(chunk)
+        if self.is_timestamp:
+            matches = list(map(PG_TIMESTAMP_STRING.fullmatch, chunk))
+            self.is_timestamp = all(matches) and self._is_valid_dates(chunk)
+            self.has_tz = self.has_tz or self.is_timestamp and any(match.group(1) for match in matches)
+
+    def _is_valid_dates(self, chunk: list) -> bool:
+        """ Check the calendar validity of the date part of the strings, like 2023-02-30.
+        """
+        try:
+            list(map(date.fromisoformat, [value[:10] for value in chunk]))
+        except ValueError:
+            return False
+        return True
+
+    def _update_array(self, values: Any):
+        """ Narrow the candidates by a NumPy array with numbers, booleans, datetimes or timedeltas.
+        """
+        kind = values.dtype.kind
+        if kind in 'fMm':
+            # NaN and NaT are not equal to themselves.
+            values = values[values == values]
+        if not len(values):
+            return
+
+        self.values_qty += len(values)
+        if kind == 'b':
+            self._kill('is_bool')
+        elif kind in 'iu':
+            self._kill('is_int', 'is_float', 'is_numeric')
+            self._merge_int_range(int(values.min()), int(values.max()))
+        elif kind == 'f':
+            self._kill('is_int', 'is_float', 'is_numeric')
+            self.has_float = True
+            low, high = values.min(), values.max()
+            if self.is_int and math.isfinite(low) and math.isfinite(high) and bool((values % 1 == 0).all()):
+                self._merge_int_range(int(low), int(high))
+            else:
+                self.is_int = False
+        elif kind == 'M':
+            self._kill('is_date', 'is_timestamp')
+            if self.is_date:
+                self.is_date = bool((values.astype('M8[D]') == values).all())
+        else:
+            self._kill('is_interval')
+
+    @property
+    def pg_type(self) -> 'SQLHelper.PgSqlType':
+        """ The narrowest type, that fits all values passed so far. TEXT if there were no values.
+        """
+        pg_type = SQLHelper.PgSqlType
+        if not self.values_qty:
+            return pg_type.TEXT
+        if self.is_int and self.int_range is not None:
+            low, high = self.int_range
+            for int_type, (type_low, type_high) in (
+                (pg_type.SMALLINT, PG_SMALLINT_RANGE),
+                (pg_type.INTEGER, PG_INT_RANGE),
+                (pg_type.BIGINT, PG_BIGINT_RANGE)
+            ):
+                if type_low <= low and high <= type_high:
+                    return int_type
+        if self.is_float and self.has_float:
+            return pg_type.DOUBLE_PRECISION
+        if self.is_numeric:
+            return pg_type.NUMERIC
+        if self.is_bool:
+            return pg_type.BOOLEAN
+        if self.is_date:
+            return pg_type.DATE
+        if self.is_timestamp:
+            return pg_type.TIMESTAMP_TZ if self.has_tz else pg_type.TIMESTAMP
+        if self.is_interval:
+            return pg_type.INTERVAL
+        return pg_type.TEXT
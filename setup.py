@@ -15,6 +15,8 @@ setup(
     long_description_content_type="text/markdown",
     url="https://github.com/NikitaKokarev/py-datatools/",
     packages=find_packages(),
+    # dt_vec and the NumPy paths of bucket_counts, PeriodAggregator, coalesce_columns and TypeInferrer
+    extras_require={'numpy': ['numpy>=1.17']},
     classifiers=[
         "Programming Language :: Python :: 3.7",
         "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
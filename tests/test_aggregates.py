@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+""" AGGREGATE PLANS: plan_aggregates AND split_dates_by_aggregates MATCH THE BRUTE FORCE OVER DAYS AND HOURS.
+"""
+__author__ = 'kokarev.nv'
+
+from random import Random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from py_datatools import dt_helper
+
+ONE_DAY = timedelta(days=1)
+ONE_HOUR = timedelta(hours=1)
+PERIOD_MONTHS = {'month': 1, 'quarter': 3, 'halfyear': 6, 'year': 12}
+AGGREGATE_TYPES = ('year', 'halfyear', 'quarter', 'month', 'week', 'day')
+
+
+def _random_date(rng: Random) -> date:
+    return date(1960, 1, 1) + timedelta(days=rng.randrange(150 * 365))
+
+
+def _days(begin: date, end: date) -> list:
+    return [begin + timedelta(days=idx) for idx in range((end - begin).days + 1)]
+
+
+def _next_period(moment: datetime, period_type: str, by_hours: bool):
+    """ The moment after the period of the type, that begins at the moment, or None. """
+    if period_type == 'hour':
+        return moment + ONE_HOUR
+    if by_hours and moment.hour:
+        return None
+    if period_type == 'day':
+        return moment + ONE_DAY
+    if period_type == 'week':
+        return moment + 7 * ONE_DAY if moment.weekday() == 0 else None
+    months = PERIOD_MONTHS[period_type]
+    if moment.day != 1 or (moment.month - 1) % months:
+        return None
+    year, month = divmod(moment.year * 12 + moment.month - 1 + months, 12)
+    return moment.replace(year=year, month=month + 1)
+
+
+def _fewest_cover(begin, stop, period_types: set, by_hours: bool):
+    """ Fewest number of periods, that tile [begin, stop), by the dynamic programming over days (hours). """
+    best = {begin: 0}
+    moment = begin
+    step = ONE_HOUR if by_hours else ONE_DAY
+    while moment < stop:
+        if moment in best:
+            for period_type in period_types:
+                next_moment = _next_period(moment, period_type, by_hours)
+                if next_moment is not None and next_moment <= stop:
+                    best[next_moment] = min(best.get(next_moment, best[moment] + 1), best[moment] + 1)
+        moment += step
+    return best.get(stop)
+
+
+def _check_segments(segments: list, begin, end, period_types: set, by_hours: bool):
+    step = ONE_HOUR if by_hours else ONE_DAY
+    moment = begin
+    for segment in segments:
+        assert segment.period_type in period_types and segment.begin == moment
+        next_moment = _next_period(moment, segment.period_type, by_hours)
+        assert next_moment is not None and segment.end == next_moment - step
+        moment = next_moment
+    assert moment == end + step
+
+
+def _random_types(rng: Random) -> set:
+    return {period_type for period_type in AGGREGATE_TYPES if rng.random() < 0.6} or {'day'}
+
+
+def test_split_dates_by_aggregates_is_fewest():
+    rng = Random(20230616)
+    for idx in range(600):
+        begin = _random_date(rng)
+        end = begin + timedelta(days=rng.choice([rng.randrange(40), rng.randrange(1200)]))
+        period_types = set(AGGREGATE_TYPES) if idx % 3 == 0 else _random_types(rng)
+        fewest = _fewest_cover(begin, end + ONE_DAY, period_types, False)
+        if fewest is None:
+            with pytest.raises(ValueError):
+                dt_helper.split_dates_by_aggregates(begin, end, period_types)
+            continue
+        segments = dt_helper.split_dates_by_aggregates(begin, end, period_types)
+        _check_segments(segments, begin, end, period_types, False)
+        assert len(segments) == fewest, (begin, end, period_types)
+    assert dt_helper.split_dates_by_aggregates(date(2024, 5, 2), date(2024, 5, 1)) == []
+
+
+def test_split_datetimes_by_hours_is_fewest():
+    rng = Random(20230617)
+    for _ in range(150):
+        begin = datetime.combine(_random_date(rng), datetime.min.time()) + timedelta(hours=rng.randrange(24))
+        end = begin + timedelta(hours=rng.randrange(24 * 45))
+        period_types = _random_types(rng) | {'hour'}
+        segments = dt_helper.split_dates_by_aggregates(begin, end, period_types)
+        _check_segments(segments, begin, end, period_types, True)
+        assert len(segments) == _fewest_cover(begin, end + ONE_HOUR, period_types, True), (begin, end, period_types)
+    # without hours the datetimes are covered by days
+    segments = dt_helper.split_dates_by_aggregates(datetime(2024, 1, 1, 5), datetime(2024, 1, 31, 7), {'month'})
+    assert [(segment.period_type, segment.begin, segment.end) for segment in segments] == [
+        ('month', date(2024, 1, 1), date(2024, 1, 31))
+    ]
+
+
+def _random_range(rng: Random) -> tuple:
+    begin = _random_date(rng) if rng.random() < 0.5 else date(2020, 1, 1) + timedelta(days=rng.randrange(1500))
+    return begin, begin + timedelta(days=rng.randrange(-3, 500))
+
+
+def test_plan_aggregates_covers_ranges():
+    rng = Random(20230618)
+    for _ in range(200):
+        ranges = [_random_range(rng) for _ in range(rng.randrange(1, 12))] + [(None, date(2024, 1, 1))]
+        plan = dt_helper.plan_aggregates(ranges)
+        assert len(plan.pieces) == len(ranges)
+        fetched = {'month': set(), 'day': set()}
+        for pieces, (begin, end) in zip(plan.pieces, ranges):
+            if begin is None or end < begin:
+                assert pieces == []
+                continue
+            # the pieces tile the range, monthly pieces are whole months
+            assert [day for piece in pieces for day in _days(piece.begin, piece.end)] == _days(begin, end)
+            assert pieces == [piece for piece in pieces if piece.begin <= piece.end]
+            for piece in pieces:
+                fetch_ranges = plan.month_ranges if piece.period_type == 'month' else plan.day_ranges
+                fetch_begin, fetch_end = fetch_ranges[piece.fetch_index]
+                assert fetch_begin <= piece.begin and piece.end <= fetch_end
+                fetched[piece.period_type].update(_days(piece.begin, piece.end))
+                if piece.period_type == 'month':
+                    assert piece.begin.day == 1 and (piece.end + ONE_DAY).day == 1
+            assert pieces == [
+                dt_helper.AggregatePiece(period_type, piece_begin, piece_end, piece.fetch_index)
+                for piece, (period_type, piece_begin, piece_end) in zip(pieces, _split(begin, end))
+            ]
+        # the fetch ranges are the fewest: sorted, disjoint and not adjacent, every day is read once
+        for period_type, fetch_ranges in (('month', plan.month_ranges), ('day', plan.day_ranges)):
+            assert all(left[1] + ONE_DAY < right[0] for left, right in zip(fetch_ranges, fetch_ranges[1:]))
+            assert {day for fetch_begin, fetch_end in fetch_ranges for day in _days(fetch_begin, fetch_end)} == (
+                fetched[period_type]
+            )
+
+
+def _split(begin: date, end: date) -> list:
+    """ Non-empty parts of split_dates_for_aggregate. """
+    begin_left, end_left, begin_center, end_center, begin_right, end_right = dt_helper.split_dates_for_aggregate(
+        begin, end
+    )
+    return [
+        (period_type, part_begin, part_end) for period_type, part_begin, part_end in (
+            ('day', begin_left, end_left), ('month', begin_center, end_center), ('day', begin_right, end_right)
+        ) if part_begin and part_end and part_begin <= part_end
+    ]
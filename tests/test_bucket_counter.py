@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+""" BucketCounter AND bucket_counts MATCH THE BRUTE FORCE HISTOGRAM.
+"""
+__author__ = 'kokarev.nv'
+
+from random import Random
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from py_datatools import BucketCounter, bucket_counts
+
+PERIOD_TYPES = ('hour', 'day', 'week', 'month', 'quarter', 'halfyear', 'year')
+PERIOD_MONTHS = {'month': 1, 'quarter': 3, 'halfyear': 6, 'year': 12}
+
+
+def _period_start(timestamp: datetime, period_type: str):
+    if period_type == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    day = timestamp.date() if isinstance(timestamp, datetime) else timestamp
+    if period_type == 'day':
+        return day
+    if period_type == 'week':
+        return day - timedelta(days=day.weekday())
+    months = PERIOD_MONTHS[period_type]
+    return date(day.year, (day.month - 1) // months * months + 1, 1)
+
+
+def _next_start(start, period_type: str):
+    if period_type in ('hour', 'day', 'week'):
+        return start + {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(days=7)}[period_type]
+    year, month = divmod(start.year * 12 + start.month - 1 + PERIOD_MONTHS[period_type], 12)
+    return date(year, month + 1, 1)
+
+
+def _brute_force_histogram(timestamps: list, period_type: str, weights: list = None) -> list:
+    counts = Counter()
+    for idx, timestamp in enumerate(timestamps):
+        if timestamp is not None:
+            counts[_period_start(timestamp, period_type)] += 1 if weights is None else weights[idx]
+    if not counts:
+        return []
+    histogram = []
+    start, last = min(counts), max(counts)
+    while start <= last:
+        histogram.append((start, counts.get(start, 0)))
+        start = _next_start(start, period_type)
+    return histogram
+
+
+def _random_timestamps(rng: Random, period_type: str, qty: int) -> list:
+    first = datetime(rng.randrange(1950, 2100), 1, 1)
+    span = {'hour': 10 * 86400, 'day': 400 * 86400, 'week': 1500 * 86400}.get(period_type, 30 * 365 * 86400)
+    timestamps = [
+        first + timedelta(seconds=rng.randrange(span), microseconds=rng.randrange(10 ** 6)) for _ in range(qty)
+    ]
+    # None is skipped
+    return [None if rng.random() < 0.05 else timestamp for timestamp in timestamps]
+
+
+@pytest.mark.parametrize('period_type', PERIOD_TYPES)
+def test_bucket_counts(period_type: str):
+    rng = Random(20230621)
+    for qty in (0, 1, 2, 100, 3000):
+        timestamps = _random_timestamps(rng, period_type, qty)
+        assert bucket_counts(timestamps, period_type) == _brute_force_histogram(timestamps, period_type)
+        weights = [rng.randrange(-50, 50) / 4 for _ in timestamps]
+        assert bucket_counts(timestamps, period_type, weights) == _brute_force_histogram(
+            timestamps, period_type, weights
+        )
+        if period_type != 'hour':
+            days = [timestamp.date() if timestamp else None for timestamp in timestamps]
+            assert bucket_counts(days, period_type) == _brute_force_histogram(timestamps, period_type)
+
+        # chunks are counted into the same buckets
+        counter = BucketCounter(period_type)
+        for idx in range(0, len(timestamps), 7):
+            counter.update(timestamps[idx:idx + 7])
+        assert counter.items() == _brute_force_histogram(timestamps, period_type)
+
+
+@pytest.mark.parametrize('period_type', PERIOD_TYPES)
+def test_bucket_counts_numpy(period_type: str):
+    np = pytest.importorskip('numpy')
+    rng = Random(20230622)
+    for qty in (0, 1, 100, 3000):
+        timestamps = _random_timestamps(rng, period_type, qty)
+        array = np.array(timestamps, dtype='M8[us]')
+        starts, counts = bucket_counts(array, period_type)
+        histogram = _brute_force_histogram(timestamps, period_type)
+        assert list(zip(starts.tolist(), counts.tolist())) == histogram
+        assert counts.dtype == np.int64
+        weights = np.array([rng.random() for _ in timestamps])
+        starts, sums = bucket_counts(array, period_type, weights)
+        expected = _brute_force_histogram(timestamps, period_type, weights.tolist())
+        assert starts.tolist() == [start for start, _ in expected]
+        assert np.allclose(sums, [value for _, value in expected])
+
+        # NumPy chunks and lists are counted into the same buckets
+        counter = BucketCounter(period_type).update(array[:qty // 2]).update(timestamps[qty // 2:])
+        assert counter.items() == histogram
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+""" CKeyIndex AND CKey.join MATCH THE LINEAR SCAN OF THE COMPOSITE KEYS.
+"""
+__author__ = 'kokarev.nv'
+
+from random import Random
+
+import pytest
+
+from py_datatools import CKey, CKeyIndex
+
+NAMES = ['region', 'shop', 'code', 'price']
+TYPES = [int, int, str, float]
+
+
+def _random_compk(rng: Random, with_empty: bool, with_huge: bool) -> str:
+    if with_empty and rng.random() < 0.05:
+        return ''
+    parts = [
+        str(rng.randrange(-3, 5)), str(rng.randrange(2 ** 70 if with_huge and rng.random() < 0.1 else 20)),
+        # the delimiter is a dot, float keys are written without the fraction
+        rng.choice(['a', 'b', 'ab', 'z']), str(rng.randrange(8) * 25)
+    ]
+    if with_empty:
+        parts = ['' if rng.random() < 0.1 else part for part in parts]
+    return CKey.DELIMETER.join(parts)
+
+
+def _sort_key(values) -> tuple:
+    return tuple((value is not None, value) for value in values)
+
+
+def _linear_range(ckey: CKey, compk_list: list, low: tuple, high: tuple) -> list:
+    rows = {pos: ckey.decode(compk)[:len(low)] for pos, compk in enumerate(compk_list) if compk}
+    matched = [pos for pos, row in rows.items() if _sort_key(low) <= _sort_key(row) <= _sort_key(high)]
+    return sorted(matched, key=lambda pos: (_sort_key(rows[pos]), pos))
+
+
+def _linear_join(ckey: CKey, left_list: list, right_list: list, on: list) -> list:
+    idxs = [ckey.NAMES.index(name) for name in on]
+    return [
+        (left_pos, right_pos)
+        for left_pos, left in enumerate(left_list) if left
+        for right_pos, right in enumerate(right_list) if right
+        if [ckey.decode(left)[idx] for idx in idxs] == [ckey.decode(right)[idx] for idx in idxs]
+    ]
+
+
+@pytest.mark.parametrize('with_empty, with_huge', [(False, False), (True, False), (False, True), (True, True)])
+def test_ckey_index_matches_linear_scan(with_empty: bool, with_huge: bool):
+    rng = Random(20230626)
+    ckey = CKey(NAMES, TYPES)
+    for qty in (0, 1, 2, 300):
+        compk_list = [_random_compk(rng, with_empty, with_huge) for _ in range(qty)]
+        index = ckey.index(compk_list)
+        assert isinstance(index, CKeyIndex) and len(index) == qty
+        assert [index.row(pos) for pos in range(qty)] == [
+            ckey.unpack_dict(compk) if compk else None for compk in compk_list
+        ]
+        for compk in compk_list[:50] + [_random_compk(rng, with_empty, with_huge) for _ in range(20)]:
+            if compk:
+                assert index.find(compk) == [pos for pos, other in enumerate(compk_list) if other and (
+                    ckey.decode(other) == ckey.decode(compk)
+                )]
+        for _ in range(60):
+            low = ckey.decode(_random_compk(rng, with_empty, with_huge) or _random_compk(rng, False, with_huge))
+            high = ckey.decode(_random_compk(rng, with_empty, with_huge) or _random_compk(rng, False, with_huge))
+            qty_leading = rng.randrange(1, len(NAMES) + 1)
+            low, high = low[:qty_leading], high[:qty_leading]
+            assert index.prefix(*low) == _linear_range(ckey, compk_list, low, low)
+            assert index.prefix_range(low, high) == _linear_range(ckey, compk_list, low, high)
+
+
+def test_ckey_join_matches_nested_loops():
+    rng = Random(20230627)
+    ckey = CKey(NAMES, TYPES)
+    for with_empty in (False, True):
+        left_list = [_random_compk(rng, with_empty, False) for _ in range(150)]
+        right_list = [_random_compk(rng, with_empty, False) for _ in range(150)]
+        for on in (None, ['region'], ['code', 'region'], ['price', 'shop', 'code']):
+            expected = _linear_join(ckey, left_list, right_list, on or NAMES)
+            assert sorted(ckey.join(left_list, right_list, on)) == expected
+            index = ckey.index(right_list)
+            # the hash indexes on the join keys are reused
+            assert sorted(index.join(left_list, on)) == sorted(index.join(left_list, on)) == expected
+
+
+def test_ckey_index_errors():
+    ckey = CKey(NAMES, TYPES)
+    with pytest.raises(ValueError):
+        ckey.index(['1.2.a.50', '1.2.a'])
+    with pytest.raises(ValueError):
+        ckey.index(['1.2.a.50']).prefix_range((1,), (1, 2))
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+""" coalesce_columns MATCHES THE ROW BY ROW coalesce.
+"""
+__author__ = 'kokarev.nv'
+
+import math
+from random import Random
+
+import pytest
+
+from py_datatools import Collections
+
+
+def _is_empty(value, falsy: str) -> bool:
+    # NaN and NaT stand for None
+    if value is None or value != value:
+        return True
+    return falsy == 'falsy' and not value
+
+
+def _brute_force_coalesce(columns: list, falsy: str) -> tuple:
+    values, sources = [], []
+    for row in zip(*columns):
+        source = next((idx for idx, value in enumerate(row) if not _is_empty(value, falsy)), -1)
+        values.append(row[source])
+        sources.append(source)
+    return values, sources
+
+
+def _random_column(rng: Random, qty: int, pool: list) -> list:
+    return [rng.choice(pool) for _ in range(qty)]
+
+
+POOL = [None, None, 0, 1, -7, '', 'a', 0.0, 2.5, [], [0], False, True]
+
+
+@pytest.mark.parametrize('falsy', ['none', 'falsy'])
+def test_coalesce_columns(falsy: str):
+    rng = Random(20230628)
+    for qty in (0, 1, 2, 300):
+        for columns_qty in (1, 2, 3, 6):
+            columns = [_random_column(rng, qty, POOL) for _ in range(columns_qty)]
+            assert Collections.coalesce_columns(*columns, falsy=falsy) == _brute_force_coalesce(columns, falsy)
+            # tuples are coalesced as lists
+            assert Collections.coalesce_columns(*map(tuple, columns), falsy=falsy) == _brute_force_coalesce(
+                columns, falsy
+            )
+    if falsy == 'falsy':
+        for row in zip(*[_random_column(rng, 300, POOL) for _ in range(4)]):
+            assert Collections.coalesce_columns(*[[value] for value in row], falsy=falsy)[0] == [
+                Collections.coalesce(*row)
+            ]
+
+
+def _same(left, right) -> bool:
+    if isinstance(left, float) and isinstance(right, float) and math.isnan(left) and math.isnan(right):
+        return True
+    return left == right
+
+
+@pytest.mark.parametrize('falsy', ['none', 'falsy'])
+def test_coalesce_columns_numpy(falsy: str):
+    np = pytest.importorskip('numpy')
+    rng = Random(20230629)
+    pools = {
+        'f8': [float('nan'), float('nan'), 0.0, 1.5, -2.0],
+        'i8': [0, 0, 3, -4],
+        'M8[s]': [None, None, '1970-01-01T00:00:00', '2024-02-29T12:30:00'],
+        'm8[s]': [None, 0, 5, -60],
+        'O': [None, None, 0, 'a', '', 2.5],
+        'U3': ['', 'a', 'abc'],
+        '?': [False, True],
+    }
+    for dtypes in (['f8'], ['f8', 'f8', 'f8'], ['i8', 'f8'], ['M8[s]', 'M8[s]'], ['m8[s]', 'm8[s]', 'm8[s]'],
+                   ['O', 'O', 'O'], ['U3', 'U3'], ['?', 'i8'], ['O', 'f8']):
+        for qty in (0, 1, 300):
+            columns = [np.array(_random_column(rng, qty, pools[dtype]), dtype=dtype) for dtype in dtypes]
+            values, sources = Collections.coalesce_columns(*columns, falsy=falsy)
+            assert values.dtype == np.result_type(*columns)
+            # the brute force runs over the values of the common type
+            expected_values, expected_sources = _brute_force_coalesce(
+                [column.astype(values.dtype).tolist() for column in columns], falsy
+            )
+            assert sources.tolist() == expected_sources
+            assert all(_same(value, expected) for value, expected in zip(values.tolist(), expected_values))
+
+
+def test_coalesce_columns_errors():
+    with pytest.raises(ValueError):
+        Collections.coalesce_columns()
+    with pytest.raises(ValueError):
+        Collections.coalesce_columns([1], [1, 2])
+    with pytest.raises(ValueError):
+        Collections.coalesce_columns([1], falsy='zero')
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+""" CALENDAR FUNCTIONS OF DT_HELPER MATCH THE BRUTE FORCE OVER DAYS.
+"""
+__author__ = 'kokarev.nv'
+
+import re
+import calendar
+import threading
+from random import Random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from py_datatools import dt_helper
+
+FIRST_DATE = date(1900, 1, 1)  # before the calendar table of dt_helper (1970-2070) and after it
+DAYS_QTY = (date(2150, 12, 31) - FIRST_DATE).days
+
+
+def _random_date(rng: Random) -> date:
+    return FIRST_DATE + timedelta(days=rng.randrange(DAYS_QTY))
+
+
+def _random_datetime(rng: Random) -> datetime:
+    return datetime.combine(_random_date(rng), datetime.min.time()) + timedelta(
+        microseconds=rng.choice([0, rng.randrange(86400 * 10 ** 6)])
+    )
+
+
+def _add_months(value: date, months: int) -> date:
+    """ The same day (or the last day of a shorter month) and time months later. """
+    year, month = divmod(value.year * 12 + value.month - 1 + months, 12)
+    return value.replace(year=year, month=month + 1, day=min(value.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def _brute_force_delta_month(first: date, second: date) -> int:
+    first, second = min(first, second), max(first, second)
+    months = 0
+    while _add_months(first, months + 1) <= second:
+        months += 1
+    return months
+
+
+def test_delta_month_two_period():
+    rng = Random(20230607)
+    pairs = []
+    for _ in range(5000):
+        first = rng.choice([_random_date, _random_datetime])(rng)
+        # month ends and close days are the edge cases
+        second = rng.choice([
+            first + timedelta(days=rng.randrange(-800, 800)), _add_months(first, rng.randrange(-30, 30)),
+            dt_helper.to_end_of_month(_add_months(first, rng.randrange(-30, 30)))
+        ])
+        if isinstance(first, datetime) and not isinstance(second, datetime):
+            second = datetime.combine(second, first.time() if rng.random() < 0.5 else datetime.min.time())
+        pairs.append((first, second))
+        assert dt_helper.delta_month_two_period(first, second) == _brute_force_delta_month(first, second)
+        assert dt_helper.delta_month_two_period(second, first) == _brute_force_delta_month(first, second)
+    assert dt_helper.delta_month_two_period(None, date(2024, 1, 1)) == 0
+    assert dt_helper.delta_month_two_period_many(*zip(*pairs)) == [
+        _brute_force_delta_month(first, second) for first, second in pairs
+    ]
+
+
+def test_delta_month_two_period_many_numpy():
+    np = pytest.importorskip('numpy')
+    rng = Random(20230608)
+    firsts = [_random_datetime(rng) for _ in range(3000)]
+    seconds = [
+        first + timedelta(days=rng.randrange(-800, 800), seconds=rng.randrange(-86400, 86400)) for first in firsts
+    ]
+    # the units of the arrays differ
+    result = dt_helper.delta_month_two_period_many(np.array(firsts, dtype='M8[us]'), np.array(seconds, dtype='M8[s]'))
+    assert result.tolist() == [
+        _brute_force_delta_month(first, second.replace(microsecond=0)) for first, second in zip(firsts, seconds)
+    ]
+    days = dt_helper.delta_month_two_period_many(
+        np.array([first.date() for first in firsts] + [None], dtype='M8[D]'),
+        np.array([second.date() for second in seconds] + [date(2024, 1, 1)], dtype='M8[D]')
+    )
+    assert days.tolist() == [
+        _brute_force_delta_month(first.date(), second.date()) for first, second in zip(firsts, seconds)
+    ] + [0]
+
+
+def _brute_force_month(day: date) -> tuple:
+    """ First and last day of the month by walking the days. """
+    first = last = day
+    while (first - timedelta(days=1)).month == day.month:
+        first -= timedelta(days=1)
+    while (last + timedelta(days=1)).month == day.month:
+        last += timedelta(days=1)
+    return first, last
+
+
+def _brute_force_period(day: date, months: int) -> tuple:
+    """ First and last day of the quarter (half a year, year) by walking the months. """
+    first, last = _brute_force_month(day)
+    while (first.month - 1) % months:
+        first = _brute_force_month(first - timedelta(days=1))[0]
+    while last.month % months:
+        last = _brute_force_month(last + timedelta(days=1))[1]
+    return first, last
+
+
+@pytest.fixture(scope='module')
+def dates() -> list:
+    rng = Random(20230609)
+    return [_random_date(rng) for _ in range(1500)] + [
+        date(1969, 12, 31), date(1970, 1, 1), date(2070, 12, 31), date(2071, 1, 1), date(2024, 2, 29),
+        date(2100, 2, 28), date(2000, 2, 29)
+    ]
+
+
+def test_calendar_index_tables():
+    calendar_index = dt_helper.get_calendar_index()
+    assert calendar_index is dt_helper.get_calendar_index()
+    day = date.fromordinal(calendar_index.first_ordinal)
+    assert day == date(1970, 1, 1) and calendar_index.last_ordinal == date(2070, 12, 31).toordinal()
+    while day.toordinal() <= calendar_index.last_ordinal:
+        idx = calendar_index.month_index_of_ordinal(day.toordinal())
+        assert idx == calendar_index.month_index(day) == (day.year - 1970) * 12 + day.month - 1
+        if day.day == 1:
+            first, last = _brute_force_month(day)
+            assert (calendar_index.month_starts[idx], calendar_index.month_ends[idx]) == (first, last)
+            assert calendar_index.month_lens[idx] == last.day
+            assert calendar_index.month_start_ordinals[idx] == first.toordinal()
+            for starts, ends, months in (
+                (calendar_index.quarter_starts, calendar_index.quarter_ends, 3),
+                (calendar_index.half_year_starts, calendar_index.half_year_ends, 6),
+                (calendar_index.year_starts, calendar_index.year_ends, 12),
+            ):
+                assert (starts[idx], ends[idx]) == _brute_force_period(day, months)
+        day += timedelta(days=1)
+    for day in (date(1969, 12, 31), date(2071, 1, 1)):
+        assert calendar_index.month_index(day) is None
+        assert calendar_index.month_index_of_ordinal(day.toordinal()) is None
+
+
+def test_calendar_index_of_other_years():
+    calendar_index = dt_helper.CalendarIndex(date(1899, 6, 1), date(1901, 2, 1))
+    assert calendar_index.months_qty == 36
+    assert calendar_index.month_ends[13] == date(1900, 2, 28)
+    assert calendar_index.month_index_of_ordinal(date(1901, 12, 31).toordinal()) == 35
+
+
+def test_boundary_functions(dates: list):
+    for day in dates:
+        first, last = _brute_force_month(day)
+        assert (dt_helper.to_start_of_month(day), dt_helper.to_end_of_month(day)) == (first, last)
+        assert dt_helper.is_first_month_day(day) == (day == first)
+        assert dt_helper.is_last_month_day(day) == (day == last)
+        assert dt_helper.to_start_of_prev_month(day) == _brute_force_month(first - timedelta(days=1))[0]
+        quarter = _brute_force_period(day, 3)
+        assert (dt_helper.begin_of_current_quarter(day), dt_helper.end_of_current_quarter(day)) == quarter
+        assert (dt_helper.to_begin_of_year(day), dt_helper.to_end_of_year(day)) == _brute_force_period(day, 12)
+        assert dt_helper.get_end_period(day, dt_helper.PERIOD_TYPE_QUARTER) == (day, quarter[1])
+        assert dt_helper.is_full_month(first, last)
+        months = Random(day.toordinal()).randrange(-40, 40)
+        assert dt_helper.timedelta_months(day, months) == _add_months(day, months) - day - timedelta(days=1)
+    assert dt_helper.timedelta_months('2024-01-31', 1) == timedelta(days=28)
+
+
+def _chain_period_type(begin: date, end: date):
+    """ The first of the is_period_* checks, that holds. """
+    for period_type, is_period in (
+        (dt_helper.PERIOD_TYPE_DAY, dt_helper.is_period_day),
+        (dt_helper.PERIOD_TYPE_WEEK, dt_helper.is_period_week),
+        (dt_helper.PERIOD_TYPE_MONTH, dt_helper.is_period_month),
+        (dt_helper.PERIOD_TYPE_QUARTER, dt_helper.is_period_quarter),
+        (dt_helper.PERIOD_TYPE_HALF_YEAR, dt_helper.is_period_half_year),
+        (dt_helper.PERIOD_TYPE_YEAR, dt_helper.is_period_year),
+        (dt_helper.PERIOD_TYPE_OTHER, dt_helper.is_period_other),
+    ):
+        if is_period(begin, end):
+            return period_type
+    return None
+
+
+def test_classify_period():
+    rng = Random(20230610)
+    periods = []
+    for _ in range(8000):
+        begin = _random_date(rng)
+        if rng.random() < 0.6:
+            begin = _brute_force_month(begin)[0]
+        end = rng.choice([
+            begin + timedelta(days=rng.randrange(-3, 10)),
+            _brute_force_month(_add_months(begin, rng.randrange(-1, 13)))[1],
+            _add_months(begin, rng.randrange(14)),
+        ])
+        periods.append((begin, end))
+        expected = _chain_period_type(begin, end) if begin <= end else None
+        assert dt_helper.classify_period(begin, end) == expected, (begin, end)
+    assert dt_helper.classify_periods(periods) == [dt_helper.classify_period(begin, end) for begin, end in periods]
+    assert {dt_helper.classify_period(begin, end) for begin, end in periods} == {
+        None, 'day', 'week', 'month', 'quarter', 'halfyear', 'year', 'other'
+    }
+
+
+PERIOD_MONTHS = {'month': 1, 'quarter': 3, 'halfyear': 6, 'year': 12}
+
+
+def _brute_force_periods(begin: date, end: date, period_type: str) -> list:
+    """ Bounds of the periods of the days (hours) from begin to end, walking one day (hour) at a time. """
+    periods = []
+    labels = []
+    day = begin
+    step = timedelta(hours=1) if period_type == 'hour' else timedelta(days=1)
+    while day <= end or period_type == 'hour' and (day.date(), day.hour) == (end.date(), end.hour):
+        if period_type == 'hour':
+            label = day.date(), day.hour
+        elif period_type == 'day':
+            label = day
+        elif period_type == 'week':
+            label = day - timedelta(days=day.weekday())
+        else:
+            label = day.year, (day.month - 1) // PERIOD_MONTHS[period_type]
+        if not labels or labels[-1] != label:
+            labels.append(label)
+            if period_type == 'hour':
+                hour = day.replace(minute=0, second=0, microsecond=0)
+                periods.append((hour, hour + step - timedelta(microseconds=1)))
+            elif period_type in ('day', 'week'):
+                periods.append((label, label + timedelta(days=6 if period_type == 'week' else 0)))
+            else:
+                periods.append(_brute_force_period(day, PERIOD_MONTHS[period_type]))
+        day += step
+    return periods
+
+
+@pytest.mark.parametrize('period_type', ['hour', 'day', 'week', 'month', 'quarter', 'halfyear', 'year'])
+def test_iter_periods(period_type: str):
+    rng = Random(20230611)
+    for _ in range(40):
+        begin = _random_datetime(rng) if period_type == 'hour' else _random_date(rng)
+        end = begin + timedelta(hours=rng.randrange(200)) if period_type == 'hour' else begin + timedelta(
+            days=rng.randrange({'day': 60, 'week': 200}.get(period_type, 1500))
+        )
+        expected = _brute_force_periods(begin, end, period_type)
+        assert list(dt_helper.iter_periods(begin, end, period_type)) == expected
+        periods = dt_helper.iter_periods(begin, end, period_type)
+        assert next(periods) == expected[0]
+    assert list(dt_helper.iter_periods(date(2024, 5, 1), date(2024, 4, 30))) == []
+
+
+@pytest.mark.parametrize('period_type', ['hour', 'day', 'week', 'month', 'quarter', 'halfyear', 'year'])
+def test_periods_array(period_type: str):
+    pytest.importorskip('numpy')
+    rng = Random(20230612)
+    for _ in range(40):
+        begin = _random_datetime(rng) if period_type == 'hour' else _random_date(rng)
+        end = begin + timedelta(days=rng.randrange(1000))
+        starts, ends = dt_helper.periods_array(begin, end, period_type)
+        assert list(zip(starts.tolist(), ends.tolist())) == list(dt_helper.iter_periods(begin, end, period_type))
+
+
+FUZZ_ALPHABET = '0123456789' * 3 + '-.-. +_٣'
+
+
+def _brute_force_parse(value: str):
+    """ The date of the yyyy-mm-dd or dd.mm.yyyy string with optional zero padding, None for other strings. """
+    for pattern, groups in ((r'([0-9]{4})-([0-9]{1,2})-([0-9]{1,2})', (1, 2, 3)),
+                            (r'([0-9]{1,2})\.([0-9]{1,2})\.([0-9]{4})', (3, 2, 1))):
+        match = re.fullmatch(pattern, value)
+        if match:
+            try:
+                return date(*(int(match.group(idx)) for idx in groups))
+            except ValueError:
+                return None
+    return None
+
+
+def test_parse_date_formats(dates: list):
+    for day in dates:
+        for value in (
+            day.isoformat(), day.strftime('%d.%m.%Y'), day.strftime('%Y%m%d'), int(day.strftime('%Y%m%d')),
+            f'{day.day}.{day.month}.{day.year}', f'{day.year}-{day.month}-{day.day}'
+        ):
+            assert dt_helper.parse_date(value) == day, value
+    assert dt_helper.parse_date('infinity') == date(9999, 12, 31)
+    assert dt_helper.parse_date(None) is None
+    now = datetime(2024, 1, 5, 10, 30)
+    assert dt_helper.parse_date(now) is now
+
+
+@pytest.mark.parametrize('value', [
+    '2024-+1-05', '2024- 1-05', '2_24-01-05', '2024-01- 5', ' 5.01.2024', '２０２４-01-05',
+    '2024-02-30', '31.02.2024', '20241301', '2024-01-05 ', 'abc', '', '+20240105', '2024_0105', -20240105
+])
+def test_parse_date_rejects(value):
+    with pytest.raises(ValueError):
+        dt_helper.parse_date(value)
+
+
+def test_parse_date_fuzz(dates: list):
+    rng = Random(20230613)
+    parsed_qty = 0
+    for _ in range(20000):
+        day = rng.choice(dates)
+        value = rng.choice([day.isoformat(), day.strftime('%d.%m.%Y'), f'{day.day}.{day.month}.{day.year}'])
+        # a random edit of a valid string
+        idx = rng.randrange(len(value))
+        value = value[:idx] + rng.choice(['', rng.choice(FUZZ_ALPHABET)]) + value[idx + rng.randrange(2):]
+        if '-' not in value and '.' not in value:
+            continue
+        expected = _brute_force_parse(value)
+        if expected is None:
+            with pytest.raises(ValueError):
+                dt_helper.parse_date(value)
+        else:
+            assert dt_helper.parse_date(value) == expected, value
+            parsed_qty += 1
+    assert parsed_qty > 1000
+
+
+def test_parse_dates_many(dates: list):
+    rng = Random(20230614)
+    formats = [date.isoformat, lambda day: day.strftime('%d.%m.%Y'), lambda day: f'{day.day}.{day.month}.{day.year}']
+    values = [rng.choice(formats + [lambda day: day, lambda day: None])(rng.choice(dates)) for _ in range(5000)]
+    assert dt_helper.parse_dates_many(values) == [dt_helper.parse_date(value) for value in values]
+    # one format per column is the fast path
+    column = [day.strftime('%d.%m.%Y') for day in dates]
+    assert dt_helper.parse_dates_many(column) == dates
+
+
+def test_today_scope():
+    today = date.today()
+    with dt_helper.today_scope(date(2024, 2, 29)) as frozen:
+        assert frozen == dt_helper.get_today() == date(2024, 2, 29)
+        with dt_helper.today_scope(date(2023, 1, 1)):
+            assert dt_helper.get_today() == date(2023, 1, 1)
+            assert dt_helper.in_current_period(date(2022, 12, 31), date(2023, 1, 1))
+        assert dt_helper.get_today() == date(2024, 2, 29)
+        # other threads are not frozen
+        result = []
+        thread = threading.Thread(target=lambda: result.append(dt_helper.get_today()))
+        thread.start()
+        thread.join()
+        assert result in ([today], [date.today()])
+    assert dt_helper.get_today() in (today, date.today())
+
+
+def test_in_current_period_many(dates: list):
+    rng = Random(20230615)
+    begins = [rng.choice(dates) for _ in range(3000)]
+    ends = [begin + timedelta(days=rng.randrange(-5, 400)) for begin in begins]
+    today = rng.choice(dates)
+    # brute force: today is one of the days of the period
+    expected = [
+        any(begin + timedelta(days=idx) == today for idx in range((end - begin).days + 1))
+        for begin, end in zip(begins, ends)
+    ]
+    assert [dt_helper.in_current_period(begin, end, today) for begin, end in zip(begins, ends)] == expected
+    assert dt_helper.in_current_period_many(begins, ends, today) == expected
+    with dt_helper.today_scope(today):
+        assert dt_helper.in_current_period_many(begins, ends) == expected
+
+    np = pytest.importorskip('numpy')
+    result = dt_helper.in_current_period_many(
+        np.array(begins + [None], dtype='M8[D]'), np.array(ends + [today], dtype='M8[D]'), today
+    )
+    assert result.tolist() == expected + [False]
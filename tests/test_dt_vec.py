@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+""" DT_VEC MATCHES THE SCALAR DT_HELPER FUNCTIONS ELEMENT-WISE.
+"""
+__author__ = 'kokarev.nv'
+
+from random import Random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from py_datatools import dt_helper  # noqa: E402
+from py_datatools import dt_vec  # noqa: E402
+
+FIRST_DATE = date(1900, 1, 1)  # before the calendar table of dt_helper (1970-2070) and after it
+DAYS_QTY = (date(2150, 12, 31) - FIRST_DATE).days
+QTY = 20000
+
+
+@pytest.fixture(scope='module')
+def dates() -> list:
+    rng = Random(20230517)
+    return [FIRST_DATE + timedelta(days=rng.randrange(DAYS_QTY)) for _ in range(QTY)] + [
+        date(1969, 12, 31), date(1970, 1, 1), date(2070, 12, 31), date(2071, 1, 1), date(2024, 2, 29)
+    ]
+
+
+@pytest.fixture(scope='module')
+def timestamps() -> list:
+    rng = Random(20230518)
+    first = datetime.combine(FIRST_DATE, datetime.min.time())
+    return [first + timedelta(seconds=rng.randrange(DAYS_QTY * 86400), microseconds=rng.randrange(10 ** 6))
+            for _ in range(QTY)] + [datetime(1969, 12, 31, 23, 59, 59, 999999), datetime(1970, 1, 1)]
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+@pytest.mark.parametrize('name', [
+    'to_start_of_month', 'to_end_of_month', 'to_begin_of_year', 'begin_of_current_quarter'
+])
+@pytest.mark.parametrize('source', ['dates', 'timestamps'])
+def test_boundaries_match_scalar(name: str, source: str, request):
+    values = request.getfixturevalue(source)
+    scalar = getattr(dt_helper, name)
+    expected = [_as_date(scalar(value)) for value in values]
+    vector = getattr(dt_vec, name)
+    assert vector(values).astype(object).tolist() == expected
+    # datetime64 input of another unit
+    assert vector(np.array(values, dtype='M8[us]')).astype(object).tolist() == expected
+
+
+@pytest.mark.parametrize('source', ['dates', 'timestamps'])
+def test_quarter_name_matches_scalar(source: str, request):
+    values = request.getfixturevalue(source)
+    assert dt_vec.get_quarter_name(values).tolist() == [dt_helper.get_quarter_name(value) for value in values]
+
+
+def test_start_of_hour_matches_scalar(timestamps: list):
+    expected = [dt_helper.to_start_of_hour(value) for value in timestamps]
+    assert dt_vec.to_start_of_hour(timestamps).astype(object).tolist() == expected
+
+
+@pytest.mark.parametrize('name', [
+    'to_start_of_month', 'to_end_of_month', 'to_begin_of_year', 'begin_of_current_quarter', 'to_start_of_hour'
+])
+def test_nat_stays_nat(name: str):
+    values = np.array(['1969-05-17', 'NaT', '2023-05-17'], dtype='M8[D]')
+    result = getattr(dt_vec, name)(values)
+    assert np.isnat(result).tolist() == [False, True, False]
+
+
+def test_nat_quarter_name():
+    values = np.array(['1969-05-17', 'NaT', '2023-11-17'], dtype='M8[D]')
+    assert dt_vec.get_quarter_name(values).tolist() == ['II', '', 'IV']
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+""" HSTORE PARSER AND SERIALIZER OF SQLHelper.
+"""
+__author__ = 'kokarev.nv'
+
+import io
+import copy
+import json
+import pickle
+from random import Random
+
+import pytest
+
+from py_datatools import SQLHelper
+
+NESTED_HSTORE = r'"a"=>"12", "b"=>"\"x\"=>\"5\""'
+# characters, that need escaping or look like the hstore syntax
+ALPHABET = 'ab Z9_"\\,=>\n\t\rNULé€'
+MALFORMED = [
+    '"a"=>', '"a"=>"b" "c"=>"d"', '"a"="b"', '"a=>"b"', '"a"=>"b",,"c"=>"d"', '=>"b"', '"a"=>"b', '"a"=>"b"x', '"a"',
+    'a b=>c', '"a"=>"b"=>"c"', ',"a"=>"b"', '"a\\"=>"b"'
+]
+
+
+def _random_text(rng: Random) -> str:
+    return ''.join(rng.choice(ALPHABET) for _ in range(rng.randrange(8)))
+
+
+def _random_pairs(rng: Random) -> dict:
+    return {
+        _random_text(rng): None if rng.random() < 0.2 else rng.choice([_random_text(rng), 'NULL', ''])
+        for _ in range(rng.randrange(6))
+    }
+
+
+def _reference_hstore(pairs: dict, rng: Random) -> str:
+    """ Independent serializer: every token is quoted, the separators have random whitespace. """
+    def quote(text: str) -> str:
+        return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+    def space() -> str:
+        return rng.choice(['', ' ', '  ', '\n', '\t '])
+
+    return space() + (space() + ',' + space()).join(
+        quote(key) + space() + '=>' + space() + ('NULL' if value is None else quote(value))
+        for key, value in pairs.items()
+    ) + space()
+
+
+def _copy_text_unescape(line: str) -> str:
+    return line.replace('\\n', '\n').replace('\\r', '\r').replace('\\t', '\t').replace('\\\\', '\\')
+
+
+def test_parse_matches_reference_serializer():
+    rng = Random(20230526)
+    for _ in range(2000):
+        pairs = _random_pairs(rng)
+        hstore = _reference_hstore(pairs, rng)
+        assert SQLHelper.hstore_to_dict(hstore) == pairs, hstore
+
+
+def test_bare_tokens_and_null():
+    assert SQLHelper.hstore_to_dict('a=>1, b => NULL,c=>null , "d"=>"NULL"') == {
+        'a': '1', 'b': None, 'c': None, 'd': 'NULL'
+    }
+    assert SQLHelper.hstore_to_dict('') == {} and SQLHelper.hstore_to_dict('  ') == {}
+    # the last of the repeated keys wins
+    assert SQLHelper.hstore_to_dict('"a"=>"1", "a"=>"2"') == {'a': '2'}
+
+
+@pytest.mark.parametrize('hstore', MALFORMED)
+def test_malformed(hstore: str):
+    assert SQLHelper._parse_hstore(hstore) is None
+    with pytest.raises(ValueError):
+        SQLHelper.hstore_to_dict(hstore)
+
+
+def test_round_trip():
+    rng = Random(20230525)
+    rows = [_random_pairs(rng) for _ in range(2000)]
+    hstores = SQLHelper.dicts_to_hstore_many(rows)
+    assert [SQLHelper.hstore_to_dict(hstore) for hstore in hstores] == rows
+    assert SQLHelper.hstore_to_dict_many(hstores + [None]) == rows + [{}]
+    assert SQLHelper.dict_to_hstore(None) is None
+    with pytest.raises(ValueError):
+        SQLHelper.dict_to_hstore({None: '1'})
+    # non-str keys and values are written by str()
+    assert SQLHelper.hstore_to_dict(SQLHelper.dict_to_hstore({1: 2.5, 'a': True})) == {'1': '2.5', 'a': 'True'}
+
+
+def test_copy_stream_round_trip():
+    rng = Random(20230524)
+    rows = [None if rng.random() < 0.1 else _random_pairs(rng) for _ in range(1000)]
+    buffer = io.StringIO()
+    assert SQLHelper.dicts_to_hstore_many(rows, buffer, chunk_size=7) == len(rows)
+    lines = buffer.getvalue().split('\n')
+    assert lines.pop() == ''
+    # COPY text escaping leaves no raw line breaks or tabs in a field
+    assert len(lines) == len(rows) and not any('\t' in line or '\r' in line for line in lines)
+    assert [None if line == '\\N' else SQLHelper.hstore_to_dict(_copy_text_unescape(line)) for line in lines] == rows
+
+
+def _random_nested(rng: Random, depth: int = 0) -> dict:
+    result = {}
+    for idx in range(rng.randrange(1, 5)):
+        kind = rng.randrange(4 if depth < 2 else 3)
+        if kind == 0:
+            value = str(rng.randrange(-1000, 1000))
+        elif kind == 1:
+            value = rng.choice(['text', 'a "quoted" \\ value', 'x=>y, z', ''])
+        elif kind == 2:
+            value = None
+        else:
+            value = _random_nested(rng, depth + 1)
+        result[f'key{idx}'] = value
+    return result
+
+
+@pytest.fixture(scope='module')
+def nested_hstores() -> list:
+    rng = Random(20230527)
+    return [NESTED_HSTORE] + [SQLHelper.dict_to_hstore(_random_nested(rng)) for _ in range(300)]
+
+
+def _decoded(pairs: dict) -> dict:
+    """ Expected result of hstore_to_dict_recursive: nested dicts, decimal strings as ints. """
+    return {
+        key: _decoded(value) if isinstance(value, dict) else int(value) if value and value.isdecimal() else value
+        for key, value in pairs.items()
+    }
+
+
+def test_recursive_round_trip():
+    rng = Random(20230523)
+    for _ in range(500):
+        nested = _random_nested(rng)
+        assert SQLHelper.hstore_to_dict_recursive(SQLHelper.dict_to_hstore(nested)) == _decoded(nested)
+
+
+def _update(lazy) -> dict:
+    result = {}
+    result.update(lazy)
+    return result
+
+
+@pytest.mark.parametrize('copy_lazy', [
+    dict, lambda lazy: {**lazy}, _update, lambda lazy: lazy | {}, lambda lazy: {} | lazy, lambda lazy: lazy.copy(),
+    lambda lazy: pickle.loads(pickle.dumps(lazy)), copy.deepcopy, lambda lazy: lazy.resolve()
+], ids=['dict', 'unpack', 'update', 'or', 'ror', 'copy', 'pickle', 'deepcopy', 'resolve'])
+def test_lazy_copies_match_eager(copy_lazy, nested_hstores: list):
+    for hstore in nested_hstores:
+        eager = SQLHelper.hstore_to_dict_recursive(hstore)
+        copied = copy_lazy(SQLHelper.hstore_to_dict_recursive(hstore, lazy=True))
+        assert copied == eager
+        assert eager == copied
+
+
+def test_lazy_fast_path_example():
+    lazy = SQLHelper.hstore_to_dict_recursive(NESTED_HSTORE, lazy=True)
+    assert dict(lazy) == {'a': 12, 'b': {'x': 5}}
+    assert json.dumps(lazy.resolve()) == '{"a": 12, "b": {"x": 5}}'
+
+
+def test_lazy_mapping_methods(nested_hstores: list):
+    for hstore in nested_hstores:
+        eager = SQLHelper.hstore_to_dict_recursive(hstore)
+        lazy = SQLHelper.hstore_to_dict_recursive(hstore, lazy=True)
+        assert len(lazy) == len(eager) and list(lazy) == list(eager)
+        assert list(lazy.values()) == list(eager.values())
+        assert list(lazy.items()) == list(eager.items())
+        assert all(lazy.get(key) == value for key, value in eager.items())
+        assert SQLHelper.dict_to_hstore(lazy) == SQLHelper.dict_to_hstore(eager)
+        key = next(iter(eager))
+        assert lazy.pop(key) == eager.pop(key)
+        lazy['new'] = eager['new'] = '"x"=>"1"'
+        assert lazy == eager and lazy['new'] == '"x"=>"1"'
+        lazy.clear()
+        assert lazy == {} and not lazy
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+""" OPT-IN INSTRUMENTATION: PATCHING, NESTED CALLS, THREADS AND THE PROMETHEUS FORMAT.
+"""
+__author__ = 'kokarev.nv'
+
+import re
+import threading
+from datetime import date
+
+import pytest
+
+import py_datatools
+from py_datatools import common, dt_helper, instrument
+from py_datatools import py_datatools as helpers
+
+SAMPLE_LINE = re.compile(r'^([a-z_]+)\{function="([a-zA-Z_.]+)"(?:,le="([^"]+)")?\} (\S+)$')
+
+
+@pytest.fixture
+def enabled():
+    instrument.reset()
+    instrument.enable()
+    try:
+        yield
+    finally:
+        instrument.disable()
+        instrument.reset()
+
+
+def _originals() -> dict:
+    return {
+        (owner, attr): vars(owner)[attr] for owner, attr, _ in instrument._targets()
+    }
+
+
+def test_enable_disable_restore_originals():
+    originals = _originals()
+    try_bool = py_datatools.try_bool
+    instrument.enable()
+    try:
+        assert instrument.is_enabled()
+        assert all(vars(owner)[attr] is not original for (owner, attr), original in originals.items())
+        assert py_datatools.try_bool is not try_bool and py_datatools.try_bool.__wrapped__ is try_bool
+        # the repeated call does nothing
+        patched = dict(vars(common))
+        instrument.enable()
+        assert dict(vars(common)) == patched
+    finally:
+        instrument.disable()
+    assert not instrument.is_enabled()
+    assert all(vars(owner)[attr] is original for (owner, attr), original in originals.items())
+    assert py_datatools.try_bool is try_bool
+    assert helpers.SQLHelper.dict_to_hstore({'a': '1'}) == '"a"=>"1"'
+
+
+def test_only_outermost_calls_are_counted(enabled):
+    py_datatools.try_bool('no')
+    dt_helper.to_start_of_month(date(2024, 5, 17))
+    common.try_true('yes')
+    stats = instrument.snapshot()
+    # try_bool calls try_true and try_false, to_start_of_month calls get_default_datebegin
+    assert {name: counters['calls'] for name, counters in stats.items()} == {
+        'common.try_bool': 1, 'common.try_true': 1, 'dt_helper.to_start_of_month': 1
+    }
+
+
+def test_generators_and_errors(enabled):
+    periods = list(dt_helper.iter_periods(date(2024, 1, 1), date(2024, 3, 31), 'month'))
+    assert len(periods) == 3
+    with pytest.raises(ValueError):
+        common.raise_if_cond(True, 'error', ValueError)
+    stats = instrument.snapshot()
+    assert stats['dt_helper.iter_periods']['calls'] == 1
+    assert (stats['common.raise_if_cond']['calls'], stats['common.raise_if_cond']['errors']) == (1, 1)
+
+
+def test_threads_are_merged(enabled):
+    def work():
+        for _ in range(10):
+            py_datatools.try_bool('true')
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    work()
+    stats = instrument.snapshot()
+    assert stats['common.try_bool']['calls'] == 90
+    assert sum(stats['common.try_bool']['latency_buckets'].values()) == 90
+    instrument.reset()
+    assert instrument.snapshot() == {}
+
+
+def test_prometheus_format(enabled, tmp_path):
+    for value in ('t', 'f', 'x'):
+        py_datatools.try_bool(value)
+    helpers.Collections.distinct(1, 2, 2, 3)
+    data = instrument.snapshot()
+    text = instrument.to_prometheus(data)
+    assert text.endswith('\n')
+
+    types = {}
+    samples = []
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, metric, kind = line.split(' ')
+            types[metric] = kind
+        elif not line.startswith('# HELP '):
+            match = SAMPLE_LINE.match(line)
+            assert match, line
+            samples.append(match.groups())
+    assert types == {
+        'py_datatools_calls_total': 'counter', 'py_datatools_errors_total': 'counter',
+        'py_datatools_call_duration_seconds': 'histogram', 'py_datatools_call_input_size': 'histogram'
+    }
+    values = {(metric, function, le): float(value) for metric, function, le, value in samples}
+    for name, stats in data.items():
+        assert values['py_datatools_calls_total', name, None] == stats['calls']
+        assert values['py_datatools_errors_total', name, None] == stats['errors']
+        assert values['py_datatools_call_duration_seconds_count', name, None] == stats['calls']
+        assert values['py_datatools_call_duration_seconds_bucket', name, '+Inf'] == stats['calls']
+        # the buckets are cumulative
+        buckets = [
+            value for (metric, function, le), value in values.items()
+            if metric == 'py_datatools_call_duration_seconds_bucket' and function == name and le != '+Inf'
+        ]
+        assert buckets == sorted(buckets) and buckets[-1] == stats['calls']
+    assert values['py_datatools_call_input_size_count', 'Collections.distinct', None] == 1
+
+    path = tmp_path / 'py_datatools.prom'
+    instrument.write_prometheus(str(path), data)
+    assert path.read_text() == text
+    assert [item.name for item in tmp_path.iterdir()] == ['py_datatools.prom']
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+""" PeriodAggregator MATCHES THE BRUTE FORCE SUMMARIES OF THE STREAM.
+"""
+__author__ = 'kokarev.nv'
+
+import tracemalloc
+from random import Random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from py_datatools import PeriodAggregator
+
+HOUR_TYPES = ('hour', 'day', 'week', 'month', 'quarter')
+
+
+def _brute_force(stream: list, date_begin: date, date_end: date) -> tuple:
+    values = [value for timestamp, value in stream if date_begin <= timestamp.date() <= date_end]
+    if not values:
+        return 0, None, None
+    return len(values), min(values), max(values)
+
+
+def _far_apart_stream(seed: int) -> list:
+    rng = Random(seed)
+    stream = [
+        (datetime(2024, 1, 1) + timedelta(minutes=rng.randrange(90 * 24 * 60)), float(rng.randrange(-1000, 1000)))
+        for _ in range(3000)
+    ]
+    # outliers decades away from the stream and from each other
+    for timestamp in (datetime(1970, 1, 1, 3), datetime(2099, 12, 31, 23), datetime(1999, 6, 15, 12)):
+        stream.insert(rng.randrange(len(stream)), (timestamp, float(rng.randrange(-1000, 1000))))
+    return stream
+
+
+RANGES = [
+    (date(1960, 1, 1), date(2100, 1, 1)), (date(1970, 1, 1), date(1970, 1, 1)), (date(1999, 1, 1), date(1999, 12, 31)),
+    (date(2024, 1, 5), date(2024, 2, 20)), (date(2024, 2, 1), date(2024, 2, 29)), (date(2099, 12, 31), date(2100, 1, 1))
+]
+
+
+def _check(aggregator: PeriodAggregator, stream: list):
+    for date_begin, date_end in RANGES:
+        summary = aggregator.query(date_begin, date_end)
+        assert (summary.count, summary.min, summary.max) == _brute_force(stream, date_begin, date_end)
+    for timestamp, _ in stream[::97]:
+        summary = aggregator.bucket(timestamp.date(), 'day')
+        assert summary.count == _brute_force(stream, timestamp.date(), timestamp.date())[0]
+
+
+def test_far_apart_keys():
+    stream = _far_apart_stream(20240105)
+    tracemalloc.start()
+    try:
+        aggregator = PeriodAggregator(HOUR_TYPES).update(*zip(*stream))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # the dense arrays cover the 90 days of the stream only, not the ~1.1M hours between the outliers
+    assert peak < 2 * 1024 * 1024
+    assert len(aggregator.buckets['hour'].counts) <= 90 * 24 + 1
+    _check(aggregator, stream)
+
+
+def test_far_apart_keys_numpy():
+    np = pytest.importorskip('numpy')
+    stream = _far_apart_stream(20240106)
+    timestamps = np.array([timestamp for timestamp, _ in stream], dtype='M8[us]')
+    values = np.array([value for _, value in stream])
+    aggregator = PeriodAggregator(HOUR_TYPES).update(timestamps, values)
+    assert len(aggregator.buckets['hour'].counts) <= 90 * 24 + 1
+    _check(aggregator, stream)
+
+
+def test_eviction_drops_sparse_periods():
+    stream = _far_apart_stream(20240107)
+    # the latest timestamp is the outlier of 2099, the retention window drops the rest of the stream
+    aggregator = PeriodAggregator(HOUR_TYPES, retention=timedelta(days=30)).update(*zip(*stream))
+    assert aggregator.query(date(1960, 1, 1), date(2099, 11, 1)).count == 0
+    assert aggregator.query(date(2099, 12, 1), date(2099, 12, 31)).count == 1
+    assert all(key >= date(2099, 11, 1).toordinal() for key in aggregator.buckets['day'].sparse)
+
+
+PERIOD_TYPES = ('hour', 'day', 'week', 'month', 'quarter', 'halfyear', 'year')
+PERIOD_MONTHS = {'month': 1, 'quarter': 3, 'halfyear': 6, 'year': 12}
+
+
+def _period_start(timestamp: datetime, period_type: str):
+    if period_type == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    day = timestamp.date()
+    if period_type == 'day':
+        return day
+    if period_type == 'week':
+        return day - timedelta(days=day.weekday())
+    months = PERIOD_MONTHS[period_type]
+    return date(day.year, (day.month - 1) // months * months + 1, 1)
+
+
+def _brute_force_summary(values: list) -> tuple:
+    if not values:
+        return 0, 0.0, None, None
+    return len(values), sum(values), min(values), max(values)
+
+
+def _assert_summary(summary, expected: tuple):
+    assert (summary.count, summary.min, summary.max) == (expected[0], expected[2], expected[3])
+    assert summary.sum == pytest.approx(expected[1])
+
+
+def _random_stream(rng: Random, qty: int) -> list:
+    first = datetime(rng.randrange(1960, 2090), rng.randrange(1, 13), 1)
+    return [
+        (first + timedelta(minutes=rng.randrange(rng.choice([3, 60, 400]) * 24 * 60)), rng.randrange(-1000, 1000) / 8)
+        for _ in range(qty)
+    ]
+
+
+def _random_queries(rng: Random, stream: list) -> list:
+    first = min(timestamp for timestamp, _ in stream).date() if stream else date(2024, 1, 1)
+    queries = []
+    for _ in range(40):
+        begin = first + timedelta(days=rng.randrange(-40, 420))
+        queries.append((begin, begin + timedelta(days=rng.choice([0, rng.randrange(40), rng.randrange(-3, 500)]))))
+    return queries
+
+
+def test_random_stream_matches_brute_force():
+    rng = Random(20240108)
+    for qty in (0, 1, 2, 50, 1500):
+        stream = _random_stream(rng, qty)
+        # chunks of the stream are consumed into the same buckets
+        aggregator = PeriodAggregator(PERIOD_TYPES)
+        for idx in range(0, qty, 61):
+            aggregator.update(*zip(*stream[idx:idx + 61]))
+        for date_begin, date_end in _random_queries(rng, stream):
+            _assert_summary(aggregator.query(date_begin, date_end), _brute_force_summary(
+                [value for timestamp, value in stream if date_begin <= timestamp.date() <= date_end]
+            ))
+        for timestamp, _ in stream[::13]:
+            for period_type in PERIOD_TYPES:
+                moment = timestamp if period_type == 'hour' else timestamp.date()
+                start = _period_start(timestamp, period_type)
+                _assert_summary(aggregator.bucket(moment, period_type), _brute_force_summary([
+                    value for other, value in stream if _period_start(other, period_type) == start
+                ]))
+
+
+def test_random_stream_numpy():
+    np = pytest.importorskip('numpy')
+    rng = Random(20240109)
+    for qty in (1, 50, 1500):
+        stream = _random_stream(rng, qty)
+        timestamps = np.array([timestamp for timestamp, _ in stream] + [None], dtype='M8[us]')
+        values = np.array([value for _, value in stream] + [1.0])
+        # NaT is skipped, the arrays and the lists are consumed into the same buckets
+        aggregator = PeriodAggregator(PERIOD_TYPES).update(timestamps[:qty // 2], values[:qty // 2])
+        aggregator.update(timestamps[qty // 2:], values[qty // 2:])
+        expected = PeriodAggregator(PERIOD_TYPES).update(*zip(*stream))
+        assert aggregator.latest == expected.latest
+        for date_begin, date_end in _random_queries(rng, stream):
+            _assert_summary(aggregator.query(date_begin, date_end), tuple(expected.query(date_begin, date_end)))
+        for timestamp, _ in stream[::13]:
+            for period_type in PERIOD_TYPES:
+                moment = timestamp if period_type == 'hour' else timestamp.date()
+                _assert_summary(aggregator.bucket(moment, period_type), tuple(expected.bucket(moment, period_type)))
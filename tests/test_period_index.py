@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+""" PeriodIndex MATCHES THE LINEAR SCAN OF THE PERIODS.
+"""
+__author__ = 'kokarev.nv'
+
+from random import Random
+from datetime import date, timedelta
+
+from py_datatools import PeriodIndex
+
+FIRST_DATE = date(2000, 1, 1)
+DAYS_QTY = 3000
+
+
+def _random_day(rng: Random) -> date:
+    return FIRST_DATE + timedelta(days=rng.randrange(-100, DAYS_QTY + 100))
+
+
+def _random_period(rng: Random) -> tuple:
+    begin = _random_day(rng)
+    end = begin + timedelta(days=rng.choice([0, rng.randrange(10), rng.randrange(400), rng.randrange(-5, 0)]))
+    if rng.random() < 0.05:
+        begin = None
+    if rng.random() < 0.05:
+        end = rng.choice([None, 'infinity'])
+    if rng.random() < 0.05 and begin is not None:
+        begin = begin.isoformat()
+    return begin, end
+
+
+def _bounds(begin, end) -> tuple:
+    begin = date.min if begin is None else date.fromisoformat(begin) if isinstance(begin, str) else begin
+    return begin, date(9999, 12, 31) if end in (None, 'infinity') else end
+
+
+def _linear_overlap(periods: list, begin: date, end: date) -> list:
+    return [
+        period_id for period_id, (period_begin, period_end) in enumerate(map(lambda period: _bounds(*period), periods))
+        if period_begin <= end and begin <= period_end
+    ]
+
+
+def test_period_index_matches_linear_scan():
+    rng = Random(20230619)
+    for periods_qty in [0, 1, 2, 3, 7, 8, 9, 15, 16, 17, 100, 1000, 3000]:
+        periods = [_random_period(rng) for _ in range(periods_qty)]
+        index = PeriodIndex(periods)
+        assert len(index) == periods_qty
+        assert [index.period(period_id) for period_id in range(periods_qty)] == [_bounds(*period) for period in periods]
+        days = [_random_day(rng) for _ in range(200)] + [date.min, date(9999, 12, 31)]
+        for day in days:
+            assert sorted(index.contains(day)) == _linear_overlap(periods, day, day)
+        for _ in range(200):
+            begin = _random_day(rng)
+            end = begin + timedelta(days=rng.randrange(-3, 300))
+            assert sorted(index.overlap(begin, end)) == _linear_overlap(periods, begin, end)
+        assert [sorted(ids) for ids in index.contains_many(days)] == [
+            _linear_overlap(periods, day, day) for day in days
+        ]
+        assert sorted(index.contains(FIRST_DATE.isoformat())) == _linear_overlap(periods, FIRST_DATE, FIRST_DATE)
+
+
+def test_added_periods():
+    rng = Random(20230620)
+    periods = [_random_period(rng) for _ in range(500)]
+    index = PeriodIndex(periods[:100])
+    # the buffer of added periods is merged into the tree, when it grows
+    for period_id, period in enumerate(periods[100:], 100):
+        assert index.add(*period) == period_id
+        if period_id % 37 == 0:
+            day = _random_day(rng)
+            assert sorted(index.contains(day)) == _linear_overlap(periods[:period_id + 1], day, day)
+    assert len(index) == len(periods)
+    for _ in range(300):
+        begin = _random_day(rng)
+        end = begin + timedelta(days=rng.randrange(100))
+        assert sorted(index.overlap(begin, end)) == _linear_overlap(periods, begin, end)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+""" PERIOD-OVER-PERIOD ALIGNMENT MATCHES THE BRUTE FORCE SEARCH.
+"""
+__author__ = 'kokarev.nv'
+
+from random import Random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from py_datatools import align_prior_period, prior_period_dates
+
+PERIOD_MONTHS = {'month': 1, 'quarter': 3, 'halfyear': 6, 'year': 12}
+
+
+def _brute_force_prior(value: date, period_type: str) -> date:
+    """ The same day of the month months earlier, walking back by months, or the last day of a shorter month. """
+    month_start = value.replace(day=1)
+    for _ in range(PERIOD_MONTHS[period_type]):
+        month_start = (month_start - timedelta(days=1)).replace(day=1)
+    day = value.day
+    while True:
+        try:
+            return month_start.replace(day=day)
+        except ValueError:
+            day -= 1
+
+
+def _brute_force_align(dates: list, prior_dates: list, period_type: str) -> list:
+    targets = [_brute_force_prior(value, period_type) for value in dates]
+    return [next((idx for idx, prior_date in enumerate(prior_dates) if prior_date == target), -1) for target in targets]
+
+
+def _random_series(rng: Random, qty: int, with_time: bool) -> list:
+    first = date(rng.randrange(1950, 2100), rng.randrange(1, 13), 1)
+    days = [first + timedelta(days=rng.randrange(800)) for _ in range(qty)]
+    # month ends are clamped
+    days += [(day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1) for day in days[:qty // 5]]
+    if not with_time:
+        return days
+    return [datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.randrange(2)) for day in days]
+
+
+@pytest.mark.parametrize('period_type', list(PERIOD_MONTHS))
+def test_prior_period_dates(period_type: str):
+    rng = Random(20230623)
+    for with_time in (False, True):
+        values = _random_series(rng, 2000, with_time)
+        assert prior_period_dates(values, period_type) == [_brute_force_prior(value, period_type) for value in values]
+
+
+@pytest.mark.parametrize('period_type', list(PERIOD_MONTHS))
+def test_align_prior_period(period_type: str):
+    rng = Random(20230624)
+    for qty in (0, 1, 50, 400):
+        for with_time in (False, True):
+            values = _random_series(rng, qty, with_time)
+            assert align_prior_period(values, period_type=period_type) == _brute_force_align(
+                values, values, period_type
+            )
+            prior_values = _random_series(rng, qty, with_time)
+            assert align_prior_period(values, prior_values, period_type) == _brute_force_align(
+                values, prior_values, period_type
+            )
+
+
+@pytest.mark.parametrize('period_type', list(PERIOD_MONTHS))
+def test_align_prior_period_numpy(period_type: str):
+    np = pytest.importorskip('numpy')
+    rng = Random(20230625)
+    for qty in (0, 1, 50, 400):
+        for with_time, unit in ((False, 'M8[D]'), (True, 'M8[s]')):
+            values = _random_series(rng, qty, with_time)
+            prior_values = values[::-1] + _random_series(rng, qty, with_time)
+            array = np.array(values, dtype=unit)
+            assert prior_period_dates(array, period_type).tolist() == [
+                _brute_force_prior(value, period_type) for value in values
+            ]
+            expected = _brute_force_align(values, prior_values, period_type)
+            assert align_prior_period(array, np.array(prior_values, dtype=unit), period_type).tolist() == expected
+            # the units of the arrays differ
+            assert align_prior_period(array, np.array(prior_values, dtype='M8[us]'), period_type).tolist() == expected
+    assert prior_period_dates(np.array(['NaT'], dtype='M8[D]'), 'month').tolist() == [None]
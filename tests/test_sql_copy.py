@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+""" COPY TEXT AND BINARY ENCODERS OF CopyWriter, TypeInferrer.
+"""
+__author__ = 'kokarev.nv'
+
+import io
+import json
+import math
+from uuid import UUID
+from random import Random
+from decimal import Decimal, localcontext
+from struct import unpack, unpack_from
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytest
+
+from py_datatools import CopyWriter, SQLHelper, TypeInferrer
+
+PgSqlType = SQLHelper.PgSqlType
+PG_EPOCH = datetime(2000, 1, 1)
+TEXT_ALPHABET = 'ab Z9_"\\,=>\n\t\rNé€\'{}'
+
+
+def _random_text(rng: Random) -> str:
+    return ''.join(rng.choice(TEXT_ALPHABET) for _ in range(rng.randrange(10)))
+
+
+def _random_datetime(rng: Random) -> datetime:
+    return datetime(1900, 1, 1) + timedelta(microseconds=rng.randrange(200 * 365 * 86400 * 10 ** 6))
+
+
+def _random_zone(rng: Random) -> timezone:
+    return timezone(timedelta(minutes=rng.randrange(-14 * 60, 14 * 60 + 1, 15)))
+
+
+def _random_decimal(rng: Random) -> Decimal:
+    special = rng.random()
+    if special < 0.05:
+        return Decimal(rng.choice(['NaN', 'Infinity', '-Infinity']))
+    return Decimal(rng.randrange(-10 ** rng.randrange(1, 30), 10 ** rng.randrange(1, 30))).scaleb(rng.randrange(-20, 8))
+
+
+# python values of the columns
+GENERATORS = {
+    'smallint': lambda rng: rng.randrange(-2 ** 15, 2 ** 15),
+    'int': lambda rng: rng.randrange(-2 ** 31, 2 ** 31),
+    'bigint': lambda rng: rng.randrange(-2 ** 63, 2 ** 63),
+    'numeric': _random_decimal,
+    # multiples of 1/8 are exact in real
+    'real': lambda rng: rng.randrange(-10 ** 5, 10 ** 5) / 8,
+    'double precision': lambda rng: rng.choice([rng.uniform(-1e300, 1e300), rng.random(), math.inf, -math.inf]),
+    'text': _random_text,
+    'timestamp': _random_datetime,
+    'timestamptz': lambda rng: _random_datetime(rng).replace(tzinfo=_random_zone(rng)),
+    'date': lambda rng: _random_datetime(rng).date(),
+    'time': lambda rng: _random_datetime(rng).time(),
+    'timetz': lambda rng: _random_datetime(rng).time().replace(tzinfo=_random_zone(rng)),
+    'interval': lambda rng: timedelta(microseconds=rng.randrange(-10 ** 16, 10 ** 16)),
+    'boolean': lambda rng: rng.random() < 0.5,
+    'uuid': lambda rng: UUID(int=rng.getrandbits(128)),
+    'json': lambda rng: {_random_text(rng): [rng.randrange(100), _random_text(rng), None]},
+    'jsonb': lambda rng: [_random_text(rng), {'a': rng.random() < 0.5}],
+    'hstore': lambda rng: {_random_text(rng): rng.choice([None, _random_text(rng)]) for _ in range(rng.randrange(4))},
+}
+
+
+def _random_rows(rng: Random, types: list, rows_qty: int) -> list:
+    return [
+        [None if rng.random() < 0.1 else GENERATORS[pg_type](rng) for pg_type in types] for _ in range(rows_qty)
+    ]
+
+
+def _copy_text_unescape(field: str) -> str:
+    """ Char by char unescaping of a COPY text field. """
+    result = []
+    chars = iter(field)
+    for char in chars:
+        if char == '\\':
+            char = next(chars)
+            char = {'n': '\n', 'r': '\r', 't': '\t'}.get(char, char)
+        result.append(char)
+    return ''.join(result)
+
+
+def _parse_interval(text: str) -> timedelta:
+    days, _, seconds, _ = text.split(' ')
+    seconds, microseconds = seconds.split('.')
+    return timedelta(days=int(days), seconds=int(seconds), microseconds=int(microseconds))
+
+
+TEXT_PARSERS = {
+    'smallint': int,
+    'int': int,
+    'bigint': int,
+    'numeric': Decimal,
+    'real': float,
+    'double precision': float,
+    'text': str,
+    'timestamp': datetime.fromisoformat,
+    'timestamptz': datetime.fromisoformat,
+    'date': date.fromisoformat,
+    'time': time.fromisoformat,
+    'timetz': time.fromisoformat,
+    'interval': _parse_interval,
+    'boolean': {'t': True, 'f': False}.__getitem__,
+    'uuid': UUID,
+    'json': json.loads,
+    'jsonb': json.loads,
+    'hstore': SQLHelper.hstore_to_dict,
+}
+
+
+def _decode_text(data: str, types: list) -> list:
+    lines = data.split('\n')
+    assert lines.pop() == ''
+    rows = []
+    for line in lines:
+        fields = line.split('\t')
+        assert len(fields) == len(types)
+        rows.append([
+            None if field == '\\N' else TEXT_PARSERS[pg_type](_copy_text_unescape(field))
+            for pg_type, field in zip(types, fields)
+        ])
+    return rows
+
+
+def _decode_numeric(data: bytes) -> Decimal:
+    ndigits, weight, sign, dscale = unpack_from('!hhHh', data)
+    assert len(data) == 8 + 2 * ndigits
+    if sign in (0xC000, 0xD000, 0xF000):
+        return Decimal({0xC000: 'NaN', 0xD000: 'Infinity', 0xF000: '-Infinity'}[sign])
+    digits = unpack_from(f'!{ndigits}h', data, 8)
+    assert all(0 <= digit < 10000 for digit in digits) and (not digits or digits[0] and digits[-1])
+    with localcontext() as context:
+        context.prec = 100
+        value = sum(Decimal(digit).scaleb(4 * (weight - idx)) for idx, digit in enumerate(digits))
+        return (-value if sign == 0x4000 else value).quantize(Decimal(1).scaleb(-dscale))
+
+
+def _decode_time(data: bytes) -> time:
+    microseconds, *offset = unpack('!qi' if len(data) == 12 else '!q', data)
+    value = (datetime.min + timedelta(microseconds=microseconds)).time()
+    return value.replace(tzinfo=timezone(timedelta(seconds=-offset[0]))) if offset else value
+
+
+def _decode_interval(data: bytes) -> timedelta:
+    microseconds, days, months = unpack('!qii', data)
+    assert months == 0
+    return timedelta(days=days, microseconds=microseconds)
+
+
+def _decode_hstore(data: bytes) -> dict:
+    (pairs_qty,), pos, result = unpack_from('!i', data), 4, {}
+    for _ in range(pairs_qty):
+        items = []
+        for _ in range(2):
+            (size,) = unpack_from('!i', data, pos)
+            pos += 4
+            items.append(None if size == -1 else data[pos:pos + size].decode())
+            pos += max(size, 0)
+        result[items[0]] = items[1]
+    assert pos == len(data)
+    return result
+
+
+def _decode_jsonb(data: bytes):
+    assert data[:1] == b'\x01'
+    return json.loads(data[1:].decode())
+
+
+BINARY_DECODERS = {
+    'smallint': lambda data: unpack('!h', data)[0],
+    'int': lambda data: unpack('!i', data)[0],
+    'bigint': lambda data: unpack('!q', data)[0],
+    'numeric': _decode_numeric,
+    'real': lambda data: unpack('!f', data)[0],
+    'double precision': lambda data: unpack('!d', data)[0],
+    'text': bytes.decode,
+    'timestamp': lambda data: PG_EPOCH + timedelta(microseconds=unpack('!q', data)[0]),
+    'timestamptz': lambda data: (PG_EPOCH + timedelta(microseconds=unpack('!q', data)[0])).replace(
+        tzinfo=timezone.utc
+    ),
+    'date': lambda data: PG_EPOCH.date() + timedelta(days=unpack('!i', data)[0]),
+    'time': _decode_time,
+    'timetz': _decode_time,
+    'interval': _decode_interval,
+    'boolean': {b'\x01': True, b'\x00': False}.__getitem__,
+    'uuid': lambda data: UUID(bytes=data),
+    'json': lambda data: json.loads(data.decode()),
+    'jsonb': _decode_jsonb,
+    'hstore': _decode_hstore,
+}
+
+
+def _decode_binary(data: bytes, types: list) -> list:
+    assert data[:11] == b'PGCOPY\n\xff\r\n\x00'
+    flags, extension = unpack_from('!ii', data, 11)
+    assert flags == 0
+    pos = 19 + extension
+    rows = []
+    while True:
+        (fields_qty,) = unpack_from('!h', data, pos)
+        pos += 2
+        if fields_qty == -1:
+            assert pos == len(data)
+            return rows
+        assert fields_qty == len(types)
+        row = []
+        for pg_type in types:
+            (size,) = unpack_from('!i', data, pos)
+            pos += 4
+            row.append(None if size == -1 else BINARY_DECODERS[pg_type](data[pos:pos + size]))
+            pos += max(size, 0)
+        rows.append(row)
+
+
+def _same(pg_type: str, expected, actual, binary: bool) -> bool:
+    if expected is None or actual is None:
+        return expected is actual
+    if pg_type == 'numeric':
+        if not expected.is_finite():
+            return str(actual) == str(expected)
+        # the text is kept as is, the binary format keeps the display scale and writes positive exponents as integers
+        exponent = expected.as_tuple().exponent
+        return actual == expected and actual.as_tuple().exponent == (min(0, exponent) if binary else exponent)
+    if pg_type in ('time', 'timetz'):
+        return actual == expected and actual.utcoffset() == expected.utcoffset()
+    return actual == expected and type(actual) is type(expected)
+
+
+@pytest.mark.parametrize('binary', [False, True], ids=['text', 'binary'])
+def test_encoders_round_trip(binary: bool):
+    rng = Random(20230530 + binary)
+    types = list(GENERATORS)
+    rows = _random_rows(rng, types, 3000)
+    buffer = io.BytesIO() if binary else io.StringIO()
+    with CopyWriter([(f'c{idx}', pg_type) for idx, pg_type in enumerate(types)], buffer, binary, 17) as writer:
+        assert writer.write_rows(rows[:1000]) == 1000
+        for row in rows[1000:]:
+            writer.write_row(row)
+    assert writer.rows_qty == len(rows)
+    data = buffer.getvalue()
+    decoded = _decode_binary(data, types) if binary else _decode_text(data, types)
+    assert len(decoded) == len(rows)
+    for row, decoded_row in zip(rows, decoded):
+        for pg_type, expected, actual in zip(types, row, decoded_row):
+            assert _same(pg_type, expected, actual, binary), (pg_type, expected, actual)
+
+
+@pytest.mark.parametrize('binary', [False, True], ids=['text', 'binary'])
+def test_chunks_and_dict_rows(binary: bool):
+    rng = Random(20230531)
+    columns = [('id', 'bigint'), ('name', 'text'), ('day', 'date')]
+    rows = _random_rows(rng, [pg_type for _, pg_type in columns], 500)
+    outputs = []
+    for chunk_size in (1, 7, 1000):
+        buffer = io.BytesIO()
+        with CopyWriter(columns, buffer, binary, chunk_size, encoding=None if binary else 'utf-8') as writer:
+            writer.write_rows(rows[::2])
+            writer.write_rows(dict(zip(('day', 'name', 'id'), row[::-1])) for row in rows[1::2])
+        outputs.append(buffer.getvalue())
+    assert outputs[0] == outputs[1] == outputs[2]
+    with pytest.raises(ValueError):
+        CopyWriter(columns, io.StringIO()).write_row([1, 'a'])
+
+
+@pytest.mark.parametrize('pg_type', ['smallint', 'int', 'bigint'])
+@pytest.mark.parametrize('value', [
+    '1 ', ' 1', '1_000', '\uff11', '1\n', '', '1.0', '1e3', '+-1', 1.5, Decimal('1.5'), Decimal('NaN')
+])
+def test_int_rejects(pg_type: str, value):
+    for binary in (False, True):
+        with pytest.raises(ValueError):
+            CopyWriter([('a', pg_type)], io.BytesIO(), binary).write_row([value])
+
+
+@pytest.mark.parametrize('value, text', [
+    ('+5', '5'), ('-0', '0'), ('007', '7'), (5.0, '5'), (Decimal('5'), '5'), (Decimal('5E+1'), '50'), (True, '1')
+])
+def test_int_accepts(value, text: str):
+    buffer = io.StringIO()
+    CopyWriter([('a', 'int')], buffer, chunk_size=1).write_row([value])
+    assert buffer.getvalue() == text + '\n'
+
+
+@pytest.mark.parametrize('value', ['1 ', '1_0', 'abc', '1\t', '\\N', '1,5', 'Infinity1', '1e', '.'])
+def test_float_rejects(value: str):
+    for pg_type in ('numeric', 'real', 'double precision'):
+        with pytest.raises(ValueError):
+            CopyWriter([('a', pg_type)], io.StringIO()).write_row([value])
+
+
+@pytest.mark.parametrize('value, text', [
+    ('nan', 'NaN'), ('-inf', '-Infinity'), ('Infinity', 'Infinity'), ('1e5', '1e5'), ('.5', '.5'), ('-1.', '-1.'),
+    (float('nan'), 'NaN'), (1e-7, '1e-07'), (Decimal('1.50'), '1.50')
+])
+def test_float_accepts(value, text: str):
+    buffer = io.StringIO()
+    CopyWriter([('a', 'numeric')], buffer, chunk_size=1).write_row([value])
+    assert buffer.getvalue() == text + '\n'
+
+
+def test_auto_and_bool_columns():
+    buffer = io.StringIO()
+    with CopyWriter([('a', ''), ('b', 'boolean')], buffer) as writer:
+        writer.write_rows([[True, 'Yes'], [5, 'f'], [2.5, 0], ['x\ty', None], [{'k': 'v'}, 'TRUE']])
+    assert buffer.getvalue() == 't\tt\n5\tf\n2.5\tf\nx\\ty\t\\N\n{"k":"v"}\tt\n'
+    with pytest.raises(ValueError):
+        CopyWriter([('b', 'boolean')], io.StringIO()).write_row(['maybe'])
+    with pytest.raises(ValueError):
+        CopyWriter([('a', '')], io.BytesIO(), binary=True).write_row([1])
+
+
+def test_copy_statement_quotes_identifiers():
+    writer = CopyWriter([('Id', 'int'), ('a"b', 'text'), ('order items', 'text')], io.StringIO())
+    assert writer.copy_statement('Sales.Order Items') == (
+        'COPY "Sales"."Order Items" ("Id", "a""b", "order items") FROM STDIN WITH (FORMAT text)'
+    )
+    assert CopyWriter([('x', 'int')], io.BytesIO(), binary=True).copy_statement('t;drop table t') == (
+        'COPY "t;drop table t" ("x") FROM STDIN WITH (FORMAT binary)'
+    )
+
+
+INT_TYPES = (
+    (PgSqlType.SMALLINT, -2 ** 15, 2 ** 15 - 1),
+    (PgSqlType.INTEGER, -2 ** 31, 2 ** 31 - 1),
+    (PgSqlType.BIGINT, -2 ** 63, 2 ** 63 - 1),
+)
+
+
+def _label(kinds: str, int_value: int = None, has_float: bool = False, has_tz: bool = False) -> tuple:
+    return frozenset(kinds.split()), int_value, has_float, has_tz
+
+
+def _random_int(rng: Random) -> int:
+    return rng.choice([-1, 1]) * rng.randrange(2 ** rng.randrange(1, 70))
+
+
+def _random_date_text(rng: Random) -> str:
+    return _random_datetime(rng).date().isoformat()
+
+
+def _random_timestamp_text(rng: Random) -> tuple:
+    text = _random_datetime(rng).isoformat(rng.choice(' T'), rng.choice(['minutes', 'seconds', 'microseconds']))
+    zone = rng.choice(['', 'Z', '+03', '-0530', '+05:45'])
+    return text + zone, bool(zone)
+
+
+def _value_int_text(rng: Random) -> tuple:
+    value = rng.randrange(-10 ** 20, 10 ** 20) if rng.random() < 0.5 else rng.randrange(2)
+    text = rng.choice(['', '+']) * (value >= 0) + str(value)
+    if rng.random() < 0.2 and value >= 0:
+        text = '0' + text.lstrip('+')
+    return text, _label('int numeric' + ' bool' * (text in ('0', '1')), int(text))
+
+
+def _value_timestamp_text(rng: Random) -> tuple:
+    text, has_tz = _random_timestamp_text(rng)
+    return text, _label('timestamp', has_tz=has_tz)
+
+
+# every generator returns a value and the candidate types, that fit the value: (kinds, int value, float, zone)
+VALUES = {
+    'bool': lambda rng: (rng.random() < 0.5, _label('bool')),
+    'int': lambda rng: (lambda value: (value, _label('int float numeric', value)))(_random_int(rng)),
+    'int_float': lambda rng: (lambda value: (float(value), _label('int float numeric', value, True)))(
+        rng.randrange(-10 ** 6, 10 ** 6)
+    ),
+    'float': lambda rng: (rng.choice([math.inf, rng.randrange(-10 ** 6, 10 ** 6) + 0.5]), _label(
+        'float numeric', has_float=True
+    )),
+    'decimal': lambda rng: (Decimal(rng.randrange(-10 ** 6, 10 ** 6)).scaleb(-2), _label('numeric')),
+    'int_text': _value_int_text,
+    'numeric_text': lambda rng: (rng.choice(['1.5', '.5', '-2.', '1e3', '+7.25E-2', '00.0']), _label('numeric')),
+    'bool_text': lambda rng: (rng.choice(['Yes', 'f', 'TRUE', 'n', 'false', 'Y']), _label('bool')),
+    'date': lambda rng: (_random_datetime(rng).date(), _label('date timestamp')),
+    'datetime': lambda rng: (_random_datetime(rng), _label('timestamp')),
+    'aware_datetime': lambda rng: (
+        _random_datetime(rng).replace(tzinfo=_random_zone(rng)), _label('timestamp', has_tz=True)
+    ),
+    'date_text': lambda rng: (_random_date_text(rng), _label('date timestamp')),
+    'timestamp_text': _value_timestamp_text,
+    'interval': lambda rng: (timedelta(seconds=rng.randrange(-10 ** 9, 10 ** 9)), _label('interval')),
+    'bad_text': lambda rng: (rng.choice([
+        '2023-02-29', '2024-13-01', '2024-1-05', '2024-01-05 24:00', '2024-01-05 10:0', '1 ', '1_0', '\uff11', 'abc',
+        'NaN', 'Infinity', '2024-01-05T10:00+3', 'yes please'
+    ]), _label('')),
+    'uuid': lambda rng: (UUID(int=rng.getrandbits(128)), _label('')),
+    'null': lambda rng: (rng.choice([None, '', math.nan]), None),
+}
+
+
+def _expected_type(labels: list) -> PgSqlType:
+    """ The narrowest type, that fits every value by itself. """
+    labels = [label for label in labels if label is not None]
+    if not labels:
+        return PgSqlType.TEXT
+    alive = frozenset.intersection(*[kinds for kinds, _, _, _ in labels])
+    if 'int' in alive:
+        ints = [int_value for _, int_value, _, _ in labels]
+        for pg_type, low, high in INT_TYPES:
+            if low <= min(ints) and max(ints) <= high:
+                return pg_type
+    if 'float' in alive and any(has_float for _, _, has_float, _ in labels):
+        return PgSqlType.DOUBLE_PRECISION
+    for kind, pg_type in (('numeric', PgSqlType.NUMERIC), ('bool', PgSqlType.BOOLEAN), ('date', PgSqlType.DATE)):
+        if kind in alive:
+            return pg_type
+    if 'timestamp' in alive:
+        return PgSqlType.TIMESTAMP_TZ if any(has_tz for _, _, _, has_tz in labels) else PgSqlType.TIMESTAMP
+    return PgSqlType.INTERVAL if 'interval' in alive else PgSqlType.TEXT
+
+
+def _random_column(rng: Random) -> tuple:
+    kinds = rng.sample(sorted(VALUES), rng.choice([1, 1, 2, 2, 3]))
+    if rng.random() < 0.5:
+        kinds.append('null')
+    values = [VALUES[rng.choice(kinds)](rng) for _ in range(rng.randrange(1, 40))]
+    return [value for value, _ in values], _expected_type([label for _, label in values])
+
+
+def test_type_inferrer_matches_brute_force():
+    rng = Random(20230601)
+    results = set()
+    for _ in range(3000):
+        values, expected = _random_column(rng)
+        inferrer = TypeInferrer()
+        bounds = sorted(rng.sample(range(len(values) + 1), min(3, len(values) + 1)))
+        for begin, end in zip([0] + bounds, bounds + [len(values)]):
+            inferrer.update(values[begin:end])
+        assert inferrer.pg_type == expected, values
+        assert SQLHelper.infer_pg_type(values, chunk_size=rng.randrange(1, 50)) == expected, values
+        assert SQLHelper.infer_pg_type(iter(values)) == expected, values
+        results.add(expected)
+    # the random columns cover every inferred type
+    assert len(results) == 11
+
+
+def test_type_inferrer_numpy_matches_lists():
+    np = pytest.importorskip('numpy')
+    dtypes = {
+        'int': 'i8', 'int_float': 'f8', 'float': 'f8', 'datetime': 'M8[us]', 'date': 'M8[D]', 'interval': 'm8[us]'
+    }
+    rng = Random(20230602)
+    for _ in range(300):
+        kind = rng.choice(['bool'] + list(dtypes))
+        values = [VALUES[kind](rng)[0] for _ in range(rng.randrange(1, 30))]
+        if kind == 'int':
+            values = [value >> 2 for value in values if abs(value) < 2 ** 65]
+        elif kind != 'bool' and rng.random() < 0.5:
+            # NaN and NaT are nulls
+            values.insert(rng.randrange(len(values) + 1), None)
+        array = np.array(values, dtype=dtypes.get(kind, bool))
+        assert SQLHelper.infer_pg_type(array, chunk_size=rng.randrange(1, 10)) == SQLHelper.infer_pg_type(values)
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+""" STATEMENT BUILDERS AND PAGED LOGGING OF SQLHelper.
+"""
+__author__ = 'kokarev.nv'
+
+import re
+import logging
+from random import Random
+
+import pytest
+
+from py_datatools import SQLHelper
+
+PLACEHOLDER = {'format': r'%s', 'qmark': r'\?', 'numeric': r'\$(\d+)'}
+UNICODE_ALPHABET = "ab '\"NUL,é€😀"
+
+
+class _Records(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord):
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('py_datatools.tests.statements')
+    logger.setLevel(logging.DEBUG)
+    handler = _Records()
+    logger.addHandler(handler)
+    try:
+        yield logger, handler.messages
+    finally:
+        logger.removeHandler(handler)
+
+
+def _marks(statement: str, paramstyle: str) -> list:
+    return re.findall(PLACEHOLDER[paramstyle], statement)
+
+
+def _min_statements(rows_qty: int, buckets: tuple) -> list:
+    """ Brute force minimal number of statements for every number of rows up to rows_qty. """
+    best = [0] + [rows_qty + 1] * rows_qty
+    for qty in range(1, rows_qty + 1):
+        best[qty] = 1 + min(best[qty - size] for size in buckets if size <= qty)
+    return best
+
+
+@pytest.mark.parametrize('paramstyle', ['format', 'qmark', 'numeric'])
+def test_in_queries_cover_params(paramstyle: str):
+    rng = Random(20230603)
+    for _ in range(300):
+        buckets = tuple(sorted(rng.sample(range(1, 40), rng.randrange(1, 6))))
+        params = [rng.randrange(10 ** 6) for _ in range(rng.randrange(1, 150))]
+        offset = rng.randrange(3)
+        covered = []
+        for statement, chunk in SQLHelper.build_in_queries(
+            'SELECT * FROM t WHERE a = $1 AND id IN ({})', params, buckets, paramstyle, offset
+        ):
+            marks = _marks(statement.split('IN (', 1)[1], paramstyle)
+            assert len(marks) == len(chunk) and len(chunk) in buckets
+            if paramstyle == 'numeric':
+                assert marks == [str(idx) for idx in range(offset + 1, offset + len(chunk) + 1)]
+            # the smallest bucket, that fits the values, padded by the last value
+            values = params[len(covered):len(covered) + buckets[-1]]
+            assert len(chunk) == min(size for size in buckets if size >= len(values))
+            assert chunk == values + [values[-1]] * (len(chunk) - len(values))
+            covered += values
+        assert covered == params
+    assert list(SQLHelper.build_in_queries('{}', [])) == []
+
+
+@pytest.mark.parametrize('paramstyle', ['format', 'qmark', 'numeric'])
+def test_values_queries_cover_rows(paramstyle: str):
+    rng = Random(20230604)
+    best = _min_statements(3000, SQLHelper.build_values_queries.__defaults__[0])
+    for rows_qty in list(range(1, 70)) + [rng.randrange(70, 3000) for _ in range(30)]:
+        width = rng.randrange(1, 4)
+        rows = [[rng.randrange(10 ** 6) for _ in range(width)] for _ in range(rows_qty)]
+        statements = list(SQLHelper.build_values_queries('INSERT INTO t VALUES {}', rows, paramstyle=paramstyle))
+        assert len(statements) == best[rows_qty]
+        params = []
+        for statement, chunk in statements:
+            groups = re.findall(r'\(([^()]*)\)', statement)
+            assert all(len(_marks(group, paramstyle)) == width for group in groups)
+            assert len(chunk) == len(groups) * width
+            params += chunk
+        assert params == [value for row in rows for value in row]
+
+
+def test_values_queries_largest_buckets():
+    statements = list(SQLHelper.build_values_queries('VALUES {}', [(idx,) for idx in range(37)], (1, 4, 32)))
+    assert [len(chunk) for _, chunk in statements] == [32, 4, 1]
+    assert statements[-1] == ('VALUES (%s)', [36])
+    assert list(SQLHelper.build_values_queries('VALUES {}', [(1, 2), (3, 4)], (1, 2), 'numeric', 1)) == [
+        ('VALUES ($2, $3), ($4, $5)', [1, 2, 3, 4])
+    ]
+
+
+@pytest.mark.parametrize('buckets', [(), (0, 1), (2, 1), (1, 1), (-1, 4)])
+def test_bad_buckets(buckets: tuple):
+    with pytest.raises(ValueError):
+        list(SQLHelper.build_in_queries('{}', [1], buckets))
+    with pytest.raises(ValueError):
+        list(SQLHelper.build_values_queries('{}', [(1,)], buckets))
+
+
+def test_bad_values_arguments():
+    # VALUES remainders need the bucket of 1
+    with pytest.raises(ValueError):
+        list(SQLHelper.build_values_queries('{}', [(1,)], (2, 4)))
+    with pytest.raises(ValueError):
+        list(SQLHelper.build_values_queries('{}', [(1, 2), (3,)], (1, 2)))
+    with pytest.raises(ValueError):
+        list(SQLHelper.build_in_queries('{}', [1], paramstyle='pyformat'))
+
+
+def test_statement_cache():
+    params = list(range(1000))
+    list(SQLHelper.build_in_queries('SELECT {} -- cache', params, (8, 16)))
+    info = SQLHelper.statement_cache_info()
+    list(SQLHelper.build_in_queries('SELECT {} -- cache', params, (8, 16)))
+    assert SQLHelper.statement_cache_info().hits - info.hits == 63
+    assert SQLHelper.statement_cache_info().misses == info.misses
+
+
+def _random_query(rng: Random) -> str:
+    return ''.join(rng.choice(UNICODE_ALPHABET) for _ in range(rng.randrange(1, 300)))
+
+
+def _brute_force_pages(query: str, qty_lines: int, as_bytes: bool) -> list:
+    """ Pages by characters, a page of bytes takes the characters while their UTF-8 length fits. """
+    pages = ['']
+    for char in query:
+        if len(pages[-1].encode() if as_bytes else pages[-1]) + len(char.encode() if as_bytes else char) > qty_lines:
+            pages.append('')
+        pages[-1] += char
+    return pages if query else []
+
+
+def test_sql_pages():
+    rng = Random(20230605)
+    for _ in range(500):
+        query = _random_query(rng)
+        qty_lines = rng.randrange(1, 40)
+        pages = list(SQLHelper.iter_sql_pages(query, qty_lines))
+        assert pages == _brute_force_pages(query, qty_lines, False)
+
+        data = query.encode()
+        pages = [bytes(page) for page in SQLHelper.iter_sql_pages(data, qty_lines)]
+        assert b''.join(pages) == data and all(len(page) <= qty_lines for page in pages)
+        # pages are cut at character boundaries, unless a character is longer than a page
+        if qty_lines >= 4:
+            assert [page.decode() for page in pages] == _brute_force_pages(query, qty_lines, True)
+
+
+def test_log_sql_matches_pages(logger):
+    logger, messages = logger
+    rng = Random(20230606)
+    for _ in range(300):
+        query = _random_query(rng)
+        if rng.random() < 0.5:
+            query = query.encode()
+        qty_lines = rng.randrange(4, 40)
+        max_len = rng.choice([None, rng.randrange(1, 300)])
+        messages.clear()
+        pages_qty = SQLHelper.log_sql(query, logger, qty_lines=qty_lines, max_len=max_len)
+
+        truncated = query
+        is_truncated = max_len is not None and len(query) > max_len
+        if is_truncated:
+            truncated = query[:max_len]
+            if isinstance(query, bytes):
+                # the cut does not split a character
+                truncated = truncated.decode('utf-8', 'ignore').encode()
+        normalized = SQLHelper.normalize_sql(truncated)
+        is_bytes = isinstance(normalized, bytes)
+        expected = _brute_force_pages(normalized.decode() if is_bytes else normalized, qty_lines, is_bytes)
+        assert pages_qty == len(expected) == len(messages) - is_truncated
+        for idx, (message, page) in enumerate(zip(messages, expected), 1):
+            assert message == f'SQL [{idx}/{pages_qty}]: {page}'
+        if is_truncated:
+            unit = 'characters' if isinstance(query, str) else 'bytes'
+            assert messages[-1] == f'SQL truncated: {len(truncated)} of {len(query)} {unit} are logged'
+
+
+def test_log_sql_is_lazy(logger):
+    logger, messages = logger
+    logger.setLevel(logging.INFO)
+    assert SQLHelper.log_sql('SELECT 1', logger) == 0
+    assert SQLHelper.log_sql('SELECT 1', logger, level=logging.INFO, sample_rate=0.0) == 0
+    assert SQLHelper.log_sql('', logger, level=logging.INFO) == 0
+    assert messages == []
+    assert SQLHelper.log_sql("SELECT '\"a\"', 'NULL'", logger, level=logging.INFO) == 1
+    assert messages == ["SQL [1/1]: SELECT 'a', NULL"]
+
+
+def test_normalize_sql():
+    for query in ("SELECT '\"a\"', 'NULL', '\"NULL\"'", "SELECT '\"'\"'"):
+        assert SQLHelper.normalize_sql(query).encode() == SQLHelper.normalize_sql(query.encode())
+    assert SQLHelper.normalize_sql("SELECT '\"a\"', 'NULL', '\"NULL\"'") == "SELECT 'a', NULL, NULL"
+    query = 'SELECT 1'
+    assert SQLHelper.normalize_sql(query) is query